@@ -1,6 +1,7 @@
 import os
-from crew_server import app
+from crew_server import app, crew_workers
 
 if __name__ == "__main__":
+    crew_workers.start()
     port = int(os.environ.get("PORT", 10000))
     app.run(host="0.0.0.0", port=port) 
\ No newline at end of file
@@ -0,0 +1,220 @@
+"""
+Livrables d'une exécution reconstruits à partir de son point de reprise: sorties des tâches,
+blocs de code extraits, rapport de tests et résultat final. Ils se téléchargent un par un
+(requêtes partielles) ou en archive zip produite au fil de l'eau. Les livrables d'une version
+d'un point de reprise sont construits une seule fois et conservés pour les requêtes suivantes.
+"""
+
+import hashlib
+import io
+import json
+import re
+import threading
+import unicodedata
+import zipfile
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from functools import cached_property
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from checkpoints import RunCheckpoint
+
+# Taille des morceaux envoyés au client
+ARTIFACT_CHUNK_SIZE = 64 * 1024
+# Nombre de versions de points de reprise dont les livrables (et l'archive, si une plage a été demandée)
+# sont conservés
+MAX_CACHED_RUNS = 32
+# Les sorties des agents dont le rôle contient ce terme forment le rapport de tests
+TEST_REPORT_ROLE = 'test'
+
+_CODE_BLOCK = re.compile(r'^```[ \t]*([\w+#.-]*)[^\n]*\n(.*?)^```[ \t]*$', re.MULTILINE | re.DOTALL)
+_EXTENSIONS = {
+    'python': 'py', 'py': 'py', 'javascript': 'js', 'js': 'js', 'typescript': 'ts', 'ts': 'ts',
+    'html': 'html', 'css': 'css', 'json': 'json', 'yaml': 'yaml', 'yml': 'yaml', 'bash': 'sh',
+    'sh': 'sh', 'shell': 'sh', 'sql': 'sql', 'java': 'java', 'go': 'go', 'rust': 'rs', 'markdown': 'md'
+}
+_MIMETYPES = {'md': 'text/markdown; charset=utf-8', 'json': 'application/json'}
+
+def extract_code_blocks(text: str) -> List[Tuple[str, str]]:
+    """Blocs de code délimités par ``` dans une sortie: (langage, code)"""
+    return [(language.lower(), code) for language, code in _CODE_BLOCK.findall(text or '')]
+
+def slugify(text: str) -> str:
+    ascii_text = unicodedata.normalize('NFKD', text).encode('ascii', 'ignore').decode('ascii')
+    slug = re.sub(r'[^a-z0-9]+', '-', ascii_text.lower()).strip('-')
+    return slug or 'agent'
+
+def iter_chunks(data: bytes, start: int = 0, stop: Optional[int] = None,
+                chunk_size: int = ARTIFACT_CHUNK_SIZE) -> Iterator[bytes]:
+    """Découpe une plage d'octets en morceaux"""
+    stop = len(data) if stop is None else stop
+    view = memoryview(data)
+    for offset in range(start, stop, chunk_size):
+        yield bytes(view[offset:min(offset + chunk_size, stop)])
+
+def slice_stream(chunks: Iterable[bytes], start: int, stop: int) -> Iterator[bytes]:
+    """Ne conserve que la plage [start, stop) d'un flux d'octets"""
+    position = 0
+    for chunk in chunks:
+        end = position + len(chunk)
+        if end > start and position < stop:
+            yield chunk[max(0, start - position):min(len(chunk), stop - position)]
+        if end >= stop:
+            return
+        position = end
+
+@dataclass(frozen=True)
+class Artifact:
+    """Livrable d'une exécution"""
+    name: str
+    data: bytes
+    mimetype: str
+
+    @property
+    def size(self) -> int:
+        return len(self.data)
+
+    @cached_property
+    def digest(self) -> str:
+        return hashlib.sha256(self.data).hexdigest()
+
+class _ChunkSink(io.RawIOBase):
+    """Destination non positionnable de l'archive: les octets écrits sont repris par morceaux"""
+    def __init__(self):
+        super().__init__()
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+class RunArtifacts:
+    """Livrables d'un point de reprise; l'archive zip est déterministe afin de pouvoir être reprise"""
+    def __init__(self, checkpoint: RunCheckpoint):
+        self.checkpoint = checkpoint
+        self.artifacts: List[Artifact] = self._build()
+        self._by_name: Dict[str, Artifact] = {artifact.name: artifact for artifact in self.artifacts}
+        self._zip: Optional[bytes] = None
+        self._zip_lock = threading.Lock()
+        # Le manifeste et les dates de l'archive dépendent aussi de l'état du point de reprise
+        self.etag = hashlib.sha256(json.dumps([
+            checkpoint.status, checkpoint.updated_at, [(a.name, a.digest) for a in self.artifacts]
+        ]).encode('utf-8')).hexdigest()[:32]
+
+    def _build(self) -> List[Artifact]:
+        artifacts = []
+        report = []
+        for task in self.checkpoint.tasks:
+            prefix = f"{task.index + 1:02d}-{slugify(task.agent)}"
+            artifacts.append(self._text(f"taches/{prefix}.md", f"# {task.agent}\n\n{task.output}\n"))
+            for position, (language, code) in enumerate(extract_code_blocks(task.output), start=1):
+                extension = _EXTENSIONS.get(language, 'txt')
+                artifacts.append(self._text(f"code/{prefix}-{position}.{extension}", code))
+            if TEST_REPORT_ROLE in task.agent.lower():
+                report.append(f"## {task.agent} (tâche {task.index + 1})\n\n{task.output}\n")
+        if report:
+            artifacts.append(self._text('rapport-tests.md', "# Rapport de tests\n\n" + "\n".join(report)))
+        if self.checkpoint.result is not None:
+            artifacts.append(self._text('resultat.md', self.checkpoint.result))
+        return artifacts
+
+    @staticmethod
+    def _text(name: str, text: str) -> Artifact:
+        extension = name.rsplit('.', 1)[-1]
+        return Artifact(name, text.encode('utf-8'), _MIMETYPES.get(extension, 'text/plain; charset=utf-8'))
+
+    def get(self, name: str) -> Optional[Artifact]:
+        return self._by_name.get(name)
+
+    def manifest(self) -> dict:
+        return {
+            'run_id': self.checkpoint.run_id,
+            'status': self.checkpoint.status,
+            'updated_at': self.checkpoint.updated_at,
+            'artifacts': [
+                {'name': a.name, 'size': a.size, 'sha256': a.digest, 'mimetype': a.mimetype}
+                for a in self.artifacts
+            ]
+        }
+
+    def _date_time(self) -> Tuple[int, int, int, int, int, int]:
+        try:
+            updated = datetime.fromisoformat(self.checkpoint.updated_at)
+        except (TypeError, ValueError):
+            updated = datetime(1980, 1, 1)
+        return max(updated, datetime(1980, 1, 1)).timetuple()[:6]
+
+    def iter_zip(self) -> Iterator[bytes]:
+        """Produit l'archive morceau par morceau: seul le morceau en cours est conservé en mémoire"""
+        sink = _ChunkSink()
+        date_time = self._date_time()
+        manifest = Artifact('manifest.json', json.dumps(self.manifest(), ensure_ascii=False, indent=2).encode('utf-8'),
+                            'application/json')
+        with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+            for artifact in [manifest] + self.artifacts:
+                info = zipfile.ZipInfo(f"{self.checkpoint.run_id}/{artifact.name}", date_time)
+                info.compress_type = zipfile.ZIP_DEFLATED
+                info.external_attr = 0o644 << 16
+                with archive.open(info, 'w') as entry:
+                    for chunk in iter_chunks(artifact.data):
+                        entry.write(chunk)
+                        data = sink.drain()
+                        if data:
+                            yield data
+                data = sink.drain()
+                if data:
+                    yield data
+        data = sink.drain()
+        if data:
+            yield data
+
+    def zip_bytes(self) -> bytes:
+        """Archive complète, produite une fois pour répondre aux requêtes partielles"""
+        with self._zip_lock:
+            if self._zip is None:
+                self._zip = b''.join(self.iter_zip())
+            return self._zip
+
+    def zip_size(self) -> int:
+        return len(self.zip_bytes())
+
+    def read_zip(self, start: int, stop: int) -> Iterator[bytes]:
+        """Plage [start, stop) de l'archive, découpée dans l'archive conservée"""
+        return iter_chunks(self.zip_bytes(), start, stop)
+
+_cache: 'OrderedDict[Tuple[str, str], RunArtifacts]' = OrderedDict()
+_cache_lock = threading.Lock()
+
+def cached_run_artifacts(run_id: str, version: str,
+                         load: Callable[[], Optional[RunCheckpoint]]) -> Optional[RunArtifacts]:
+    """Livrables d'une version (date de mise à jour) d'un point de reprise, lu et analysé au premier accès"""
+    key = (run_id, version)
+    with _cache_lock:
+        artifacts = _cache.get(key)
+        if artifacts is not None:
+            _cache.move_to_end(key)
+            return artifacts
+    checkpoint = load()
+    if checkpoint is None:
+        return None
+    artifacts = RunArtifacts(checkpoint)
+    with _cache_lock:
+        # Une requête concurrente a pu construire la même version: la première reste partagée
+        artifacts = _cache.setdefault((run_id, checkpoint.updated_at), artifacts)
+        while len(_cache) > MAX_CACHED_RUNS:
+            _cache.popitem(last=False)
+    return artifacts
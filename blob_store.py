@@ -0,0 +1,209 @@
+"""
+Stockage de blobs adressé par contenu pour les sorties volumineuses des tâches.
+Les blobs sont conservés en mémoire dans la limite d'un budget, puis déversés sur disque,
+lui-même borné en taille et en durée. Les blobs déversés sont rechargés au démarrage.
+"""
+
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Au-delà de ce nombre d'octets, un message est stocké hors bande
+BLOB_INLINE_THRESHOLD = 2048
+# Nombre de caractères conservés dans l'aperçu transporté par les événements
+BLOB_PREVIEW_CHARS = 280
+# Budget mémoire avant déversement sur disque
+MAX_MEMORY_BYTES = 16 * 1024 * 1024
+# Budget disque et durée de conservation des blobs déversés (les plus anciens sont supprimés)
+BLOB_DIR = 'blobs'
+MAX_DISK_BYTES = 512 * 1024 * 1024
+BLOB_TTL_DAYS = 7
+
+_BLOB_ID_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+
+@dataclass(frozen=True)
+class BlobRef:
+    """Référence vers un blob, transportée dans les événements à la place du contenu"""
+    blob_id: str
+    size: int
+    preview: str
+
+    def to_dict(self) -> dict:
+        return {
+            'id': self.blob_id,
+            'size': self.size,
+            'preview': self.preview,
+            'url': f'/blobs/{self.blob_id}'
+        }
+
+class BlobStore:
+    """Stockage adressé par contenu (SHA-256), en mémoire avec déversement sur disque"""
+    def __init__(self, max_memory_bytes: int = MAX_MEMORY_BYTES, spill_dir: Optional[str] = None,
+                 max_disk_bytes: int = MAX_DISK_BYTES, ttl_days: float = BLOB_TTL_DAYS):
+        self.max_memory_bytes = max_memory_bytes
+        self.spill_dir = spill_dir or BLOB_DIR
+        self.max_disk_bytes = max_disk_bytes
+        self.ttl_days = ttl_days
+        self._memory: 'OrderedDict[str, bytes]' = OrderedDict()
+        self._memory_bytes = 0
+        # Blobs déversés, du plus ancien au plus récent: (taille, date d'écriture)
+        self._on_disk: 'OrderedDict[str, Tuple[int, float]]' = OrderedDict()
+        self._disk_bytes = 0
+        self._lock = threading.Lock()
+        self._load_spilled()
+
+    def _load_spilled(self) -> None:
+        """Reprend les blobs déversés par un processus précédent; les fichiers expirés ou incomplets sont supprimés"""
+        try:
+            names = os.listdir(self.spill_dir)
+        except FileNotFoundError:
+            return
+        spilled = []
+        for name in names:
+            path = os.path.join(self.spill_dir, name)
+            try:
+                if self.is_valid_id(name):
+                    stat = os.stat(path)
+                    spilled.append((stat.st_mtime, name, stat.st_size))
+                elif name.endswith('.tmp'):
+                    os.remove(path)
+            except OSError as e:
+                logger.error(f"Erreur lors de la reprise du blob {name}: {str(e)}")
+        with self._lock:
+            for mtime, blob_id, size in sorted(spilled):
+                self._on_disk[blob_id] = (size, mtime)
+                self._disk_bytes += size
+            self._evict_disk_locked()
+        if spilled:
+            logger.info(f"{len(self._on_disk)} blob(s) repris depuis {self.spill_dir}")
+
+    @staticmethod
+    def is_valid_id(blob_id: str) -> bool:
+        """Vérifie qu'un identifiant a la forme d'un condensat SHA-256"""
+        return bool(_BLOB_ID_PATTERN.match(blob_id or ''))
+
+    def put(self, data: bytes) -> str:
+        """Stocke des octets et renvoie leur identifiant; un contenu identique n'est stocké qu'une fois"""
+        blob_id = hashlib.sha256(data).hexdigest()
+        with self._lock:
+            if blob_id in self._memory:
+                self._memory.move_to_end(blob_id)
+                return blob_id
+            if blob_id in self._on_disk:
+                return blob_id
+            self._memory[blob_id] = data
+            self._memory_bytes += len(data)
+            self._spill_locked()
+        return blob_id
+
+    def put_text(self, text: str, preview_chars: int = BLOB_PREVIEW_CHARS) -> BlobRef:
+        """Stocke un texte UTF-8 et renvoie une référence accompagnée d'un aperçu"""
+        data = text.encode('utf-8')
+        blob_id = self.put(data)
+        return BlobRef(blob_id=blob_id, size=len(data), preview=text[:preview_chars])
+
+    def size(self, blob_id: str) -> Optional[int]:
+        """Renvoie la taille d'un blob en octets, ou None s'il est inconnu"""
+        with self._lock:
+            data = self._memory.get(blob_id)
+            if data is not None:
+                return len(data)
+            entry = self._on_disk.get(blob_id)
+            return entry[0] if entry is not None else None
+
+    def read(self, blob_id: str, start: int = 0, stop: Optional[int] = None) -> Optional[bytes]:
+        """Lit la plage [start, stop) d'un blob, ou None s'il est inconnu"""
+        with self._lock:
+            data = self._memory.get(blob_id)
+            if data is not None:
+                self._memory.move_to_end(blob_id)
+                return data[start:stop]
+            entry = self._on_disk.get(blob_id)
+        if entry is None:
+            return None
+        size = entry[0]
+        stop = size if stop is None else min(stop, size)
+        try:
+            with open(self._path(blob_id), 'rb') as f:
+                f.seek(start)
+                return f.read(max(0, stop - start))
+        except OSError as e:
+            logger.error(f"Erreur lors de la lecture du blob {blob_id}: {str(e)}")
+            return None
+
+    def discard(self, blob_id: str) -> None:
+        """Supprime un blob de la mémoire et du disque"""
+        with self._lock:
+            data = self._memory.pop(blob_id, None)
+            if data is not None:
+                self._memory_bytes -= len(data)
+            entry = self._on_disk.pop(blob_id, None)
+            if entry is not None:
+                self._disk_bytes -= entry[0]
+        if entry is not None:
+            try:
+                os.remove(self._path(blob_id))
+            except OSError:
+                pass
+
+    def __contains__(self, blob_id: str) -> bool:
+        with self._lock:
+            return blob_id in self._memory or blob_id in self._on_disk
+
+    @property
+    def memory_bytes(self) -> int:
+        return self._memory_bytes
+
+    @property
+    def disk_bytes(self) -> int:
+        return self._disk_bytes
+
+    def _path(self, blob_id: str) -> str:
+        if not self.is_valid_id(blob_id):
+            raise ValueError(f"Identifiant de blob invalide: {blob_id}")
+        return os.path.join(self.spill_dir, blob_id)
+
+    def _spill_locked(self) -> None:
+        """Déverse les blobs les moins récemment utilisés sur disque (verrou déjà acquis)"""
+        while self._memory_bytes > self.max_memory_bytes and len(self._memory) > 1:
+            blob_id, data = self._memory.popitem(last=False)
+            self._memory_bytes -= len(data)
+            try:
+                os.makedirs(self.spill_dir, exist_ok=True)
+                path = self._path(blob_id)
+                if not os.path.exists(path):
+                    tmp_path = f"{path}.tmp"
+                    with open(tmp_path, 'wb') as f:
+                        f.write(data)
+                    os.replace(tmp_path, path)
+                self._on_disk[blob_id] = (len(data), time.time())
+                self._disk_bytes += len(data)
+            except OSError as e:
+                # En cas d'échec d'écriture, le blob reste en mémoire plutôt que d'être perdu
+                logger.error(f"Erreur lors du déversement du blob {blob_id}: {str(e)}")
+                self._memory[blob_id] = data
+                self._memory_bytes += len(data)
+                break
+        self._evict_disk_locked()
+
+    def _evict_disk_locked(self) -> None:
+        """Supprime les blobs déversés expirés, puis les plus anciens au-delà du budget disque (verrou déjà acquis)"""
+        cutoff = time.time() - self.ttl_days * 86400
+        while self._on_disk:
+            blob_id, (size, written_at) = next(iter(self._on_disk.items()))
+            if written_at >= cutoff and self._disk_bytes <= self.max_disk_bytes:
+                break
+            del self._on_disk[blob_id]
+            self._disk_bytes -= size
+            try:
+                os.remove(self._path(blob_id))
+            except OSError:
+                pass
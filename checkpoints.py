@@ -0,0 +1,208 @@
+"""
+Points de reprise des exécutions d'équipe.
+La sortie de chaque tâche terminée est enregistrée durablement afin de pouvoir reprendre une exécution interrompue.
+Les points de reprise sont indexés par session et supprimés au-delà d'une durée et d'un nombre maximal.
+"""
+
+import json
+import logging
+import os
+import re
+import threading
+from dataclasses import dataclass, field, asdict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Version du format des points de reprise; à incrémenter à chaque changement incompatible
+CHECKPOINT_VERSION = 1
+CHECKPOINT_DIR = 'checkpoints'
+# Durée de conservation et nombre maximal de points de reprise (les plus anciens sont supprimés)
+CHECKPOINT_RETENTION_DAYS = 7
+MAX_CHECKPOINTS = 1000
+
+STATUS_RUNNING = 'running'
+STATUS_COMPLETED = 'completed'
+STATUS_FAILED = 'failed'
+
+_RUN_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+@dataclass
+class TaskCheckpoint:
+    """Sortie d'une tâche terminée"""
+    index: int
+    agent: str
+    output: str
+    completed_at: str
+
+@dataclass
+class RunCheckpoint:
+    """État durable d'une exécution: configuration des agents et tâches terminées"""
+    run_id: str
+    session_id: str
+    agents: Dict[str, dict]
+    status: str = STATUS_RUNNING
+    tasks: List[TaskCheckpoint] = field(default_factory=list)
+    result: Optional[str] = None
+    resume_count: int = 0
+    created_at: str = field(default_factory=lambda: datetime.now().isoformat())
+    updated_at: str = field(default_factory=lambda: datetime.now().isoformat())
+    version: int = CHECKPOINT_VERSION
+
+    @property
+    def completed_indexes(self) -> List[int]:
+        return [task.index for task in self.tasks]
+
+    @property
+    def resumable(self) -> bool:
+        return self.status != STATUS_COMPLETED
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'RunCheckpoint':
+        """Reconstruit un point de reprise en vérifiant la version du format"""
+        version = data.get('version')
+        if version != CHECKPOINT_VERSION:
+            raise ValueError(f"Version de point de reprise non prise en charge: {version}")
+        data = dict(data)
+        data['tasks'] = [TaskCheckpoint(**task) for task in data.get('tasks', [])]
+        return cls(**data)
+
+class CheckpointStore:
+    """Stockage des points de reprise sous forme de fichiers JSON écrits de façon atomique"""
+    def __init__(self, directory: str = CHECKPOINT_DIR, retention_days: float = CHECKPOINT_RETENTION_DAYS,
+                 max_checkpoints: int = MAX_CHECKPOINTS):
+        self.directory = directory
+        self.retention_days = retention_days
+        self.max_checkpoints = max_checkpoints
+        self._lock = threading.Lock()
+        # Index construit au premier accès: run_id -> (session, statut, mise à jour), et run_id par session
+        self._index: Optional[Dict[str, Tuple[str, str, str]]] = None
+        self._by_session: Dict[str, Set[str]] = {}
+
+    def create(self, run_id: str, session_id: str, agents: Dict[str, dict]) -> RunCheckpoint:
+        """Crée et enregistre le point de reprise d'une nouvelle exécution, puis applique la rétention"""
+        checkpoint = RunCheckpoint(run_id=run_id, session_id=session_id, agents=agents)
+        self.save(checkpoint)
+        self.prune()
+        return checkpoint
+
+    def record_task(self, checkpoint: RunCheckpoint, index: int, agent: str, output: str) -> None:
+        """Enregistre la sortie d'une tâche terminée"""
+        checkpoint.tasks = [task for task in checkpoint.tasks if task.index != index]
+        checkpoint.tasks.append(TaskCheckpoint(
+            index=index,
+            agent=agent,
+            output=output,
+            completed_at=datetime.now().isoformat()
+        ))
+        checkpoint.tasks.sort(key=lambda task: task.index)
+        self.save(checkpoint)
+
+    def finish(self, checkpoint: RunCheckpoint, status: str, result: Optional[str] = None) -> None:
+        """Marque une exécution comme terminée ou échouée"""
+        checkpoint.status = status
+        checkpoint.result = result
+        self.save(checkpoint)
+
+    def save(self, checkpoint: RunCheckpoint) -> None:
+        """Écrit le point de reprise sur disque (fichier temporaire, fsync puis renommage)"""
+        checkpoint.updated_at = datetime.now().isoformat()
+        path = self._path(checkpoint.run_id)
+        tmp_path = f"{path}.tmp"
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(checkpoint.to_dict(), f, ensure_ascii=False)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+            if self._index is not None:
+                self._index_locked(checkpoint)
+
+    def load(self, run_id: str) -> Optional[RunCheckpoint]:
+        """Charge un point de reprise, ou None s'il est absent ou illisible"""
+        try:
+            with open(self._path(run_id), encoding='utf-8') as f:
+                return RunCheckpoint.from_dict(json.load(f))
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, TypeError) as e:
+            logger.error(f"Point de reprise {run_id} illisible: {str(e)}")
+            return None
+
+    def entry(self, run_id: str) -> Optional[Tuple[str, str, str]]:
+        """Session, statut et date de mise à jour d'un point de reprise, d'après l'index (sans lecture du fichier)"""
+        with self._lock:
+            return self._ensure_index_locked().get(run_id)
+
+    def latest_resumable(self, session_id: str) -> Optional[RunCheckpoint]:
+        """Renvoie le point de reprise non terminé le plus récent d'une session, d'après l'index"""
+        with self._lock:
+            index = self._ensure_index_locked()
+            candidates = sorted(
+                (index[run_id][2], run_id) for run_id in self._by_session.get(session_id, ())
+                if index[run_id][1] != STATUS_COMPLETED
+            )
+        for _updated_at, run_id in reversed(candidates):
+            checkpoint = self.load(run_id)
+            if checkpoint is not None and checkpoint.session_id == session_id and checkpoint.resumable:
+                return checkpoint
+        return None
+
+    def prune(self, now: Optional[datetime] = None) -> int:
+        """Supprime les points de reprise expirés puis les plus anciens au-delà du nombre maximal"""
+        cutoff = ((now or datetime.now()) - timedelta(days=self.retention_days)).isoformat()
+        with self._lock:
+            index = self._ensure_index_locked()
+            by_age = sorted(index, key=lambda run_id: index[run_id][2])
+            excess = max(0, len(by_age) - self.max_checkpoints)
+            expired = [run_id for position, run_id in enumerate(by_age)
+                       if position < excess or index[run_id][2] < cutoff]
+            for run_id in expired:
+                try:
+                    os.remove(self._path(run_id))
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    logger.error(f"Erreur lors de la suppression du point de reprise {run_id}: {str(e)}")
+                    continue
+                self._unindex_locked(run_id)
+        if expired:
+            logger.info(f"{len(expired)} point(s) de reprise supprimé(s)")
+        return len(expired)
+
+    def _ensure_index_locked(self) -> Dict[str, Tuple[str, str, str]]:
+        """Construit l'index en lisant une seule fois les points de reprise existants (verrou déjà acquis)"""
+        if self._index is None:
+            self._index, self._by_session = {}, {}
+            try:
+                names = os.listdir(self.directory)
+            except FileNotFoundError:
+                names = []
+            for name in names:
+                if name.endswith('.json'):
+                    checkpoint = self.load(name[:-len('.json')])
+                    if checkpoint is not None:
+                        self._index_locked(checkpoint)
+        return self._index
+
+    def _index_locked(self, checkpoint: RunCheckpoint) -> None:
+        self._index[checkpoint.run_id] = (checkpoint.session_id, checkpoint.status, checkpoint.updated_at)
+        self._by_session.setdefault(checkpoint.session_id, set()).add(checkpoint.run_id)
+
+    def _unindex_locked(self, run_id: str) -> None:
+        session_id = self._index.pop(run_id)[0]
+        run_ids = self._by_session.get(session_id)
+        if run_ids is not None:
+            run_ids.discard(run_id)
+            if not run_ids:
+                del self._by_session[session_id]
+
+    def _path(self, run_id: str) -> str:
+        if not _RUN_ID_PATTERN.match(run_id or ''):
+            raise ValueError(f"Identifiant d'exécution invalide: {run_id}")
+        return os.path.join(self.directory, f"{run_id}.json")
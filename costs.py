@@ -0,0 +1,291 @@
+"""
+Comptabilité des tokens et des coûts des appels LLM, agrégée par appel, tâche, agent et exécution,
+avec des budgets souple (changement de modèle) et strict (arrêt de l'exécution).
+"""
+
+import json
+import logging
+import math
+import os
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, fields
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Prix indicatifs en dollars par million de tokens (entrée, sortie); surchargeables via CREW_MODEL_PRICES
+MODEL_PRICES: Dict[str, Tuple[float, float]] = {
+    'gpt-3.5-turbo': (0.50, 1.50),
+    'gpt-4': (30.00, 60.00),
+    'gpt-4-turbo': (10.00, 30.00),
+    'gpt-4o': (2.50, 10.00),
+    'gpt-4o-mini': (0.15, 0.60),
+    'gpt-4.1': (2.00, 8.00),
+    'gpt-4.1-mini': (0.40, 1.60),
+    'gpt-4.1-nano': (0.10, 0.40),
+    'o3-mini': (1.10, 4.40)
+}
+# Modèle utilisé pour la suite d'une exécution dont le budget souple est dépassé
+DOWNGRADE_MODEL = 'gpt-4o-mini'
+# Nombre d'appels détaillés conservés par exécution
+MAX_RECENT_CALLS = 100
+
+BUDGET_OK = 'ok'
+BUDGET_SOFT_EXCEEDED = 'soft_exceeded'
+BUDGET_HARD_EXCEEDED = 'hard_exceeded'
+
+def load_prices(raw: Optional[str] = None) -> Dict[str, Tuple[float, float]]:
+    """Prix par défaut, complétés par un JSON {"modèle": [entrée, sortie]}"""
+    prices = dict(MODEL_PRICES)
+    raw = raw if raw is not None else os.getenv('CREW_MODEL_PRICES')
+    if raw:
+        try:
+            prices.update({model: (float(p[0]), float(p[1])) for model, p in json.loads(raw).items()})
+        except (ValueError, TypeError, IndexError, AttributeError) as e:
+            logger.error(f"Prix des modèles invalides ignorés: {str(e)}")
+    return prices
+
+def model_price(model: Optional[str], prices: Dict[str, Tuple[float, float]]) -> Optional[Tuple[float, float]]:
+    """Prix d'un modèle, par correspondance exacte ou par le plus long préfixe (variantes datées)"""
+    if not model:
+        return None
+    name = model.split('/')[-1]
+    if name in prices:
+        return prices[name]
+    matches = [known for known in prices if name.startswith(known)]
+    return prices[max(matches, key=len)] if matches else None
+
+def normalize_usage(usage: Optional[dict]) -> Tuple[int, int, int]:
+    """Tokens (entrée, sortie, entrée en cache) quel que soit le format du fournisseur"""
+    usage = usage or {}
+    prompt = usage.get('prompt_tokens', usage.get('input_tokens')) or 0
+    completion = usage.get('completion_tokens', usage.get('output_tokens')) or 0
+    cached = usage.get('cached_prompt_tokens') or 0
+    return int(prompt), int(completion), int(cached)
+
+@dataclass
+class Budget:
+    """Budgets d'une exécution; None désactive une limite"""
+    soft_cost_usd: Optional[float] = None
+    hard_cost_usd: Optional[float] = None
+    soft_tokens: Optional[int] = None
+    hard_tokens: Optional[int] = None
+    downgrade_model: str = DOWNGRADE_MODEL
+
+    @classmethod
+    def from_env(cls) -> 'Budget':
+        """Budget configuré par l'environnement; une valeur invalide est une erreur de configuration"""
+        def number(name, cast):
+            value = os.getenv(name)
+            if not value:
+                return None
+            try:
+                parsed = cast(value)
+            except ValueError:
+                raise ValueError(f"{name} invalide: {value!r}") from None
+            if not math.isfinite(parsed) or parsed < 0:
+                raise ValueError(f"{name} doit être un nombre positif: {value!r}")
+            return parsed
+        return cls(
+            soft_cost_usd=number('CREW_BUDGET_SOFT_USD', float),
+            hard_cost_usd=number('CREW_BUDGET_HARD_USD', float),
+            soft_tokens=number('CREW_BUDGET_SOFT_TOKENS', int),
+            hard_tokens=number('CREW_BUDGET_HARD_TOKENS', int),
+            downgrade_model=os.getenv('CREW_DOWNGRADE_MODEL', DOWNGRADE_MODEL)
+        )
+
+    def apply(self, overrides: dict, prices: Optional[Dict[str, Tuple[float, float]]] = None) -> 'Budget':
+        """Applique des surcharges (champ « budget » d'une requête) après validation de leurs types.
+        Le modèle de repli demandé doit figurer dans la table des prix et ne pas coûter plus que celui configuré."""
+        prices = prices if prices is not None else MODEL_PRICES
+        names = {budget_field.name for budget_field in fields(self)}
+        for name, value in overrides.items():
+            if name not in names:
+                raise ValueError(f"Paramètre de budget inconnu: {name}")
+            if name == 'downgrade_model':
+                if not isinstance(value, str) or not value.strip():
+                    raise ValueError("downgrade_model doit être un nom de modèle")
+                if value != self.downgrade_model and not self._cheaper(value, prices):
+                    raise ValueError(f"downgrade_model doit être un modèle tarifé au plus aussi cher que "
+                                     f"{self.downgrade_model}")
+            elif value is not None and (
+                isinstance(value, bool) or not isinstance(value, (int, float))
+                or not math.isfinite(value) or value < 0
+            ):
+                raise ValueError(f"{name} doit être un nombre positif, ou null pour désactiver la limite")
+            setattr(self, name, value)
+        return self
+
+    def _cheaper(self, model: str, prices: Dict[str, Tuple[float, float]]) -> bool:
+        # Correspondance exacte: les préfixes de model_price accepteraient des noms arbitraires
+        price = prices.get(model)
+        current = model_price(self.downgrade_model, prices)
+        return price is not None and current is not None and price[0] <= current[0] and price[1] <= current[1]
+
+    @staticmethod
+    def _over(tokens: int, cost: float, max_tokens: Optional[int], max_cost: Optional[float]) -> bool:
+        return (max_tokens is not None and tokens >= max_tokens) or (max_cost is not None and cost >= max_cost)
+
+    def soft_exceeded(self, tokens: int, cost: float) -> bool:
+        return self._over(tokens, cost, self.soft_tokens, self.soft_cost_usd)
+
+    def hard_exceeded(self, tokens: int, cost: float) -> bool:
+        return self._over(tokens, cost, self.hard_tokens, self.hard_cost_usd)
+
+class _Totals:
+    __slots__ = ('calls', 'prompt_tokens', 'completion_tokens', 'cached_prompt_tokens', 'cost_usd')
+
+    def __init__(self):
+        self.calls = self.prompt_tokens = self.completion_tokens = self.cached_prompt_tokens = 0
+        self.cost_usd = 0.0
+
+    def add(self, prompt: int, completion: int, cached: int, cost: float) -> None:
+        self.calls += 1
+        self.prompt_tokens += prompt
+        self.completion_tokens += completion
+        self.cached_prompt_tokens += cached
+        self.cost_usd += cost
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+    def to_dict(self) -> dict:
+        return {
+            'calls': self.calls,
+            'prompt_tokens': self.prompt_tokens,
+            'completion_tokens': self.completion_tokens,
+            'cached_prompt_tokens': self.cached_prompt_tokens,
+            'total_tokens': self.total_tokens,
+            'cost_usd': round(self.cost_usd, 6)
+        }
+
+class RunUsage:
+    """Consommation d'une exécution; déclenche une seule fois chaque dépassement de budget"""
+    def __init__(self, run_id: str, budget: Optional[Budget] = None,
+                 prices: Optional[Dict[str, Tuple[float, float]]] = None,
+                 on_soft: Optional[Callable[['RunUsage'], None]] = None,
+                 on_hard: Optional[Callable[['RunUsage'], None]] = None):
+        self.run_id = run_id
+        self.budget = budget or Budget()
+        self.prices = prices if prices is not None else MODEL_PRICES
+        self.on_soft = on_soft
+        self.on_hard = on_hard
+        self.state = BUDGET_OK
+        self.unpriced_calls = 0
+        # Libellés des tâches (identifiant crewai -> index dans l'exécution)
+        self.task_labels: Dict[str, str] = {}
+        self._total = _Totals()
+        self._by_agent: Dict[str, _Totals] = {}
+        self._by_task: Dict[str, _Totals] = {}
+        self._by_model: Dict[str, _Totals] = {}
+        self._recent: 'deque[dict]' = deque(maxlen=MAX_RECENT_CALLS)
+        self._lock = threading.Lock()
+
+    def record(self, model: Optional[str], agent: Optional[str], task_id: Optional[str],
+               usage: Optional[dict], call_id: Optional[str] = None, task_name: Optional[str] = None) -> float:
+        """Enregistre un appel LLM et renvoie son coût estimé"""
+        prompt, completion, cached = normalize_usage(usage)
+        price = model_price(model, self.prices)
+        cost = (prompt * price[0] + completion * price[1]) / 1_000_000 if price else 0.0
+        task = self.task_labels.get(str(task_id), task_name or 'inconnue')
+        triggered = None
+        with self._lock:
+            if price is None:
+                self.unpriced_calls += 1
+            for totals, key in ((self._by_agent, agent or 'inconnu'), (self._by_task, task),
+                                (self._by_model, model or 'inconnu')):
+                totals.setdefault(key, _Totals()).add(prompt, completion, cached, cost)
+            self._total.add(prompt, completion, cached, cost)
+            self._recent.append({
+                'call_id': call_id, 'model': model, 'agent': agent, 'task': task,
+                'prompt_tokens': prompt, 'completion_tokens': completion,
+                'cost_usd': round(cost, 6), 'at': time.time()
+            })
+            tokens, spent = self._total.total_tokens, self._total.cost_usd
+            if self.state != BUDGET_HARD_EXCEEDED and self.budget.hard_exceeded(tokens, spent):
+                self.state = triggered = BUDGET_HARD_EXCEEDED
+            elif self.state == BUDGET_OK and self.budget.soft_exceeded(tokens, spent):
+                self.state = triggered = BUDGET_SOFT_EXCEEDED
+        # Les réactions s'exécutent hors du verrou: elles peuvent publier ou annuler l'exécution
+        handler = {BUDGET_SOFT_EXCEEDED: self.on_soft, BUDGET_HARD_EXCEEDED: self.on_hard}.get(triggered)
+        if handler is not None:
+            try:
+                handler(self)
+            except Exception as e:
+                logger.error(f"Erreur lors de la réaction au budget de {self.run_id}: {str(e)}")
+        return cost
+
+    @property
+    def total_tokens(self) -> int:
+        return self._total.total_tokens
+
+    @property
+    def cost_usd(self) -> float:
+        return self._total.cost_usd
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {
+                **self._total.to_dict(),
+                'unpriced_calls': self.unpriced_calls,
+                'by_agent': {key: totals.to_dict() for key, totals in self._by_agent.items()},
+                'by_task': {key: totals.to_dict() for key, totals in self._by_task.items()},
+                'by_model': {key: totals.to_dict() for key, totals in self._by_model.items()},
+                'budget': {
+                    'state': self.state,
+                    'soft_cost_usd': self.budget.soft_cost_usd,
+                    'hard_cost_usd': self.budget.hard_cost_usd,
+                    'soft_tokens': self.budget.soft_tokens,
+                    'hard_tokens': self.budget.hard_tokens,
+                    'downgrade_model': self.budget.downgrade_model
+                },
+                'recent_calls': list(self._recent)
+            }
+
+class UsageTracker:
+    """Associe les agents et tâches des exécutions à leur comptabilité, alimentée par les événements crewai"""
+    def __init__(self):
+        self._by_entity: Dict[str, RunUsage] = {}
+        self._lock = threading.Lock()
+
+    def bind(self, usage: RunUsage, entities: Iterable) -> None:
+        with self._lock:
+            for entity in entities:
+                self._by_entity[str(entity.id)] = usage
+
+    def unbind(self, usage: RunUsage) -> None:
+        with self._lock:
+            for entity_id in [k for k, v in self._by_entity.items() if v is usage]:
+                del self._by_entity[entity_id]
+
+    def usage_for(self, event) -> Optional[RunUsage]:
+        """Retrouve la comptabilité d'un événement crewai par son agent ou, à défaut, par sa tâche"""
+        return self.usage_for_ids(getattr(event, 'agent_id', None), getattr(event, 'task_id', None))
+
+    def usage_for_ids(self, *entity_ids) -> Optional[RunUsage]:
+        """Retrouve la comptabilité du premier agent ou de la première tâche connus"""
+        for entity_id in entity_ids:
+            if entity_id:
+                usage = self._by_entity.get(str(entity_id))
+                if usage is not None:
+                    return usage
+        return None
+
+    def on_llm_call_completed(self, source, event) -> None:
+        usage = self.usage_for(event)
+        if usage is not None:
+            usage.record(event.model, event.agent_role, event.task_id, event.usage,
+                         call_id=event.call_id, task_name=event.task_name)
+
+    def install_crewai_listeners(self) -> bool:
+        """Abonne la comptabilité au bus d'événements de crewai, lorsqu'il existe"""
+        try:
+            from crewai.events import crewai_event_bus, LLMCallCompletedEvent
+        except ImportError:
+            logger.info("Bus d'événements crewai indisponible: comptabilité des tokens désactivée")
+            return False
+        crewai_event_bus.on(LLMCallCompletedEvent)(self.on_llm_call_completed)
+        return True
@@ -1,4 +1,4 @@
-from crewai import Agent, Task, Crew
+from crewai import Agent, Task, Crew, Process, LLM
 from dotenv import load_dotenv
 import os
 
@@ -30,10 +30,7 @@ class CrewFactory:
             backstory=backstory,
             allow_delegation=False,
             verbose=True,
-            llm_config={
-                "model": self.model,
-                "temperature": self.temperature
-            }
+            llm=LLM(model=self.model, temperature=self.temperature)
         )
     
     def create_task(self, description, expected_output, agent):
@@ -46,6 +43,48 @@ class CrewFactory:
             agent=agent
         )
     
+    def create_crew_from_definition(self, definition):
+        """
+        Crée une équipe à partir d'une définition déclarative (dict issu d'un fichier YAML ou JSON).
+
+        Args:
+            definition (dict): Clés "agents" (name, role, goal, backstory), "tasks"
+                (description, expected_output, agent) et optionnellement "process"
+                ("sequential" ou "hierarchical")
+        """
+        if not isinstance(definition, dict):
+            raise ValueError("La définition d'équipe doit être un objet")
+        if not definition.get('agents') or not definition.get('tasks'):
+            raise ValueError("La définition d'équipe doit contenir des agents et des tâches")
+
+        agents = {}
+        for spec in definition['agents']:
+            missing = [key for key in ('name', 'role', 'goal', 'backstory') if not spec.get(key)]
+            if missing:
+                raise ValueError(f"Champs manquants pour l'agent: {', '.join(missing)}")
+            agents[spec['name']] = self.create_agent(spec['name'], spec['role'], spec['goal'], spec['backstory'])
+
+        tasks = []
+        for spec in definition['tasks']:
+            if spec.get('agent') not in agents:
+                raise ValueError(f"Agent inconnu pour la tâche: {spec.get('agent')}")
+            tasks.append(self.create_task(spec.get('description'), spec.get('expected_output'), agents[spec['agent']]))
+
+        process = definition.get('process', 'sequential')
+        if process not in ('sequential', 'hierarchical'):
+            raise ValueError(f"Processus inconnu: {process}")
+        options = {}
+        if process == 'hierarchical':
+            # Le processus hiérarchique exige un modèle pour l'agent gestionnaire
+            options['manager_llm'] = definition.get('manager_llm', self.model)
+        return Crew(
+            agents=list(agents.values()),
+            tasks=tasks,
+            process=Process(process),
+            verbose=definition.get('verbose', False),
+            **options
+        )
+    
     def create_development_crew(self):
         """
         Crée une équipe de développement standard avec un chef de projet,
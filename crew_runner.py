@@ -0,0 +1,273 @@
+"""
+Exécuteur parallèle de définitions d'équipes (YAML ou JSON) sur un pool de processus.
+Chaque définition décrit les agents, les tâches et le processus construits par CrewFactory.
+Les résultats sont écrits au fil de l'eau en JSONL; un résumé (débit, latences) termine l'exécution.
+
+Exemple:
+    python crew_runner.py crews/ --workers 8 --timeout 600 --output resultats.jsonl
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from dataclasses import dataclass
+from multiprocessing.connection import wait
+from typing import Callable, Dict, Iterator, List, Optional
+
+from costs import load_prices, model_price
+from crew_factory import CrewFactory
+from latency_stats import summarize
+
+try:
+    import yaml
+except ImportError:  # pragma: no cover - dépendance optionnelle
+    yaml = None
+
+DEFINITION_SUFFIXES = ('.yaml', '.yml', '.json')
+# Délai par définition au-delà duquel le processus qui l'exécute est tué et remplacé
+DEFAULT_TIMEOUT = 900.0
+
+STATUS_OK = 'ok'
+STATUS_ERROR = 'error'
+STATUS_TIMEOUT = 'timeout'
+STATUS_CRASHED = 'crashed'
+
+# Message envoyé par un processus de travail prêt à recevoir des définitions
+_READY = 'ready'
+
+@dataclass
+class CrewItem:
+    """Définition d'équipe à exécuter, avec sa provenance"""
+    index: int
+    source: str
+    name: str
+    definition: dict
+
+def load_definitions(path: str) -> List[dict]:
+    """Charge un fichier contenant une définition ou une liste de définitions"""
+    with open(path, encoding='utf-8') as f:
+        if path.endswith('.json'):
+            data = json.load(f)
+        elif yaml is not None:
+            data = yaml.safe_load(f)
+        else:
+            raise ValueError(f"PyYAML est requis pour lire {path}")
+    return data if isinstance(data, list) else [data]
+
+def iter_definition_files(paths: List[str]) -> Iterator[str]:
+    """Parcourt les fichiers de définitions donnés, en explorant les répertoires"""
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in sorted(os.walk(path)):
+                for name in sorted(files):
+                    if name.endswith(DEFINITION_SUFFIXES):
+                        yield os.path.join(root, name)
+        else:
+            yield path
+
+def collect_items(paths: List[str], repeat: int = 1) -> List[CrewItem]:
+    """Construit la liste des équipes à exécuter, chaque définition étant répétée repeat fois"""
+    items = []
+    for path in iter_definition_files(paths):
+        for position, definition in enumerate(load_definitions(path)):
+            name = (definition or {}).get('name') or f"{os.path.basename(path)}#{position}"
+            for _ in range(repeat):
+                items.append(CrewItem(len(items), path, name, definition))
+    return items
+
+def execute_definition(definition: dict, model: str, temperature: float) -> dict:
+    """Construit et lance une équipe dans le processus de travail"""
+    crew = CrewFactory(model=model, temperature=temperature).create_crew_from_definition(definition)
+    inputs = definition.get('inputs')
+    result = crew.kickoff(inputs=inputs) if inputs else crew.kickoff()
+    return {
+        'output': str(result),
+        'tasks': [str(task.output) if task.output is not None else None for task in crew.tasks],
+        'usage': crew_usage(crew, model)
+    }
+
+def crew_usage(crew, model: str) -> Optional[dict]:
+    """Tokens consommés par une équipe après son exécution, avec leur coût estimé"""
+    metrics = getattr(crew, 'usage_metrics', None)
+    if metrics is None:
+        return None
+    usage = metrics.model_dump()
+    price = model_price(model, load_prices())
+    usage['cost_usd'] = None if price is None else round(
+        (usage.get('prompt_tokens', 0) * price[0] + usage.get('completion_tokens', 0) * price[1]) / 1_000_000, 6
+    )
+    return usage
+
+def _worker_loop(conn, execute: Callable, options: dict) -> None:
+    """Boucle d'un processus de travail: une définition reçue, un résultat renvoyé"""
+    # La sortie standard est réservée aux résultats JSONL: l'affichage verbeux de crewai part sur l'erreur standard
+    os.dup2(2, 1)
+    # Les modules de l'exécution sont importés: le délai des définitions ne compte pas le démarrage
+    conn.send(_READY)
+    while True:
+        try:
+            item = conn.recv()
+        except EOFError:
+            return
+        if item is None:
+            return
+        started = time.monotonic()
+        try:
+            result = {'status': STATUS_OK, **execute(item.definition, **options)}
+        except Exception as e:
+            result = {'status': STATUS_ERROR, 'error': f"{type(e).__name__}: {e}"}
+        result['duration_s'] = round(time.monotonic() - started, 3)
+        conn.send(result)
+
+@dataclass
+class _Worker:
+    process: multiprocessing.Process
+    conn: object
+    ready: bool = False
+    item: Optional[CrewItem] = None
+    started: float = 0.0
+
+class CrewPool:
+    """Pool de processus persistants; un processus qui dépasse le délai est tué puis remplacé"""
+    def __init__(self, workers: int, timeout: float, execute: Callable = execute_definition,
+                 options: Optional[dict] = None, start_method: str = 'spawn'):
+        self.size = max(1, workers)
+        self.timeout = timeout
+        self.execute = execute
+        self.options = options or {}
+        self.context = multiprocessing.get_context(start_method)
+        self.restarts = 0
+
+    def _spawn(self) -> _Worker:
+        parent, child = self.context.Pipe()
+        process = self.context.Process(target=_worker_loop, args=(child, self.execute, self.options), daemon=True)
+        process.start()
+        child.close()
+        return _Worker(process, parent)
+
+    def _replace(self, workers: List[_Worker], worker: _Worker) -> None:
+        worker.process.kill()
+        worker.process.join()
+        worker.conn.close()
+        workers[workers.index(worker)] = self._spawn()
+        self.restarts += 1
+
+    def _result(self, worker: _Worker, status: str, error: str) -> dict:
+        return {'status': status, 'error': error, 'duration_s': round(time.monotonic() - worker.started, 3)}
+
+    def run(self, items: List[CrewItem]) -> Iterator[dict]:
+        """Exécute les définitions et produit les résultats dans leur ordre d'achèvement"""
+        pending = list(reversed(items))
+        workers = [self._spawn() for _ in range(min(self.size, len(items)))]
+        try:
+            while pending or any(worker.item is not None for worker in workers):
+                for worker in workers:
+                    if worker.ready and worker.item is None and pending:
+                        worker.item, worker.started = pending.pop(), time.monotonic()
+                        worker.conn.send(worker.item)
+
+                watched = [worker for worker in workers if worker.item is not None or not worker.ready]
+                busy = [worker for worker in watched if worker.item is not None]
+                timeout = None
+                if busy:
+                    timeout = max(0.0, min(worker.started for worker in busy) + self.timeout - time.monotonic())
+                ready = wait([worker.conn for worker in watched], timeout)
+
+                for worker in watched:
+                    item = worker.item
+                    if worker.conn in ready:
+                        try:
+                            message = worker.conn.recv()
+                        except (EOFError, OSError):
+                            if item is None:
+                                raise RuntimeError("Un processus de travail s'est arrêté pendant son démarrage")
+                            # Le processus est mort en cours d'exécution (signal, mémoire épuisée…)
+                            message = self._result(worker, STATUS_CRASHED, 'Processus de travail interrompu')
+                            self._replace(workers, worker)
+                        if message == _READY:
+                            worker.ready = True
+                            continue
+                    elif item is not None and time.monotonic() - worker.started >= self.timeout:
+                        message = self._result(worker, STATUS_TIMEOUT, f"Délai de {self.timeout:g} s dépassé")
+                        self._replace(workers, worker)
+                    else:
+                        continue
+                    worker.item = None
+                    yield {'index': item.index, 'source': item.source, 'name': item.name, **message}
+        finally:
+            for worker in workers:
+                try:
+                    worker.conn.send(None)
+                except OSError:
+                    pass
+            for worker in workers:
+                worker.process.join(timeout=1)
+                if worker.process.is_alive():
+                    worker.process.kill()
+                worker.conn.close()
+
+def summarize_results(results: List[dict], elapsed: float, restarts: int) -> dict:
+    """Résumé de l'exécution: statuts, tokens et coût, débit et latences par définition"""
+    statuses: Dict[str, int] = {}
+    for result in results:
+        statuses[result['status']] = statuses.get(result['status'], 0) + 1
+    costs = [result['usage']['cost_usd'] for result in results
+             if (result.get('usage') or {}).get('cost_usd') is not None]
+    return {
+        'items': len(results),
+        'statuses': statuses,
+        'total_tokens': sum((result.get('usage') or {}).get('total_tokens', 0) for result in results),
+        'cost_usd': round(sum(costs), 6),
+        'elapsed_s': round(elapsed, 3),
+        'throughput_per_min': round(len(results) / elapsed * 60, 2) if elapsed else None,
+        'latency': summarize([result['duration_s'] for result in results]),
+        'worker_restarts': restarts
+    }
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Exécution parallèle de définitions d'équipes CrewAI")
+    parser.add_argument('paths', nargs='+', help="Fichiers ou répertoires de définitions YAML/JSON")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 2, help="Nombre de processus de travail")
+    parser.add_argument('--timeout', type=float, default=DEFAULT_TIMEOUT, help="Délai maximal par définition en secondes")
+    parser.add_argument('--repeat', type=int, default=1, help="Nombre d'exécutions de chaque définition")
+    parser.add_argument('--model', default='gpt-3.5-turbo', help="Modèle LLM transmis à CrewFactory")
+    parser.add_argument('--temperature', type=float, default=0.7, help="Température transmise à CrewFactory")
+    parser.add_argument('--output', help="Fichier JSONL des résultats (sortie standard par défaut)")
+    parser.add_argument('--summary', help="Fichier JSON du résumé (erreur standard par défaut)")
+    parser.add_argument('--quiet', action='store_true', help="Désactive l'affichage de la progression")
+    return parser.parse_args(argv)
+
+def main(argv=None) -> dict:
+    args = parse_args(argv)
+    items = collect_items(args.paths, args.repeat)
+    pool = CrewPool(args.workers, args.timeout, options={'model': args.model, 'temperature': args.temperature})
+    output = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+    results = []
+    started = time.monotonic()
+    try:
+        for result in pool.run(items):
+            results.append(result)
+            output.write(json.dumps(result, ensure_ascii=False) + '\n')
+            output.flush()
+            if not args.quiet:
+                print(f"[{len(results)}/{len(items)}] {result['status']} {result['name']} "
+                      f"({result['duration_s']:.1f} s)", file=sys.stderr)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+    summary = summarize_results(results, time.monotonic() - started, pool.restarts)
+    text = json.dumps(summary, indent=2, sort_keys=True, ensure_ascii=False)
+    if args.summary:
+        with open(args.summary, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    else:
+        print(text, file=sys.stderr)
+    return summary
+
+if __name__ == '__main__':
+    summary = main(sys.argv[1:])
+    sys.exit(0 if summary['statuses'].get(STATUS_OK, 0) == summary['items'] else 1)
@@ -3,18 +3,48 @@ Module de serveur Flask pour la visualisation en temps réel de CrewAI.
 Inclut une gestion avancée des exceptions et une optimisation de la mémoire.
 """
 
-from flask import Flask, render_template, Response, request, jsonify
-from crewai import Agent, Task, Crew, Process
+from flask import Flask, render_template, Response, request, jsonify, g
+from crewai import Agent, Task, Crew, Process, LLM
 from datetime import datetime
-import json
 import queue
 import threading
 import os
+import uuid
+import time
+import tracemalloc
 import logging
 from dotenv import load_dotenv
-from typing import Dict, List, Optional
-from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+from dataclasses import dataclass, field, replace
 from contextlib import contextmanager
+from artifacts import RunArtifacts, cached_run_artifacts, iter_chunks
+from blob_store import BlobStore, BLOB_DIR, BLOB_INLINE_THRESHOLD, MAX_DISK_BYTES
+from event_stream import HEARTBEAT_INTERVAL
+from http_cache import (
+    CACHE_PRIVATE_REVALIDATE, RenderCache, StaticAssets, compress_response, conditional, content_digest
+)
+from checkpoints import (
+    CheckpointStore, RunCheckpoint, CHECKPOINT_DIR, CHECKPOINT_RETENTION_DAYS, STATUS_COMPLETED, STATUS_FAILED, STATUS_RUNNING
+)
+from runs import (
+    CrewRun, RunRegistry, RunCancelled, RunStillActive, TooManyActiveRuns, TooManyZombieRuns, MAX_ACTIVE_RUNS,
+    STATUS_CANCELLED as RUN_CANCELLED, STATUS_COMPLETED as RUN_COMPLETED, STATUS_FAILED as RUN_FAILED
+)
+from costs import Budget, RunUsage, UsageTracker, load_prices
+from routing import ModelRouter, RoutingLog
+from tracing import Tracer, TRACE_DIR, TRACE_SAMPLE_RATE, TRACE_RETENTION_DAYS, MAX_TRACES, trace_span
+from warm_pool import WarmPool
+from event_log import EventLog, EVENT_LOG_DIR, RETENTION_DAYS, DEFAULT_QUERY_LIMIT
+from sessions import (
+    Session, SessionManager, TooManySessions, SESSION_COOKIE, SESSION_HEADER, SESSION_HARD_LIMIT, SESSION_TTL,
+    is_valid_session_id, new_session_id
+)
+from ws_transport import ChannelMultiplexer, serve as serve_websocket
+
+try:
+    from flask_sock import Sock
+except ImportError:  # pragma: no cover - dépendance optionnelle
+    Sock = None
 
 # Configuration du logging avec des niveaux plus détaillés
 logging.basicConfig(
@@ -29,19 +59,49 @@ logger = logging.getLogger(__name__)
 
 # Taille maximale de la queue pour éviter les fuites de mémoire
 MAX_QUEUE_SIZE = 1000
+# Délai (en secondes) sans événement avant l'envoi d'un heartbeat sur /stream
+STREAM_HEARTBEAT = float(os.getenv('CREW_STREAM_HEARTBEAT', HEARTBEAT_INTERVAL))
+# Diffusion des sorties régénérées sous forme de différences avec leur version précédente
+DELTA_STREAMING = os.getenv('CREW_DELTA_STREAMING', '1') != '0'
 
 @dataclass
 class FactoryConfig:
-    """Configuration du Directeur Factory avec validation des données"""
+    """Configuration versionnée du Directeur Factory avec validation des données"""
     goal: str
     backstory: str
+    # Incrémentée à chaque modification: sert d'ETag et invalide la sérialisation en cache
+    version: int = field(default=1, compare=False)
+    updated_at: float = field(default_factory=time.time, compare=False)
 
     def __post_init__(self):
-        if not self.goal or not isinstance(self.goal, str):
+        self._validate(self.goal, self.backstory)
+        self._encoded: Optional[Tuple[int, bytes, str]] = None
+
+    @staticmethod
+    def _validate(goal, backstory) -> None:
+        if not goal or not isinstance(goal, str):
             raise ValueError("L'objectif doit être une chaîne non vide")
-        if not self.backstory or not isinstance(self.backstory, str):
+        if not backstory or not isinstance(backstory, str):
             raise ValueError("L'histoire doit être une chaîne non vide")
 
+    def update(self, goal: Optional[str] = None, backstory: Optional[str] = None) -> None:
+        """Modifie la configuration après validation et passe à la version suivante"""
+        goal = self.goal if goal is None else goal
+        backstory = self.backstory if backstory is None else backstory
+        self._validate(goal, backstory)
+        self.goal, self.backstory = goal, backstory
+        self.version += 1
+        self.updated_at = time.time()
+
+    def encoded(self) -> Tuple[bytes, str]:
+        """Corps JSON et ETag de la version courante, sérialisés une seule fois par version"""
+        cached = self._encoded
+        if cached is None or cached[0] != self.version:
+            body = app.json.dumps({'goal': self.goal, 'backstory': self.backstory, 'version': self.version})
+            data = body.encode('utf-8')
+            cached = self._encoded = (self.version, data, content_digest(data))
+        return cached[1], cached[2]
+
 @dataclass
 class TaskConfig:
     """Configuration d'une tâche avec validation des données"""
@@ -67,7 +127,7 @@ class QueueManager:
         """Ajoute un élément à la queue avec gestion de la taille maximale"""
         try:
             with self._lock:
-                if self.queue.qsize() >= MAX_QUEUE_SIZE:
+                if self.queue.qsize() >= self.queue.maxsize:
                     try:
                         self.queue.get_nowait()  # Retire le plus ancien élément
                     except queue.Empty:
@@ -90,16 +150,83 @@ class QueueManager:
                 except queue.Empty:
                     break
 
-app = Flask(__name__)
-updates_queue = QueueManager()
+DEFAULT_FACTORY_GOAL = 'Piloter l\'équipe et assurer la qualité du livrable'
+DEFAULT_FACTORY_BACKSTORY = 'Expert en gestion d\'équipe avec une forte expérience en développement et qualité'
+
+def default_factory_config() -> FactoryConfig:
+    """Crée la configuration initiale d'une nouvelle session"""
+    return FactoryConfig(goal=DEFAULT_FACTORY_GOAL, backstory=DEFAULT_FACTORY_BACKSTORY)
 
-# Variables globales avec typage
-factory_config = FactoryConfig(
-    goal='Piloter l\'équipe et assurer la qualité du livrable',
-    backstory='Expert en gestion d\'équipe avec une forte expérience en développement et qualité'
+app = Flask(__name__)
+blob_store = BlobStore(
+    spill_dir=os.getenv('CREW_BLOB_DIR', BLOB_DIR),
+    max_disk_bytes=int(os.getenv('CREW_BLOB_DISK_BYTES', MAX_DISK_BYTES))
+)
+session_manager = SessionManager(
+    default_factory_config,
+    hard_limit=int(os.getenv('CREW_SESSION_HARD_LIMIT', SESSION_HARD_LIMIT))
+)
+checkpoint_store = CheckpointStore(
+    os.getenv('CREW_CHECKPOINT_DIR', CHECKPOINT_DIR),
+    retention_days=float(os.getenv('CREW_CHECKPOINT_RETENTION_DAYS', CHECKPOINT_RETENTION_DAYS))
+)
+tracer = Tracer(
+    os.getenv('CREW_TRACE_DIR', TRACE_DIR),
+    float(os.getenv('CREW_TRACE_SAMPLE_RATE', TRACE_SAMPLE_RATE)),
+    retention_days=float(os.getenv('CREW_TRACE_RETENTION_DAYS', TRACE_RETENTION_DAYS)),
+    max_traces=int(os.getenv('CREW_MAX_TRACES', MAX_TRACES))
+)
+tracer.install_crewai_listeners()
+event_log = EventLog(
+    os.getenv('CREW_EVENT_LOG_DIR', EVENT_LOG_DIR),
+    retention_days=float(os.getenv('CREW_EVENT_RETENTION_DAYS', RETENTION_DAYS))
 )
-crew_thread: Optional[threading.Thread] = None
-crew_stop_event = threading.Event()
+static_assets = StaticAssets(os.path.join(app.root_path, 'static'))
+rendered_pages = RenderCache()
+app.jinja_env.globals['asset_url'] = static_assets.url
+run_registry = RunRegistry(max_active=int(os.getenv('CREW_MAX_ACTIVE_RUNS', MAX_ACTIVE_RUNS)))
+usage_tracker = UsageTracker()
+usage_tracker.install_crewai_listeners()
+
+def on_llm_call_started(source, event) -> None:
+    """Premier appel LLM d'une exécution: fin de sa latence de démarrage"""
+    usage = usage_tracker.usage_for(event)
+    run = run_registry.get(usage.run_id) if usage is not None else None
+    if run is not None:
+        timestamp = getattr(event, 'timestamp', None)
+        run.mark_first_llm_call(timestamp.timestamp() if timestamp is not None else time.time())
+
+try:
+    from crewai.events import crewai_event_bus, LLMCallStartedEvent
+    crewai_event_bus.on(LLMCallStartedEvent)(on_llm_call_started)
+except ImportError:  # pragma: no cover - dépend de la version de crewai
+    logger.info("Bus d'événements crewai indisponible: premier appel LLM non mesuré")
+
+def cancel_llm_call(context) -> None:
+    """Crochet crewai exécuté avant chaque appel LLM, dans le thread de l'agent: une exécution annulée
+    s'interrompt sans consommer l'appel (les gestionnaires du bus d'événements ne peuvent pas l'interrompre)"""
+    usage = usage_tracker.usage_for_ids(getattr(getattr(context, 'agent', None), 'id', None),
+                                        getattr(getattr(context, 'task', None), 'id', None))
+    run = run_registry.get(usage.run_id) if usage is not None else None
+    if run is not None and run.stop_event.is_set():
+        raise HookAborted(f"Exécution {run.run_id} annulée")
+
+try:
+    from crewai.hooks import HookAborted, register_before_llm_call_hook
+    # Enregistré avant la création des exécuteurs, qui copient les crochets globaux
+    register_before_llm_call_hook(cancel_llm_call)
+except ImportError:  # pragma: no cover - dépend de la version de crewai
+    logger.info("Crochets crewai indisponibles: l'annulation n'est vérifiée qu'entre les étapes et les tâches")
+model_prices = load_prices()
+# Budget par défaut lu au démarrage: une valeur CREW_BUDGET_* invalide empêche le serveur de démarrer
+default_budget = Budget.from_env()
+# Routage des modèles par agent et par tâche (None sauf avec CREW_MODEL_ROUTING=1 ou des règles configurées)
+model_router = ModelRouter.from_env()
+
+# Nombre de cadres de pile conservés par allocation pour /debug/memory
+TRACEMALLOC_FRAMES = 1
+if os.getenv('CREW_TRACEMALLOC'):
+    tracemalloc.start(TRACEMALLOC_FRAMES)
 
 # Chargement des variables d'environnement avec validation
 load_dotenv()
@@ -117,40 +244,93 @@ def error_handler(error_msg: str):
         logger.error(f"{error_msg}: {str(e)}")
         raise
 
-class CustomJSONEncoder(json.JSONEncoder):
-    """Encodeur JSON personnalisé avec gestion d'erreurs améliorée"""
-    def default(self, obj):
+def capacity_response(error: Exception):
+    """Réponse 503 lorsque le serveur a atteint sa limite de sessions ou d'exécutions simultanées"""
+    return jsonify({'success': False, 'error': str(error)}), 503, {'Retry-After': '5'}
+
+def current_session() -> Session:
+    """Résout la session de la requête (en-tête, paramètre ou cookie), en la créant au besoin"""
+    if 'session' not in g:
+        session_id = (
+            request.headers.get(SESSION_HEADER)
+            or request.args.get('session')
+            or request.cookies.get(SESSION_COOKIE)
+        )
+        if not is_valid_session_id(session_id):
+            session_id = new_session_id()
+        g.session = session_manager.get_or_create(session_id)
+    return g.session
+
+def publish_event(session: Session, event_type: str, agent: Optional[str] = None,
+                  search_text: Optional[str] = None, **fields) -> None:
+    """Publie un événement aux abonnés de la session, encodé une seule fois; search_text est le texte
+    complet à indexer dans le journal lorsque l'événement n'en porte qu'un aperçu ou une différence"""
+    payload = {
+        'type': event_type,
+        'timestamp': datetime.now(),
+        'agent': agent,
+        **fields
+    }
+    with trace_span('publish', 'publish', type=event_type):
+        event = session.broadcaster.publish(event_type, payload)
+    if fields.get('run_id') is not None:
+        # Les événements d'exécution sont journalisés tels qu'ils ont été encodés pour les abonnés
         try:
-            return str(obj)
-        except Exception as e:
-            logger.error(f"Erreur lors de l'encodage JSON: {str(e)}")
-            return f"<Non encodable: {type(obj).__name__}>"
+            if search_text == fields.get('message'):
+                search_text = None
+            event_log.append(session.session_id, payload, event.data, search_text)
+        except OSError as e:
+            logger.error(f"Écriture dans le journal des événements impossible: {str(e)}")
+    run = run_registry.get(fields.get('run_id'))
+    if run is not None:
+        run.account_event(len(event.data))
+
+def message_payload(text: str) -> dict:
+    """Construit le champ message d'un événement, en stockant hors bande les textes volumineux"""
+    if len(text.encode('utf-8')) <= BLOB_INLINE_THRESHOLD:
+        return {'message': text}
+    ref = blob_store.put_text(text)
+    return {'message': ref.preview, 'blob': ref.to_dict()}
 
-def task_callback(output, agent_name):
-    """Gère la sortie des tâches"""
+def output_payload(session: Session, agent_name: str, task_index: int, text: str) -> dict:
+    """Construit les champs d'une sortie de tâche: différence avec la version précédente, ou texte complet"""
+    update = session.versions.update((agent_name, task_index), text, use_delta=DELTA_STREAMING)
+    fields = {'task_index': task_index, 'version': update.version}
+    # Une différence plus lourde que le seuil d'envoi en ligne est remplacée par le texte complet hors bande
+    if update.ops is None or len(app.json.dumps(update.ops).encode('utf-8')) > BLOB_INLINE_THRESHOLD:
+        return {**fields, **message_payload(text)}
+    return {**fields, 'delta': {'base': update.base_version, 'ops': update.ops, 'length': update.length}}
+
+def task_callback(output, agent_name, run: CrewRun, task_index: int):
+    """Gère la sortie des tâches et l'enregistre dans le point de reprise de l'exécution"""
     try:
-        logger.info(f"Nouvelle sortie de tâche reçue de {agent_name}: {str(output)[:100]}...")
-        update = {
-            'type': 'task_update',
-            'timestamp': datetime.now().isoformat(),
-            'message': str(output),
-            'agent': agent_name
-        }
-        updates_queue.put(json.dumps(update, cls=CustomJSONEncoder))
+        with trace_span('task_callback', 'callback', agent=agent_name, task_index=task_index):
+            text = str(output)
+            logger.info(f"Nouvelle sortie de tâche reçue de {agent_name}: {text[:100]}...")
+            run.account_output(len(text))
+            if run.checkpoint is not None:
+                checkpoint_store.record_task(run.checkpoint, task_index, agent_name, text)
+            # Une exécution annulée ne doit plus alimenter le flux de la session
+            if not run.stop_event.is_set():
+                publish_event(run.session, 'task_update', agent_name, run_id=run.run_id, search_text=text,
+                              **output_payload(run.session, agent_name, task_index, text))
     except Exception as e:
         logger.error(f"Erreur dans task_callback: {str(e)}")
+    # La sortie reste dans le point de reprise; les tâches suivantes ne sont pas lancées
+    run.check_cancelled()
 
-def create_agent_callback(agent_name):
+def create_agent_callback(agent_name, run: CrewRun, task_index: int):
     """Crée un callback spécifique pour un agent"""
-    return lambda output: task_callback(output, agent_name)
+    return lambda output: task_callback(output, agent_name, run, task_index)
 
-def create_task(config: TaskConfig, output_handler=None) -> Task:
-    """Crée une tâche à partir d'une configuration validée"""
+def create_task(config: TaskConfig, output_handler=None, **options) -> Task:
+    """Crée une tâche à partir d'une configuration validée (options: garde-fou de validation)"""
     return Task(
         description=config.description,
         expected_output=config.expected_output,
         agent=config.agent,
-        output_handler=output_handler
+        callback=output_handler,
+        **options
     )
 
 @app.route('/update_factory_goal', methods=['POST'])
@@ -162,7 +342,7 @@ def update_factory_goal():
             return jsonify({'success': False, 'error': 'Goal manquant'}), 400
         
         with error_handler("Erreur lors de la mise à jour de l'objectif"):
-            factory_config.goal = data['goal']
+            current_session().config.update(goal=data['goal'])
             logger.info(f"Objectif du Directeur Factory mis à jour: {data['goal'][:100]}...")
             
             # Redémarrer l'équipe
@@ -170,6 +350,8 @@ def update_factory_goal():
             logger.info("Équipe redémarrée après mise à jour de l'objectif")
             
             return jsonify({'success': True})
+    except TooManySessions as full:
+        return capacity_response(full)
     except ValueError as ve:
         return jsonify({'success': False, 'error': str(ve)}), 400
     except Exception as e:
@@ -185,7 +367,7 @@ def update_factory_backstory():
             return jsonify({'success': False, 'error': 'Backstory manquante'}), 400
         
         with error_handler("Erreur lors de la mise à jour de l'histoire"):
-            factory_config.backstory = data['backstory']
+            current_session().config.update(backstory=data['backstory'])
             logger.info(f"Histoire du Directeur Factory mise à jour: {data['backstory'][:100]}...")
             
             # Redémarrer l'équipe
@@ -193,6 +375,8 @@ def update_factory_backstory():
             logger.info("Équipe redémarrée après mise à jour de l'histoire")
             
             return jsonify({'success': True})
+    except TooManySessions as full:
+        return capacity_response(full)
     except ValueError as ve:
         return jsonify({'success': False, 'error': str(ve)}), 400
     except Exception as e:
@@ -201,176 +385,624 @@ def update_factory_backstory():
 
 @app.route('/get_factory_config')
 def get_factory_config():
-    """Récupère la configuration actuelle du Directeur Factory"""
-    return jsonify(factory_config)
+    """Récupère la configuration actuelle du Directeur Factory (304 si la version du client est à jour)"""
+    config = current_session().config
+    body, etag = config.encoded()
+    response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    # La configuration dépend de la session: le cache du navigateur ne doit pas être partagé
+    response.vary.update(('Cookie', SESSION_HEADER))
+    return conditional(response, request, CACHE_PRIVATE_REVALIDATE, last_modified=config.updated_at)
 
 @app.route('/restart_crew', methods=['POST'])
 def restart_crew():
     """Redémarre l'équipe avec les nouvelles configurations et gestion des erreurs"""
     try:
-        global crew_thread, crew_stop_event
-        
         with error_handler("Erreur lors du redémarrage de l'équipe"):
-            # Arrêter le thread existant s'il y en a un
-            if crew_thread and crew_thread.is_alive():
-                crew_stop_event.set()
-                crew_thread.join(timeout=5)
-                if crew_thread.is_alive():
-                    logger.warning("Le thread précédent n'a pas pu être arrêté proprement")
-                crew_stop_event.clear()
-            
-            # Vider la queue des mises à jour
-            updates_queue.clear()
-            
-            # Créer et démarrer un nouveau thread
-            crew_thread = threading.Thread(target=run_crew)
-            crew_thread.daemon = True
-            crew_thread.start()
-            
+            budget = budget_from_request(request.get_json(silent=True))
+            run = start_crew(current_session(), budget=budget)
             logger.info("Équipe redémarrée avec succès")
-            return jsonify({'success': True})
+            return jsonify({'success': True, 'run_id': run.run_id})
+    except (TooManySessions, TooManyZombieRuns, TooManyActiveRuns) as full:
+        return capacity_response(full)
+    except ValueError as ve:
+        return jsonify({'success': False, 'error': str(ve)}), 400
     except Exception as e:
         logger.error(f"Erreur lors du redémarrage de l'équipe: {str(e)}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
-def run_crew():
+@app.route('/resume_crew', methods=['POST'])
+def resume_crew():
+    """Reprend une exécution interrompue à partir de sa dernière tâche terminée"""
     try:
-        if crew_stop_event.is_set():
-            return
+        session = current_session()
+        data = request.get_json(silent=True) or {}
+        run_id = data.get('run_id')
+        if run_id:
+            checkpoint = checkpoint_store.load(run_id)
+            if checkpoint is not None and checkpoint.session_id != session.session_id:
+                checkpoint = None
+        else:
+            checkpoint = checkpoint_store.latest_resumable(session.session_id)
+        if checkpoint is None:
+            return jsonify({'success': False, 'error': 'Aucune exécution à reprendre'}), 404
+        if not checkpoint.resumable:
+            return jsonify({'success': False, 'error': 'Exécution déjà terminée'}), 409
 
-        logger.info("Démarrage de l'équipe...")
-        
-        # Configuration des agents
-        directeur_factory = Agent(
-            role="Directeur Factory",
-            name="Directeur Factory",
-            role_description="Pilote l'équipe et assure la qualité du livrable",
-            goal=factory_config.goal,
-            backstory=factory_config.backstory,
-            allow_delegation=True,
-            verbose=True,
-            tools=[]
-        )
+        with error_handler("Erreur lors de la reprise de l'équipe"):
+            run = start_crew(session, resume_from=checkpoint)
+            logger.info(f"Reprise de l'exécution {run.run_id} après {len(checkpoint.tasks)} tâche(s) terminée(s)")
+            return jsonify({'success': True, 'run_id': run.run_id, 'completed_tasks': len(checkpoint.tasks)})
+    except RunStillActive as ra:
+        return jsonify({'success': False, 'error': str(ra)}), 409
+    except (TooManySessions, TooManyZombieRuns, TooManyActiveRuns) as full:
+        return capacity_response(full)
+    except Exception as e:
+        logger.error(f"Erreur lors de la reprise de l'équipe: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
 
-        chef_de_projet = Agent(
-            role="Chef de Projet",
-            name="Chef de Projet",
-            role_description="Planifie les tâches et organise le travail d'équipe",
-            goal="Créer un plan clair et efficace pour le développement",
-            backstory="Expert en gestion de projet avec 10 ans d'expérience",
-            allow_delegation=False,
-            verbose=True,
-            tools=[]
-        )
+def downgrade_agents(agents: Optional[List[Agent]], model: str) -> None:
+    """Fait passer les agents à un autre modèle; crewai relit agent.llm au début de chaque tâche"""
+    for agent in agents or []:
+        agent.llm = LLM(model=model)
+        if agent.agent_executor is not None:
+            agent.agent_executor.llm = agent.llm
+
+def on_soft_budget(run: CrewRun, usage: RunUsage) -> None:
+    """Budget souple dépassé: la suite de l'exécution utilise le modèle de repli"""
+    model = usage.budget.downgrade_model
+    logger.warning(f"Budget souple dépassé pour {run.run_id} ({usage.cost_usd:.4f} $, {usage.total_tokens} tokens)")
+    downgrade_agents(run.agents, model)
+    if run.routing is not None:
+        for agent in run.agents or []:
+            run.routing.decision('downgrade', agent.role, None, model, reason='budget')
+    publish_event(run.session, 'status', run_id=run.run_id,
+                  message=f"Budget souple dépassé: passage au modèle {model}")
+
+def on_hard_budget(run: CrewRun, usage: RunUsage) -> None:
+    """Budget strict dépassé: l'exécution s'arrête avant son prochain appel LLM"""
+    reason = f"Budget dépassé ({usage.cost_usd:.4f} $, {usage.total_tokens} tokens)"
+    logger.warning(f"{reason}: arrêt de l'exécution {run.run_id}")
+    publish_event(run.session, 'error', run_id=run.run_id, message=f"{reason}: arrêt de l'exécution")
+    run_registry.cancel(run, reason)
+
+def budget_from_request(data: Optional[dict]) -> Budget:
+    """Budget de l'exécution: valeurs de l'environnement, surchargées par le champ « budget » de la requête"""
+    overrides = (data or {}).get('budget') or {}
+    if not isinstance(overrides, dict):
+        raise ValueError("Le budget doit être un objet")
+    return replace(default_budget).apply(overrides, model_prices)
+
+def start_crew(session: Session, resume_from: Optional[RunCheckpoint] = None,
+               budget: Optional[Budget] = None) -> CrewRun:
+    """Arrête l'exécution en cours de la session et en démarre une nouvelle (ou en reprend une)"""
+    with session.lock:
+        # Une exécution ne peut être reprise tant que son propre thread tourne encore
+        if resume_from is not None:
+            live = run_registry.get(resume_from.run_id)
+            if live is not None and live.is_alive:
+                raise RunStillActive(f"L'exécution {resume_from.run_id} est toujours en cours")
+
+        # Arrêter l'exécution existante: elle s'interrompt à sa prochaine étape d'agent
+        previous = session.current_run
+        if previous is not None and previous.is_alive:
+            run_registry.cancel(previous)
+            previous.thread.join(timeout=5)
+            if previous.is_alive:
+                logger.warning("Le thread précédent n'a pas pu être arrêté proprement")
+
+        # Vider le tampon des mises à jour
+        session.broadcaster.clear()
 
-        developpeur = Agent(
-            role="Développeur",
-            name="Développeur",
-            role_description="Écrit du code Python propre et efficace",
-            goal="Transformer les spécifications en code fonctionnel",
-            backstory="Développeur Python senior avec expertise en bonnes pratiques",
-            allow_delegation=False,
-            verbose=True,
-            tools=[]
+        # Chaque exécution a son propre signal d'arrêt: l'ancien reste levé pour le thread précédent
+        run = run_registry.register(
+            CrewRun(run_id=resume_from.run_id if resume_from else uuid.uuid4().hex, session=session)
         )
+        run.usage = RunUsage(
+            run.run_id, budget or replace(default_budget), model_prices,
+            on_soft=lambda usage: on_soft_budget(run, usage),
+            on_hard=lambda usage: on_hard_budget(run, usage)
+        )
+        run.routing = RoutingLog() if model_router is not None else None
+        session.stop_event = run.stop_event
+        session.current_run = run
+        # Un thread préchauffé reçoit l'exécution avec ses agents et modèles déjà construits
+        run.thread = session.crew_thread = crew_workers.submit(lambda kit: run_crew(run, resume_from, kit))
+        return run
+
+def build_agents(goal: str, backstory: str) -> List[Agent]:
+    """Crée les agents de l'équipe; seul le Directeur Factory dépend de la configuration"""
+    directeur_factory = Agent(
+        role="Directeur Factory",
+        name="Directeur Factory",
+        role_description="Pilote l'équipe et assure la qualité du livrable",
+        goal=goal,
+        backstory=backstory,
+        allow_delegation=True,
+        verbose=True,
+        tools=[]
+    )
+
+    chef_de_projet = Agent(
+        role="Chef de Projet",
+        name="Chef de Projet",
+        role_description="Planifie les tâches et organise le travail d'équipe",
+        goal="Créer un plan clair et efficace pour le développement",
+        backstory="Expert en gestion de projet avec 10 ans d'expérience",
+        allow_delegation=False,
+        verbose=True,
+        tools=[]
+    )
+
+    developpeur = Agent(
+        role="Développeur",
+        name="Développeur",
+        role_description="Écrit du code Python propre et efficace",
+        goal="Transformer les spécifications en code fonctionnel",
+        backstory="Développeur Python senior avec expertise en bonnes pratiques",
+        allow_delegation=False,
+        verbose=True,
+        tools=[]
+    )
 
-        testeur = Agent(
-            role="Testeur",
-            name="Testeur",
-            role_description="Teste et améliore la qualité du code",
-            goal="Assurer la qualité et la fiabilité du code",
-            backstory="Expert en QA avec une forte attention aux détails",
-            allow_delegation=False,
-            verbose=True,
-            tools=[]
+    testeur = Agent(
+        role="Testeur",
+        name="Testeur",
+        role_description="Teste et améliore la qualité du code",
+        goal="Assurer la qualité et la fiabilité du code",
+        backstory="Expert en QA avec une forte attention aux détails",
+        allow_delegation=False,
+        verbose=True,
+        tools=[]
+    )
+
+    return [directeur_factory, chef_de_projet, developpeur, testeur]
+
+def build_task_configs(agents: List[Agent]) -> List[TaskConfig]:
+    """Crée les configurations des tâches, dans l'ordre d'exécution séquentielle"""
+    directeur_factory, chef_de_projet, developpeur, testeur = agents
+    return [
+        TaskConfig(
+            description="Superviser et coordonner le travail de l'équipe pour atteindre les objectifs",
+            expected_output="Rapport de supervision et recommandations pour l'équipe",
+            agent=directeur_factory
+        ),
+        TaskConfig(
+            description="Créer un plan détaillé pour le développement du projet",
+            expected_output="Document détaillant les étapes, fonctionnalités et considérations techniques",
+            agent=chef_de_projet
+        ),
+        TaskConfig(
+            description="Écrire le code selon les spécifications, incluant gestion des erreurs et documentation",
+            expected_output="Code fonctionnel et documenté",
+            agent=developpeur
+        ),
+        TaskConfig(
+            description="Tester le code et suggérer des améliorations",
+            expected_output="Rapport de tests avec cas testés et suggestions d'amélioration",
+            agent=testeur
         )
+    ]
 
-        # Création des tâches avec validation
-        task_configs = [
-            TaskConfig(
-                description="Superviser et coordonner le travail de l'équipe pour atteindre les objectifs",
-                expected_output="Rapport de supervision et recommandations pour l'équipe",
-                agent=directeur_factory
-            ),
-            TaskConfig(
-                description="Créer un plan détaillé pour le développement du projet",
-                expected_output="Document détaillant les étapes, fonctionnalités et considérations techniques",
-                agent=chef_de_projet
-            ),
-            TaskConfig(
-                description="Écrire le code selon les spécifications, incluant gestion des erreurs et documentation",
-                expected_output="Code fonctionnel et documenté",
-                agent=developpeur
-            ),
-            TaskConfig(
-                description="Tester le code et suggérer des améliorations",
-                expected_output="Rapport de tests avec cas testés et suggestions d'amélioration",
-                agent=testeur
-            )
-        ]
+def agent_state(agent: Agent) -> dict:
+    """Extrait l'état d'un agent enregistré dans les points de reprise"""
+    return {'role': agent.role, 'goal': agent.goal, 'backstory': agent.backstory}
 
-        # Création des tâches avec callbacks
-        tasks = [
-            create_task(config, create_agent_callback(config.agent.name))
-            for config in task_configs
-        ]
+def with_previous_outputs(description: str, checkpoint: RunCheckpoint) -> str:
+    """Ajoute à une description les sorties des tâches déjà terminées lors d'une reprise"""
+    context = "\n\n".join(f"[{task.agent}]\n{task.output}" for task in checkpoint.tasks)
+    return f"{description}\n\nRésultats des tâches précédentes:\n{context}"
+
+@dataclass
+class WarmKit:
+    """Agents et modèles construits à l'avance par un thread de réserve, en attente d'une configuration"""
+    agents: List[Agent]
+    # Modèle préparé de chaque tâche, par index
+    llms: Dict[int, Any]
+
+    def configure(self, goal: str, backstory: str) -> List[Agent]:
+        """Applique la configuration au Directeur Factory; crewai relit l'objectif à chaque tâche"""
+        directeur_factory = self.agents[0]
+        directeur_factory.goal = goal
+        directeur_factory.backstory = backstory
+        return self.agents
+
+    def attach(self, crew: Crew) -> None:
+        """Rattache les exécuteurs préconstruits à l'équipe; crewai ne met à jour que le prompt et les outils"""
+        for agent in self.agents:
+            if agent.agent_executor is not None:
+                agent.agent_executor.crew = crew
+                agent.agent_executor.step_callback = agent.step_callback or crew.step_callback
+
+def prepare_warm_kit() -> WarmKit:
+    """Préchauffage d'un thread de réserve: clients LLM et exécuteurs d'agents dominent le démarrage"""
+    agents = build_agents(DEFAULT_FACTORY_GOAL, DEFAULT_FACTORY_BACKSTORY)
+    for agent in agents:
+        agent.create_agent_executor()
+    llms = {}
+    if model_router is not None:
+        for index, config in enumerate(build_task_configs(agents)):
+            llms[index] = model_router.prepare(config.agent.role, index)
+    return WarmKit(agents, llms)
 
-        # Notification de début
-        updates_queue.put(json.dumps({
-            'type': 'status',
-            'message': 'Équipe créée, début du travail...',
-            'agent': None
-        }))
-
-        # Création et lancement de l'équipe
-        crew = Crew(
-            agents=[directeur_factory, chef_de_projet, developpeur, testeur],
-            tasks=tasks,
-            verbose=True,
-            process=Process.sequential
+# Démarrée après le fork du processus qui sert les requêtes (gunicorn.conf.py) ou au lancement direct:
+# des threads créés à l'import seraient perdus par un worker forké après un --preload
+crew_workers = WarmPool(prepare=prepare_warm_kit)
+
+def prepare_run(run: CrewRun, resume_from: Optional[RunCheckpoint],
+                kit: Optional[WarmKit] = None) -> Tuple[List[Agent], List[Task]]:
+    """Construit les agents et les tâches restantes d'une exécution, et son point de reprise"""
+    session = run.session
+    make_agents = kit.configure if kit is not None else build_agents
+
+    # Lors d'une reprise, l'état des agents provient du point de reprise
+    if resume_from is not None:
+        directeur_state = resume_from.agents['Directeur Factory']
+        agents = make_agents(directeur_state['goal'], directeur_state['backstory'])
+        resume_from.status = STATUS_RUNNING
+        resume_from.resume_count += 1
+        checkpoint_store.save(resume_from)
+        run.checkpoint = resume_from
+    else:
+        agents = make_agents(session.config.goal, session.config.backstory)
+        run.checkpoint = checkpoint_store.create(
+            run.run_id,
+            session.session_id,
+            {agent.role: agent_state(agent) for agent in agents}
         )
 
-        logger.info("Lancement du travail d'équipe...")
-        result = crew.kickoff()
-        logger.info("Travail d'équipe terminé")
-        
-        # Notification de fin
-        updates_queue.put(json.dumps({
-            'type': 'complete',
-            'message': str(result),
-            'agent': None
-        }, cls=CustomJSONEncoder))
+    # Création des tâches avec validation et callbacks; les tâches déjà terminées sont rejouées
+    completed = set(run.checkpoint.completed_indexes)
+    tasks = []
+    for index, config in enumerate(build_task_configs(agents)):
+        if index in completed:
+            continue
+        if completed:
+            config.description = with_previous_outputs(config.description, run.checkpoint)
+        options = {}
+        if model_router is not None:
+            prepared = kit.llms.get(index) if kit is not None else None
+            options = model_router.route(config.agent, index, run.routing, prepared, run.usage)
+        task = create_task(config, create_agent_callback(config.agent.role, run, index), **options)
+        if run.usage is not None:
+            run.usage.task_labels[str(task.id)] = str(index)
+        tasks.append((index, task))
+    if model_router is not None:
+        # Une fois toutes les tâches routées: un agent chargé de plusieurs tâches choisit son modèle à chaque appel
+        for index, task in tasks:
+            model_router.bind_task(task.agent, task, index)
+    return agents, [task for _, task in tasks]
+
+def run_crew(run: CrewRun, resume_from: Optional[RunCheckpoint] = None, kit: Optional[WarmKit] = None):
+    session = run.session
+    run_registry.start(run)
+    run.worker = 'warm' if kit is not None else 'cold'
+    with tracer.run(run.run_id, session.session_id) as trace:
+        try:
+            run.check_cancelled()
+
+            logger.info("Démarrage de l'équipe...")
+
+            with trace.span('build_crew', 'setup'):
+                agents, tasks = prepare_run(run, resume_from, kit)
+                tracer.bind(trace, agents + tasks)
+                if run.usage is not None:
+                    usage_tracker.bind(run.usage, agents + tasks)
+                run.agents = agents
+
+            # Notification de début
+            publish_event(session, 'status', run_id=run.run_id, message='Équipe créée, début du travail...')
+            for task in run.checkpoint.tasks:
+                publish_event(session, 'task_update', task.agent, run_id=run.run_id, resumed=True,
+                              search_text=task.output,
+                              **output_payload(session, task.agent, task.index, task.output))
+
+            if tasks:
+                # Création et lancement de l'équipe
+                with trace.span('create_crew', 'setup'):
+                    run.crew = Crew(
+                        agents=agents,
+                        tasks=tasks,
+                        verbose=True,
+                        process=Process.sequential,
+                        step_callback=run.check_cancelled
+                    )
+                    if kit is not None:
+                        kit.attach(run.crew)
+
+                run.check_cancelled()
+                logger.info("Lancement du travail d'équipe...")
+                with trace.span('kickoff', 'crew'):
+                    result = str(run.crew.kickoff())
+                logger.info("Travail d'équipe terminé")
+                # Annulée pendant la dernière tâche: ni fin publiée, ni point de reprise clos
+                run.check_cancelled()
+            else:
+                # Toutes les tâches étaient terminées: le résultat est la sortie de la dernière
+                result = run.checkpoint.tasks[-1].output
+
+            checkpoint_store.finish(run.checkpoint, STATUS_COMPLETED, result)
+
+            # Notification de fin
+            publish_event(session, 'complete', run_id=run.run_id, search_text=result, **message_payload(result))
+            run_registry.finish(run, RUN_COMPLETED)
+
+        except Exception as e:
+            if isinstance(e, RunCancelled) or run.stop_event.is_set():
+                # Annulation levée par nos contrôles ou remontée par crewai sous sa propre forme;
+                # le point de reprise reste « en cours »: l'exécution pourra être reprise
+                logger.info(f"Exécution {run.run_id} annulée")
+                run_registry.finish(run, RUN_CANCELLED, run.error)
+            else:
+                error_msg = f"Erreur dans run_crew: {str(e)}"
+                logger.error(error_msg)
+                publish_event(session, 'error', run_id=run.run_id, message=error_msg)
+                if run.checkpoint is not None:
+                    try:
+                        checkpoint_store.finish(run.checkpoint, STATUS_FAILED)
+                    except OSError as oe:
+                        logger.error(f"Erreur lors de l'enregistrement du point de reprise: {str(oe)}")
+                run_registry.finish(run, RUN_FAILED, error_msg)
+
+        finally:
+            if run.usage is not None:
+                usage_tracker.unbind(run.usage)
 
-    except Exception as e:
-        error_msg = f"Erreur dans run_crew: {str(e)}"
-        logger.error(error_msg)
-        updates_queue.put(json.dumps({
-            'type': 'error',
-            'message': error_msg,
-            'agent': None
-        }))
 
 @app.route('/')
 def index():
-    return render_template('index.html')
+    # Attribue la session dès le chargement de la page, avant l'ouverture du flux
+    current_session()
+    # La page ne dépend que des URL versionnées des ressources: elle n'est rendue qu'à leur modification
+    body, etag = rendered_pages.get('index.html', static_assets.fingerprint(), lambda: render_template('index.html'))
+    response = Response(body, mimetype='text/html')
+    response.set_etag(etag)
+    return conditional(response, request)
+
+@app.route('/assets/<digest>/<path:filename>')
+def get_asset(digest, filename):
+    """Ressource statique adressée par son condensat, mise en cache sans limite de durée"""
+    asset = static_assets.get(filename)
+    if asset is None:
+        return jsonify({'error': 'Ressource introuvable'}), 404
+    return static_assets.response(asset, digest, request)
 
 @app.route('/stream')
 def stream():
+    """Flux SSE partagé; l'en-tête Last-Event-ID permet de reprendre après une reconnexion"""
+    session = current_session()
+    last_event_id = request.headers.get('Last-Event-ID', type=int)
+
     def event_stream():
-        while True:
-            try:
-                # Utiliser un timeout de 30 secondes pour éviter le blocage
-                update = updates_queue.queue.get(timeout=30)
-                yield f"data: {update}\n\n"
-            except queue.Empty:
-                # Envoyer un heartbeat pour maintenir la connexion
-                yield f"data: {json.dumps({'type': 'heartbeat'})}\n\n"
-            except Exception as e:
-                logger.error(f"Erreur dans event_stream: {str(e)}")
-                yield f"data: {json.dumps({'type': 'error', 'message': str(e)})}\n\n"
-                continue
-    
-    return Response(event_stream(), mimetype='text/event-stream')
+        # Chaque abonné ne lit que le flux de sa propre session
+        for chunk in session.broadcaster.stream(last_event_id, heartbeat=STREAM_HEARTBEAT):
+            session.touch()
+            yield chunk
+
+    response = Response(event_stream(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+def _if_range_matches(etag: Optional[str]) -> bool:
+    """Une plage conditionnée par If-Range n'est servie que si la représentation n'a pas changé"""
+    if_range = request.if_range
+    if if_range.etag is None and if_range.date is None:
+        return True
+    return etag is not None and if_range.etag == etag
+
+def _range_response(size: int, read, mimetype: str, etag: Optional[str] = None) -> Response:
+    """Construit une réponse gérant les en-têtes Range (une seule plage d'octets) et If-Range;
+    read(start, stop) renvoie des octets ou un itérable de morceaux"""
+    byte_range = request.range
+    if byte_range is not None and not _if_range_matches(etag):
+        byte_range = None
+    if byte_range is not None and byte_range.units == 'bytes' and len(byte_range.ranges) == 1:
+        bounds = byte_range.range_for_length(size)
+        if bounds is None:
+            response = Response(status=416)
+            response.headers['Content-Range'] = f'bytes */{size}'
+            return response
+        start, stop = bounds
+        response = Response(read(start, stop), status=206, mimetype=mimetype)
+        response.headers['Content-Range'] = f'bytes {start}-{stop - 1}/{size}'
+        response.content_length = stop - start
+    else:
+        response = Response(read(0, size), mimetype=mimetype)
+        response.content_length = size
+    response.headers['Accept-Ranges'] = 'bytes'
+    if etag is not None:
+        response.set_etag(etag)
+    return response
+
+@app.route('/snapshots/<int:task_index>')
+def get_snapshot(task_index):
+    """Renvoie la dernière version complète d'une sortie, pour les abonnés dont la base ne correspond pas"""
+    agent = request.args.get('agent', '')
+    snapshot = current_session().versions.get((agent, task_index))
+    if snapshot is None:
+        return jsonify({'error': 'Sortie introuvable'}), 404
+    version, text = snapshot
+    response = jsonify({'agent': agent, 'task_index': task_index, 'version': version, 'text': text})
+    return conditional(response, request, CACHE_PRIVATE_REVALIDATE)
+
+@app.route('/runs/<run_id>')
+def get_run_status(run_id):
+    """Renvoie l'état d'une exécution de la session et sa comptabilité mémoire"""
+    session = current_session()
+    run = run_registry.get(run_id)
+    if run is not None and run.session.session_id == session.session_id:
+        return conditional(jsonify(run.to_dict()), request, CACHE_PRIVATE_REVALIDATE)
+    # Exécution oubliée par le registre: son point de reprise fait foi
+    checkpoint = checkpoint_store.load(run_id)
+    if checkpoint is None or checkpoint.session_id != session.session_id:
+        return jsonify({'error': 'Exécution introuvable'}), 404
+    return jsonify({
+        'run_id': checkpoint.run_id,
+        'session_id': checkpoint.session_id,
+        'status': checkpoint.status,
+        'completed_tasks': len(checkpoint.tasks)
+    })
+
+def tracemalloc_report(limit: int) -> dict:
+    """Principaux détenteurs de mémoire; le suivi, coûteux, n'est jamais démarré par une requête"""
+    if not tracemalloc.is_tracing():
+        return {'enabled': False, 'message': "Suivi désactivé: démarrer le serveur avec CREW_TRACEMALLOC=1"}
+    snapshot = tracemalloc.take_snapshot().filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    ))
+    top = [
+        {'location': str(stat.traceback), 'size_kb': round(stat.size / 1024, 1), 'count': stat.count}
+        for stat in snapshot.statistics('lineno')[:limit]
+    ]
+    traced_current, traced_peak = tracemalloc.get_traced_memory()
+    return {'enabled': True, 'current_kb': traced_current // 1024, 'peak_kb': traced_peak // 1024, 'top': top}
+
+def current_rss_kb() -> Optional[int]:
+    """Mémoire résidente du processus en kio (Linux), lue par le générateur de charge en mode --url"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+@app.route('/debug/memory')
+def debug_memory():
+    """Vue mémoire: principaux détenteurs selon tracemalloc, exécutions, sessions et tampons"""
+    limit = request.args.get('limit', 20, type=int)
+    runs = sorted(run_registry.runs(), key=lambda run: run.event_bytes + run.output_bytes, reverse=True)
+    sessions = session_manager.sessions()
+    return jsonify({
+        'tracemalloc': tracemalloc_report(limit),
+        # Vue sans authentification: l'identifiant de session, seul secret d'accès à une session, n'y figure pas
+        'runs': {**run_registry.summary(), 'top': [
+            {key: value for key, value in run.to_dict().items() if key != 'session_id'} for run in runs[:limit]
+        ]},
+        'sessions': {
+            'count': len(sessions),
+            'buffered_bytes': sum(session.broadcaster.buffered_bytes for session in sessions)
+        },
+        'blob_store': {'memory_bytes': blob_store.memory_bytes, 'disk_bytes': blob_store.disk_bytes},
+        'warm_workers': crew_workers.stats(),
+        'event_log': event_log.stats(),
+        'threads': threading.active_count(),
+        'rss_kb': current_rss_kb()
+    })
+
+@app.route('/runs/<run_id>/trace')
+def get_run_trace(run_id):
+    """Renvoie la trace d'une exécution de la session au format Chrome trace"""
+    trace = tracer.get(run_id)
+    if trace is None or trace.get('otherData', {}).get('session_id') != current_session().session_id:
+        return jsonify({'error': 'Trace introuvable'}), 404
+    return jsonify(trace)
+
+def parse_time(value: Optional[str]) -> Optional[float]:
+    """Instant d'une recherche: secondes depuis l'epoch ou date ISO 8601 (heure locale, comme les événements)"""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+@app.route('/events/search')
+def search_events():
+    """Recherche dans le journal des événements de la session: exécution, agent, type, période et texte (q)"""
+    args = request.args
+    try:
+        since, until = parse_time(args.get('since')), parse_time(args.get('until'))
+    except ValueError as e:
+        return jsonify({'error': f"Date invalide: {str(e)}"}), 400
+    order = args.get('order', 'asc')
+    if order not in ('asc', 'desc'):
+        return jsonify({'error': "Ordre invalide: asc ou desc attendu"}), 400
+    return jsonify(event_log.query(
+        session_id=current_session().session_id,
+        run_id=args.get('run_id'),
+        agent=args.get('agent'),
+        event_type=args.get('type'),
+        since=since,
+        until=until,
+        text=args.get('q'),
+        limit=args.get('limit', DEFAULT_QUERY_LIMIT, type=int),
+        cursor=args.get('cursor', type=int),
+        descending=order == 'desc'
+    ))
+
+def run_artifacts(run_id: str) -> Optional[RunArtifacts]:
+    """Livrables d'une exécution de la session, reconstruits seulement lorsque son point de reprise a changé"""
+    entry = checkpoint_store.entry(run_id)
+    if entry is None or entry[0] != current_session().session_id:
+        return None
+    artifacts = cached_run_artifacts(run_id, entry[2], lambda: checkpoint_store.load(run_id))
+    if artifacts is None or artifacts.checkpoint.session_id != entry[0]:
+        return None
+    return artifacts
+
+@app.route('/runs/<run_id>/artifacts')
+def list_run_artifacts(run_id):
+    """Liste les livrables d'une exécution avec leur taille et leur condensat"""
+    artifacts = run_artifacts(run_id)
+    if artifacts is None:
+        return jsonify({'error': 'Exécution introuvable'}), 404
+    manifest = artifacts.manifest()
+    for entry in manifest['artifacts']:
+        entry['url'] = f"/runs/{run_id}/artifacts/{entry['name']}"
+    manifest['zip_url'] = f"/runs/{run_id}/artifacts.zip"
+    return conditional(jsonify(manifest), request, CACHE_PRIVATE_REVALIDATE)
+
+@app.route('/runs/<run_id>/artifacts/<path:name>')
+def get_run_artifact(run_id, name):
+    """Renvoie un livrable par morceaux, avec prise en charge des requêtes partielles"""
+    artifacts = run_artifacts(run_id)
+    artifact = artifacts.get(name) if artifacts is not None else None
+    if artifact is None:
+        return jsonify({'error': 'Livrable introuvable'}), 404
+    response = _range_response(
+        artifact.size,
+        lambda start, stop: iter_chunks(artifact.data, start, stop),
+        artifact.mimetype,
+        etag=artifact.digest
+    )
+    return conditional(response, request, CACHE_PRIVATE_REVALIDATE)
+
+@app.route('/runs/<run_id>/artifacts.zip')
+def download_run_artifacts(run_id):
+    """Archive zip des livrables, produite au fil de l'eau; une plage permet de reprendre un téléchargement"""
+    artifacts = run_artifacts(run_id)
+    if artifacts is None:
+        return jsonify({'error': 'Exécution introuvable'}), 404
+    if request.range is None:
+        # Taille inconnue à l'avance: transfert par morceaux, sans mise en mémoire de l'archive
+        response = Response(artifacts.iter_zip(), mimetype='application/zip')
+        response.headers['Accept-Ranges'] = 'bytes'
+        response.set_etag(artifacts.etag)
+    else:
+        response = _range_response(artifacts.zip_size(), artifacts.read_zip, 'application/zip', etag=artifacts.etag)
+    response.headers['Content-Disposition'] = f'attachment; filename="{run_id}.zip"'
+    return conditional(response, request, CACHE_PRIVATE_REVALIDATE)
+
+@app.route('/blobs/<blob_id>')
+def get_blob(blob_id):
+    """Renvoie le contenu d'un blob, avec prise en charge des requêtes partielles"""
+    if not BlobStore.is_valid_id(blob_id):
+        return jsonify({'error': 'Identifiant de blob invalide'}), 400
+    size = blob_store.size(blob_id)
+    if size is None:
+        return jsonify({'error': 'Blob introuvable'}), 404
+    response = _range_response(
+        size,
+        lambda start, stop: blob_store.read(blob_id, start, stop),
+        'text/plain; charset=utf-8',
+        etag=blob_id
+    )
+    # Le contenu étant adressé par son condensat, il est immuable
+    response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
 
 @app.route('/api/team-status')
 def get_team_status():
@@ -407,32 +1039,93 @@ def get_team_status():
             'tasksPending': 5
         }
 
-        return jsonify({
+        return conditional(jsonify({
             'members': team_members,
             'metrics': metrics
-        })
+        }), request)
     except Exception as e:
         logger.error(f"Erreur lors de la récupération du statut de l'équipe: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+def _ws_restart(session: Session, message: dict) -> dict:
+    """Opération de contrôle WebSocket: redémarre l'équipe de la session du canal"""
+    return {'run_id': start_crew(session).run_id}
+
+def _ws_update_goal(session: Session, message: dict) -> dict:
+    """Opération de contrôle WebSocket: met à jour l'objectif puis redémarre l'équipe"""
+    goal = message.get('goal')
+    if not goal or not isinstance(goal, str):
+        raise ValueError("Goal manquant")
+    session.config.update(goal=goal)
+    logger.info(f"Objectif du Directeur Factory mis à jour: {goal[:100]}...")
+    return _ws_restart(session, message)
+
+def _ws_update_backstory(session: Session, message: dict) -> dict:
+    """Opération de contrôle WebSocket: met à jour l'histoire puis redémarre l'équipe"""
+    backstory = message.get('backstory')
+    if not backstory or not isinstance(backstory, str):
+        raise ValueError("Backstory manquante")
+    session.config.update(backstory=backstory)
+    logger.info(f"Histoire du Directeur Factory mise à jour: {backstory[:100]}...")
+    return _ws_restart(session, message)
+
+WS_CONTROLS = {
+    'restart': _ws_restart,
+    'update_goal': _ws_update_goal,
+    'update_backstory': _ws_update_backstory
+}
+
+def _ws_resolve_session(session_id: str) -> Optional[Session]:
+    """Un identifiant de session donne accès à son flux, comme l'en-tête X-Session-ID"""
+    if not is_valid_session_id(session_id):
+        return None
+    try:
+        return session_manager.get_or_create(session_id)
+    except TooManySessions as e:
+        raise ValueError(str(e)) from None
+
+if Sock is not None:
+    sock = Sock(app)
+
+    @sock.route('/ws')
+    def websocket(ws):
+        """Connexion WebSocket multiplexant les flux de plusieurs sessions et exécutions"""
+        mux = ChannelMultiplexer(
+            current_session(),
+            _ws_resolve_session,
+            WS_CONTROLS,
+            compress=request.args.get('compress') == '1'
+        )
+        serve_websocket(ws, mux, heartbeat=STREAM_HEARTBEAT)
+else:
+    logger.info("flask-sock indisponible: transport WebSocket désactivé, /stream reste disponible")
+
 @app.route("/health")
 def health_check():
     return {"status": "healthy"}, 200
 
+@app.errorhandler(TooManySessions)
+def too_many_sessions(error):
+    """Serveur saturé: aucune session occupée ne peut être évincée pour en créer une nouvelle"""
+    return capacity_response(error)
+
 @app.after_request
 def after_request(response):
-    """Ajoute les headers CORS nécessaires"""
+    """Ajoute les headers CORS nécessaires, le cookie de session et compresse les réponses non diffusées"""
+    session = g.get('session')
+    if session is not None and request.cookies.get(SESSION_COOKIE) != session.session_id:
+        response.set_cookie(SESSION_COOKIE, session.session_id, max_age=SESSION_TTL, httponly=True, samesite='Lax')
     response.headers.add('Access-Control-Allow-Origin', '*')
     response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization')
     response.headers.add('Access-Control-Allow-Methods', 'GET,PUT,POST,DELETE,OPTIONS')
-    return response
+    return compress_response(response, request.accept_encodings)
 
 if __name__ == '__main__':
     try:
-        # Démarrage initial du thread pour l'exécution de l'équipe
-        crew_thread = threading.Thread(target=run_crew)
-        crew_thread.daemon = True
-        crew_thread.start()
+        # Sous gunicorn, la réserve est démarrée dans chaque worker par gunicorn.conf.py (post_fork)
+        crew_workers.start()
+        # Démarrage initial de l'équipe pour la session par défaut
+        start_crew(session_manager.get_or_create('default'))
         
         # Utilisation du port 5001 au lieu de 5000
         logger.info("Démarrage du serveur Flask sur le port 5001...")
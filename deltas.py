@@ -0,0 +1,115 @@
+"""
+Diffusion incrémentale des sorties de tâches: chaque nouvelle version d'une sortie (agent, tâche)
+est transmise sous forme de différence avec la version précédente diffusée dans la session.
+
+Une différence est une liste d'opérations appliquées à la version de base:
+    entier positif n  -> recopier n unités de la base
+    entier négatif -n -> sauter n unités de la base
+    chaîne            -> insérer le texte
+Les longueurs sont exprimées en unités UTF-16, comme les chaînes JavaScript du tableau de bord.
+"""
+
+import difflib
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Hashable, List, Optional, Tuple, Union
+
+# En dessous de cette taille, la sortie complète est envoyée directement
+DELTA_MIN_CHARS = 256
+# Une différence plus grande que cette fraction du texte complet n'est pas rentable
+DELTA_MAX_RATIO = 0.5
+# Nombre de sorties (agent, tâche) dont la dernière version est conservée par session
+MAX_TRACKED_OUTPUTS = 64
+
+Op = Union[int, str]
+
+def utf16_len(text: str) -> int:
+    """Longueur d'un texte en unités UTF-16 (String.length en JavaScript)"""
+    return len(text.encode('utf-16-le')) // 2
+
+_WORDS = re.compile(r'\s+|\S+')
+
+def compute_delta(old: str, new: str) -> List[Op]:
+    """Calcule les opérations transformant old en new, par lignes puis par mots dans les lignes modifiées"""
+    ops: List[Op] = []
+
+    def push(op: Op) -> None:
+        # Fusionne les opérations consécutives de même nature
+        if ops and type(ops[-1]) is type(op) and (isinstance(op, str) or (ops[-1] > 0) == (op > 0)):
+            ops[-1] += op
+        elif op:
+            ops.append(op)
+
+    def diff(old_tokens: List[str], new_tokens: List[str], refine: bool) -> None:
+        matcher = difflib.SequenceMatcher(None, old_tokens, new_tokens, autojunk=False)
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+            if tag == 'equal':
+                push(utf16_len(''.join(old_tokens[i1:i2])))
+            elif tag == 'replace' and refine:
+                diff(_WORDS.findall(''.join(old_tokens[i1:i2])), _WORDS.findall(''.join(new_tokens[j1:j2])), False)
+            else:
+                push(-utf16_len(''.join(old_tokens[i1:i2])))
+                push(''.join(new_tokens[j1:j2]))
+
+    diff(old.splitlines(keepends=True), new.splitlines(keepends=True), True)
+    return ops
+
+def apply_delta(base: str, ops: List[Op]) -> str:
+    """Applique des opérations à un texte de base (équivalent Python du correctif côté client)"""
+    units = base.encode('utf-16-le')
+    position = 0
+    parts = []
+    for op in ops:
+        if isinstance(op, str):
+            parts.append(op)
+        elif op > 0:
+            parts.append(units[position * 2:(position + op) * 2].decode('utf-16-le'))
+            position += op
+        else:
+            position -= op
+    return ''.join(parts)
+
+def delta_size(ops: List[Op]) -> int:
+    """Estimation de la taille encodée des opérations"""
+    return sum(len(op) + 3 if isinstance(op, str) else 8 for op in ops)
+
+@dataclass(frozen=True)
+class TextUpdate:
+    """Nouvelle version d'une sortie et, lorsqu'elle est rentable, sa différence avec la précédente"""
+    version: int
+    base_version: Optional[int] = None
+    ops: Optional[List[Op]] = None
+    length: int = 0
+
+class TextVersions:
+    """Dernière version diffusée de chaque sortie d'une session, bornée en nombre de sorties"""
+    def __init__(self, max_outputs: int = MAX_TRACKED_OUTPUTS, min_chars: int = DELTA_MIN_CHARS,
+                 max_ratio: float = DELTA_MAX_RATIO):
+        self.max_outputs = max_outputs
+        self.min_chars = min_chars
+        self.max_ratio = max_ratio
+        self._outputs: 'OrderedDict[Hashable, Tuple[int, str]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def update(self, key: Hashable, text: str, use_delta: bool = True) -> TextUpdate:
+        """Enregistre une nouvelle version et calcule la différence avec la précédente"""
+        with self._lock:
+            previous = self._outputs.get(key)
+            version = previous[0] + 1 if previous else 1
+            self._outputs[key] = (version, text)
+            self._outputs.move_to_end(key)
+            while len(self._outputs) > self.max_outputs:
+                self._outputs.popitem(last=False)
+        if not use_delta or previous is None or len(text) < self.min_chars:
+            return TextUpdate(version)
+        ops = compute_delta(previous[1], text)
+        if delta_size(ops) > self.max_ratio * len(text.encode('utf-8')):
+            return TextUpdate(version)
+        return TextUpdate(version, previous[0], ops, utf16_len(text))
+
+    def get(self, key: Hashable) -> Optional[Tuple[int, str]]:
+        """Renvoie (version, texte) de la dernière version d'une sortie"""
+        with self._lock:
+            return self._outputs.get(key)
@@ -0,0 +1,680 @@
+"""
+Journal des événements d'exécution: segments JSONL en ajout seul, chacun accompagné d'un index
+compact (session, exécution, agent, type, horodatage) et d'un index inversé des termes des messages.
+Les recherches n'ouvrent que les segments dont le résumé (valeurs, période, filtre de Bloom des termes)
+peut correspondre, puis ne lisent que les lignes retenues par l'index. Les petits segments sont
+fusionnés et les plus anciens supprimés selon la rétention. Lorsque le texte complet d'un événement
+n'y figure pas (sortie volumineuse réduite à un aperçu), ses termes sont conservés dans la ligne.
+"""
+
+import base64
+import bisect
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+import unicodedata
+from array import array
+from collections import OrderedDict
+from dataclasses import dataclass, field, replace
+from itertools import accumulate
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - dépendance optionnelle
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+EVENT_LOG_DIR = 'event_log'
+# Taille au-delà de laquelle le segment courant est scellé et un nouveau segment ouvert
+SEGMENT_MAX_BYTES = 8 * 1024 * 1024
+# Âge au-delà duquel le segment courant est aussi scellé, afin que la rétention s'applique à faible trafic
+SEGMENT_MAX_AGE_HOURS = 24
+# Rétention: âge maximal des événements et taille totale du journal
+RETENTION_DAYS = 7
+MAX_LOG_BYTES = 1024 * 1024 * 1024
+# Intervalle de la maintenance périodique (rétention, fusion), qui s'applique aussi sans nouvel événement
+MAINTENANCE_INTERVAL_S = 3600
+# Nombre d'index de segments scellés conservés en mémoire
+MAX_CACHED_INDEXES = 8
+# Nombre maximal de termes indexés par événement
+MAX_TERMS_PER_EVENT = 256
+# Filtre de Bloom des termes de chaque segment (environ 1 % de faux positifs)
+TERM_FILTER_BITS_PER_TERM = 10
+TERM_FILTER_HASHES = 7
+DEFAULT_QUERY_LIMIT = 100
+MAX_QUERY_LIMIT = 1000
+
+# Version du format des index; un index d'une autre version est reconstruit à partir du segment
+INDEX_VERSION = 1
+# Champs indexés: les valeurs de chaque segment sont reprises dans son résumé
+INDEXED_FIELDS = ('session', 'run_id', 'agent', 'type')
+
+_TERM_PATTERN = re.compile(r'\w{2,}')
+
+_loads = orjson.loads if orjson is not None else json.loads
+
+def _dumps(data) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+def tokenize(text: str) -> List[str]:
+    """Termes d'un texte, en minuscules et sans accents, dans leur ordre d'apparition"""
+    ascii_text = unicodedata.normalize('NFKD', text or '').encode('ascii', 'ignore').decode('ascii')
+    return list(dict.fromkeys(_TERM_PATTERN.findall(ascii_text.lower())))
+
+def event_text(event: dict) -> str:
+    """Texte recherchable d'un événement: message, erreur ou texte inséré par une différence"""
+    parts = [str(event[key]) for key in ('message', 'error') if event.get(key)]
+    delta = event.get('delta')
+    if isinstance(delta, dict):
+        parts.extend(op for op in delta.get('ops', []) if isinstance(op, str))
+    return '\n'.join(parts)
+
+def _delta_encode(values: Sequence[int]) -> List[int]:
+    return [value - previous for previous, value in zip([0, *values], values)]
+
+def _delta_decode(values: List[int]) -> array:
+    return array('q', accumulate(values))
+
+class TermFilter:
+    """Filtre de Bloom des termes d'un segment: écarte sans lire son index un segment qui ne contient pas un terme"""
+    def __init__(self, bits: bytearray, hashes: int = TERM_FILTER_HASHES):
+        self.bits = bits
+        self.hashes = hashes
+
+    @classmethod
+    def build(cls, terms: Iterable[str], count: int) -> 'TermFilter':
+        term_filter = cls(bytearray(max(8, (count * TERM_FILTER_BITS_PER_TERM + 7) // 8)))
+        for term in terms:
+            for position in term_filter._positions(term):
+                term_filter.bits[position >> 3] |= 1 << (position & 7)
+        return term_filter
+
+    def _positions(self, term: str) -> Iterable[int]:
+        digest = hashlib.blake2b(term.encode('utf-8'), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:], 'little') | 1
+        size = len(self.bits) * 8
+        return ((first + i * second) % size for i in range(self.hashes))
+
+    def __contains__(self, term: str) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(term))
+
+    def to_str(self) -> str:
+        return base64.b64encode(bytes(self.bits)).decode('ascii')
+
+    @classmethod
+    def from_str(cls, data: str) -> 'TermFilter':
+        return cls(bytearray(base64.b64decode(data)))
+
+@dataclass
+class SegmentInfo:
+    """Résumé d'un segment, conservé en mémoire pour écarter les segments sans lire leur index"""
+    first_seq: int
+    count: int = 0
+    size: int = 0
+    first_ts: Optional[int] = None
+    last_ts: Optional[int] = None
+    values: Dict[str, Set[str]] = field(default_factory=lambda: {name: set() for name in INDEXED_FIELDS})
+    # Absent pour le segment courant, dont les termes sont en mémoire
+    terms_filter: Optional[TermFilter] = None
+
+    @property
+    def last_seq(self) -> int:
+        return self.first_seq + self.count - 1
+
+    def may_match(self, filters: Dict[str, str], since: Optional[int], until: Optional[int],
+                  terms: List[str]) -> bool:
+        if self.count == 0:
+            return False
+        if since is not None and self.last_ts < since:
+            return False
+        if until is not None and self.first_ts >= until:
+            return False
+        if not all(value in self.values[name] for name, value in filters.items()):
+            return False
+        return self.terms_filter is None or all(term in self.terms_filter for term in terms)
+
+    def to_dict(self) -> dict:
+        return {
+            'version': INDEX_VERSION, 'first_seq': self.first_seq, 'count': self.count, 'size': self.size,
+            'first_ts': self.first_ts, 'last_ts': self.last_ts,
+            'values': {name: sorted(values) for name, values in self.values.items()},
+            'terms_filter': self.terms_filter.to_str() if self.terms_filter is not None else None
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'SegmentInfo':
+        if data.get('version') != INDEX_VERSION:
+            raise ValueError(f"Version d'index non prise en charge: {data.get('version')}")
+        terms_filter = TermFilter.from_str(data['terms_filter']) if data.get('terms_filter') else None
+        return cls(data['first_seq'], data['count'], data['size'], data['first_ts'], data['last_ts'],
+                   {name: set(data['values'].get(name, [])) for name in INDEXED_FIELDS}, terms_filter)
+
+class SegmentIndex:
+    """Index d'un segment: position et horodatage de chaque ligne, occurrences par valeur de champ et par terme.
+    Les termes d'un segment scellé restent sur disque (fichier .terms): seules leurs occurrences demandées sont lues."""
+    def __init__(self, info: SegmentInfo):
+        self.info = info
+        self.offsets = array('q')
+        self.timestamps = array('q')
+        self.postings: Dict[str, Dict[str, Sequence[int]]] = {name: {} for name in INDEXED_FIELDS}
+        self.terms: Optional[Dict[str, Sequence[int]]] = {}
+        self.terms_path: Optional[str] = None
+        # Répertoire des termes (position et longueur de leurs occurrences), relu si le fichier a été remplacé
+        self._directory: Optional[Tuple[int, int, Dict[str, List[int]], int]] = None
+
+    def add(self, offset: int, length: int, ts: int, keys: Dict[str, Optional[str]], terms: Iterable[str]) -> None:
+        ordinal = len(self.offsets)
+        self.offsets.append(offset)
+        self.timestamps.append(ts)
+        for name, value in keys.items():
+            if value is not None:
+                self.postings[name].setdefault(value, array('q')).append(ordinal)
+                self.info.values[name].add(value)
+        for term in terms:
+            self.terms.setdefault(term, array('q')).append(ordinal)
+        info = self.info
+        info.count += 1
+        info.size = offset + length
+        info.first_ts = ts if info.first_ts is None else info.first_ts
+        info.last_ts = ts
+
+    def extend(self, other: 'SegmentIndex') -> None:
+        """Ajoute à la suite l'index du segment suivant (fusion de segments contigus)"""
+        base_ordinal, base_offset = len(self.offsets), self.info.size
+        self.offsets.extend(offset + base_offset for offset in other.offsets)
+        self.timestamps.extend(other.timestamps)
+        for name, postings in other.postings.items():
+            for value, ordinals in postings.items():
+                self.postings[name].setdefault(value, array('q')).extend(o + base_ordinal for o in ordinals)
+        for term, ordinals in other.all_terms().items():
+            self.terms.setdefault(term, array('q')).extend(o + base_ordinal for o in ordinals)
+        for name, values in other.info.values.items():
+            self.info.values[name] |= values
+        self.info.count += other.info.count
+        self.info.size += other.info.size
+        if other.info.count:
+            self.info.first_ts = other.info.first_ts if self.info.first_ts is None else self.info.first_ts
+            self.info.last_ts = other.info.last_ts
+
+    def _term_postings(self, terms: List[str]) -> List[Sequence[int]]:
+        if self.terms is not None:
+            return [self.terms.get(term, ()) for term in terms]
+        with open(self.terms_path, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            directory = self._directory
+            if directory is None or directory[:2] != (stat.st_ino, stat.st_mtime_ns):
+                header = f.readline()
+                directory = (stat.st_ino, stat.st_mtime_ns, _loads(header), len(header))
+                self._directory = directory
+            postings = []
+            for term in terms:
+                entry = directory[2].get(term)
+                if entry is None:
+                    postings.append(())
+                    continue
+                f.seek(directory[3] + entry[0])
+                postings.append(_delta_decode(_loads(f.read(entry[1]))))
+            return postings
+
+    def all_terms(self) -> Dict[str, Sequence[int]]:
+        if self.terms is not None:
+            return self.terms
+        with open(self.terms_path, 'rb') as f:
+            directory = _loads(f.readline())
+        return dict(zip(directory, self._term_postings(list(directory))))
+
+    def candidates(self, filters: Dict[str, str], terms: List[str], since: Optional[int], until: Optional[int],
+                   lo: int = 0, hi: Optional[int] = None) -> List[int]:
+        """Lignes du segment qui satisfont tous les critères, dans l'ordre, entre les lignes lo et hi"""
+        hi = self.info.count if hi is None else hi
+        if since is not None:
+            lo = max(lo, bisect.bisect_left(self.timestamps, since, 0, hi))
+        if until is not None:
+            hi = min(hi, bisect.bisect_left(self.timestamps, until, 0, hi))
+        if lo >= hi:
+            return []
+        lists = [self.postings[name].get(value, ()) for name, value in filters.items()]
+        if terms:
+            lists += self._term_postings(terms)
+        if not lists:
+            return list(range(lo, hi))
+        lists.sort(key=len)
+        smallest = lists[0]
+        selected = list(smallest[bisect.bisect_left(smallest, lo):bisect.bisect_left(smallest, hi)])
+        for ordinals in lists[1:]:
+            if not selected:
+                break
+            members = set(ordinals[bisect.bisect_left(ordinals, selected[0]):bisect.bisect_right(ordinals, selected[-1])])
+            selected = [ordinal for ordinal in selected if ordinal in members]
+        return selected
+
+    def encode(self) -> Tuple[bytes, bytes]:
+        """Index (résumé sur la première ligne, seule lue à l'ouverture) et fichier des termes"""
+        body = {
+            'offsets': _delta_encode(self.offsets),
+            'timestamps': _delta_encode(self.timestamps),
+            'postings': {name: {value: _delta_encode(ordinals) for value, ordinals in postings.items()}
+                         for name, postings in self.postings.items()}
+        }
+        directory, chunks, position = {}, [], 0
+        for term in sorted(self.terms):
+            chunk = _dumps(_delta_encode(self.terms[term]))
+            directory[term] = [position, len(chunk)]
+            chunks.append(chunk)
+            position += len(chunk)
+        return (b'%s\n%s\n' % (_dumps(self.info.to_dict()), _dumps(body)),
+                b'%s\n%s' % (_dumps(directory), b''.join(chunks)))
+
+    @classmethod
+    def decode(cls, data: bytes, terms_path: str) -> 'SegmentIndex':
+        header, body = data.split(b'\n', 2)[:2]
+        index = cls(SegmentInfo.from_dict(_loads(header)))
+        content = _loads(body)
+        index.offsets = _delta_decode(content['offsets'])
+        index.timestamps = _delta_decode(content['timestamps'])
+        for name, postings in content['postings'].items():
+            index.postings[name] = {value: _delta_decode(ordinals) for value, ordinals in postings.items()}
+        index.release_terms(terms_path)
+        return index
+
+    def release_terms(self, terms_path: str) -> None:
+        """Une fois le fichier des termes écrit, les occurrences des termes ne sont plus gardées en mémoire"""
+        self.terms = None
+        self.terms_path = terms_path
+
+def _record_keys(session_id: str, event: dict) -> Dict[str, Optional[str]]:
+    return {
+        'session': session_id,
+        'run_id': event.get('run_id'),
+        'agent': event.get('agent'),
+        'type': event.get('type')
+    }
+
+class EventLog:
+    """Journal segmenté des événements d'exécution, interrogeable par critères, période et texte.
+    Un seul processus écrit dans un répertoire donné (le serveur s'exécute avec un seul worker)."""
+    def __init__(self, directory: str = EVENT_LOG_DIR, segment_max_bytes: int = SEGMENT_MAX_BYTES,
+                 retention_days: float = RETENTION_DAYS, max_bytes: int = MAX_LOG_BYTES,
+                 maintenance_interval: float = MAINTENANCE_INTERVAL_S):
+        self.directory = directory
+        self.segment_max_bytes = segment_max_bytes
+        self.retention_days = retention_days
+        self.max_bytes = max_bytes
+        self.maintenance_interval = maintenance_interval
+        self._sealed: List[SegmentInfo] = []
+        self._active: Optional[SegmentIndex] = None
+        self._file = None
+        self._next_seq = 0
+        self._last_ts = 0
+        self._opened = False
+        self._indexes: 'OrderedDict[Tuple[int, int], SegmentIndex]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._cache_lock = threading.Lock()
+        self._maintenance_lock = threading.Lock()
+        self._stopped = threading.Event()
+
+    def _path(self, first_seq: int, suffix: str) -> str:
+        return os.path.join(self.directory, f"{first_seq:012d}{suffix}")
+
+    # Ouverture et écriture
+
+    def _open_locked(self) -> None:
+        """Charge les résumés des segments existants; un segment sans index valide (arrêt brutal) est réindexé"""
+        if self._opened:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        infos = []
+        for name in sorted(os.listdir(self.directory)):
+            if name.endswith('.tmp'):
+                # Écriture interrompue: le fichier définitif est intact
+                os.remove(os.path.join(self.directory, name))
+            elif name.endswith('.log') and name[:-4].isdigit():
+                info = self._load_info(int(name[:-4]))
+                if info is not None:
+                    infos.append(info)
+        # Une fusion interrompue laisse des segments déjà inclus dans le segment fusionné
+        infos.sort(key=lambda info: (info.first_seq, -info.count))
+        for info in infos:
+            if self._sealed and info.last_seq <= self._sealed[-1].last_seq:
+                self._remove_files(info.first_seq)
+            else:
+                self._sealed.append(info)
+        self._next_seq = self._sealed[-1].last_seq + 1 if self._sealed else 0
+        self._last_ts = max((info.last_ts for info in self._sealed), default=0)
+        self._opened = True
+        # Segments laissés par les démarrages précédents: rétention et fusion sans retarder l'appelant
+        if self._sealed:
+            self._maintain_in_background()
+        # Ouverture au premier accès, donc dans le processus qui sert les requêtes
+        if self.maintenance_interval:
+            threading.Thread(target=self._maintain_periodically, name='event-log-maintenance', daemon=True).start()
+
+    def _load_info(self, first_seq: int) -> Optional[SegmentInfo]:
+        size = os.path.getsize(self._path(first_seq, '.log'))
+        try:
+            with open(self._path(first_seq, '.idx'), 'rb') as f:
+                info = SegmentInfo.from_dict(_loads(f.readline()))
+            if info.first_seq == first_seq and info.size == size and os.path.exists(self._path(first_seq, '.terms')):
+                return info
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+        index = self._rebuild(first_seq)
+        if index.info.count == 0:
+            self._remove_files(first_seq)
+            return None
+        self._write_index(index)
+        logger.info(f"Segment du journal réindexé: {first_seq} ({index.info.count} événements)")
+        return index.info
+
+    def _rebuild(self, first_seq: int) -> SegmentIndex:
+        """Reconstruit l'index d'un segment en le relisant; une dernière ligne incomplète est tronquée"""
+        index = SegmentIndex(SegmentInfo(first_seq))
+        log_path = self._path(first_seq, '.log')
+        offset = 0
+        with open(log_path, 'rb') as f:
+            for line in f:
+                try:
+                    if not line.endswith(b'\n'):
+                        raise ValueError("ligne incomplète")
+                    record = _loads(line)
+                    event = record['event']
+                except (ValueError, KeyError, TypeError):
+                    break
+                terms = record.get('terms')
+                if not isinstance(terms, list):
+                    terms = tokenize(event_text(event))[:MAX_TERMS_PER_EVENT]
+                index.add(offset, len(line), record['ts'], _record_keys(record.get('session'), event), terms)
+                offset += len(line)
+        if offset < os.path.getsize(log_path):
+            logger.warning(f"Segment du journal {first_seq} tronqué à {offset} octets")
+            with open(log_path, 'r+b') as f:
+                f.truncate(offset)
+        return index
+
+    def _write_index(self, index: SegmentIndex) -> None:
+        """Écrit les termes puis l'index (fichiers temporaires, fsync puis renommage); l'index fait foi"""
+        index.info.terms_filter = TermFilter.build(index.terms, len(index.terms))
+        data, terms = index.encode()
+        terms_path = self._path(index.info.first_seq, '.terms')
+        for path, content in ((terms_path, terms), (self._path(index.info.first_seq, '.idx'), data)):
+            with open(f"{path}.tmp", 'wb') as f:
+                f.write(content)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(f"{path}.tmp", path)
+        index.release_terms(terms_path)
+
+    def _remove_files(self, first_seq: int) -> None:
+        for suffix in ('.log', '.idx', '.terms'):
+            try:
+                os.remove(self._path(first_seq, suffix))
+            except FileNotFoundError:
+                pass
+        with self._cache_lock:
+            for key in [key for key in self._indexes if key[0] == first_seq]:
+                del self._indexes[key]
+
+    def append(self, session_id: str, event: dict, data: bytes, text: Optional[str] = None) -> int:
+        """Ajoute un événement déjà encodé en JSON (data) et renvoie son numéro de séquence;
+        text, s'il est fourni, est indexé en plus du texte de l'événement (sortie complète d'un aperçu)"""
+        searchable = event_text(event) if text is None else f"{event_text(event)}\n{text}"
+        terms = tokenize(searchable)[:MAX_TERMS_PER_EVENT]
+        # Les termes absents de l'événement lui-même accompagnent la ligne, pour une réindexation fidèle
+        extra = b'' if text is None else b'"terms":%s,' % _dumps(terms)
+        sealed = False
+        with self._lock:
+            self._open_locked()
+            if self._active is None:
+                self._active = SegmentIndex(SegmentInfo(self._next_seq))
+                self._file = open(self._path(self._next_seq, '.log'), 'ab')
+            # Horodatages croissants au sein du journal: les recherches par période procèdent par dichotomie
+            self._last_ts = max(self._last_ts, int(time.time() * 1000))
+            line = b'{"ts":%d,"session":%s,%s"event":%s}\n' % (self._last_ts, _dumps(session_id), extra, data)
+            self._file.write(line)
+            self._file.flush()
+            self._active.add(self._active.info.size, len(line), self._last_ts, _record_keys(session_id, event), terms)
+            seq = self._next_seq
+            self._next_seq += 1
+            info = self._active.info
+            if (info.size >= self.segment_max_bytes
+                    or info.last_ts - info.first_ts >= SEGMENT_MAX_AGE_HOURS * 3600 * 1000):
+                self._seal_locked()
+                sealed = True
+        if sealed:
+            self._maintain_in_background()
+        return seq
+
+    def _maintain_in_background(self) -> None:
+        threading.Thread(target=self._maintain_safely, name='event-log-maintenance', daemon=True).start()
+
+    def _maintain_safely(self) -> None:
+        try:
+            self.maintain()
+        except OSError as e:
+            logger.error(f"Maintenance du journal des événements impossible: {str(e)}")
+
+    def _maintain_periodically(self) -> None:
+        while not self._stopped.wait(self.maintenance_interval):
+            self._maintain_safely()
+
+    def _seal_locked(self) -> None:
+        """Ferme le segment courant et écrit son index; le segment suivant s'ouvre au prochain ajout"""
+        if self._active is None:
+            return
+        self._file.close()
+        self._write_index(self._active)
+        self._cache_index(self._active)
+        self._sealed.append(self._active.info)
+        self._active, self._file = None, None
+
+    def close(self) -> None:
+        self._stopped.set()
+        with self._lock:
+            self._seal_locked()
+
+    # Compaction et rétention
+
+    def maintain(self, now: Optional[float] = None) -> dict:
+        """Scelle le segment courant s'il a dépassé son âge maximal, supprime les segments expirés ou en excès,
+        puis fusionne les petits segments contigus"""
+        now = time.time() if now is None else now
+        with self._maintenance_lock:
+            with self._lock:
+                self._open_locked()
+                # Sans nouvel événement, le segment courant ne serait jamais scellé ni soumis à la rétention
+                if (self._active is not None
+                        and now * 1000 - self._active.info.first_ts >= SEGMENT_MAX_AGE_HOURS * 3600 * 1000):
+                    self._seal_locked()
+            removed = self._apply_retention(now)
+            merged = self._compact()
+        if removed or merged:
+            logger.info(f"Journal des événements: {removed} segment(s) supprimé(s), {merged} fusion(s)")
+        return {'removed_segments': removed, 'merged_segments': merged}
+
+    def _apply_retention(self, now: float) -> int:
+        cutoff = int((now - self.retention_days * 86400) * 1000)
+        with self._lock:
+            self._open_locked()
+            expired = [info for info in self._sealed if info.last_ts < cutoff]
+            kept = [info for info in self._sealed if info.last_ts >= cutoff]
+            total = sum(info.size for info in kept) + (self._active.info.size if self._active is not None else 0)
+            while kept and total > self.max_bytes:
+                total -= kept[0].size
+                expired.append(kept.pop(0))
+            self._sealed = kept
+        for info in expired:
+            self._remove_files(info.first_seq)
+        return len(expired)
+
+    def _compact(self) -> int:
+        """Fusionne les suites de segments scellés dont la taille cumulée reste sous la taille d'un segment"""
+        with self._lock:
+            groups, group = [], []
+            for info in self._sealed:
+                if group and sum(member.size for member in group) + info.size > self.segment_max_bytes:
+                    groups.append(group)
+                    group = []
+                group.append(info)
+            groups.append(group)
+        merged = 0
+        for group in groups:
+            if len(group) > 1:
+                self._merge(group)
+                merged += 1
+        return merged
+
+    def _merge(self, group: List[SegmentInfo]) -> None:
+        # Le segment fusionné remplace le premier: ses lignes gardent leurs positions pour les lectures en cours
+        first = group[0]
+        index = SegmentIndex(SegmentInfo(first.first_seq))
+        tmp_path = self._path(first.first_seq, '.log.tmp')
+        with open(tmp_path, 'wb') as out:
+            for info in group:
+                with open(self._path(info.first_seq, '.log'), 'rb') as f:
+                    while chunk := f.read(1024 * 1024):
+                        out.write(chunk)
+                index.extend(self._index(info))
+            out.flush()
+            os.fsync(out.fileno())
+        os.replace(tmp_path, self._path(first.first_seq, '.log'))
+        self._write_index(index)
+        with self._lock:
+            position = next(i for i, info in enumerate(self._sealed) if info is first)
+            self._sealed[position:position + len(group)] = [index.info]
+        for info in group[1:]:
+            self._remove_files(info.first_seq)
+        self._remove_cached(first)
+        self._cache_index(index)
+
+    # Lecture
+
+    def _cache_index(self, index: SegmentIndex) -> None:
+        with self._cache_lock:
+            self._indexes[(index.info.first_seq, index.info.count)] = index
+            while len(self._indexes) > MAX_CACHED_INDEXES:
+                self._indexes.popitem(last=False)
+
+    def _remove_cached(self, info: SegmentInfo) -> None:
+        with self._cache_lock:
+            self._indexes.pop((info.first_seq, info.count), None)
+
+    def _index(self, info: SegmentInfo) -> SegmentIndex:
+        key = (info.first_seq, info.count)
+        with self._cache_lock:
+            index = self._indexes.get(key)
+            if index is not None:
+                self._indexes.move_to_end(key)
+                return index
+        with open(self._path(info.first_seq, '.idx'), 'rb') as f:
+            index = SegmentIndex.decode(f.read(), self._path(info.first_seq, '.terms'))
+        # Segment fusionné entre-temps: seules ses premières lignes correspondent au résumé détenu
+        index.info = info
+        self._cache_index(index)
+        return index
+
+    def query(self, session_id: Optional[str] = None, run_id: Optional[str] = None, agent: Optional[str] = None,
+              event_type: Optional[str] = None, since: Optional[float] = None, until: Optional[float] = None,
+              text: Optional[str] = None, limit: int = DEFAULT_QUERY_LIMIT, cursor: Optional[int] = None,
+              descending: bool = False) -> dict:
+        """Événements correspondant à tous les critères (période [since, until) en secondes, tous les termes de text).
+        La réponse indique le curseur à transmettre pour obtenir la page suivante."""
+        filters = {name: value for name, value in
+                   (('session', session_id), ('run_id', run_id), ('agent', agent), ('type', event_type))
+                   if value is not None}
+        terms = tokenize(text) if text else []
+        since_ms = int(since * 1000) if since is not None else None
+        until_ms = int(until * 1000) if until is not None else None
+        limit = max(1, min(limit, MAX_QUERY_LIMIT))
+        with self._lock:
+            self._open_locked()
+            segments = [(info, None) for info in self._sealed]
+            if self._active is not None:
+                # Instantané du segment courant: les lignes ajoutées ensuite sont ignorées
+                active = self._active.info
+                segments.append((replace(active, values={name: set(values) for name, values in active.values.items()}),
+                                 self._active))
+        if descending:
+            segments.reverse()
+
+        events: List[dict] = []
+        scanned = 0
+        for info, active in segments:
+            if cursor is not None and (info.first_seq >= cursor if descending else info.last_seq <= cursor):
+                continue
+            if not info.may_match(filters, since_ms, until_ms, terms):
+                continue
+            lo, hi = 0, info.count
+            if cursor is not None:
+                if descending:
+                    hi = min(hi, cursor - info.first_seq)
+                else:
+                    lo = max(lo, cursor - info.first_seq + 1)
+            search = (filters, terms, since_ms, until_ms, descending, limit - len(events))
+            try:
+                found = self._search(info, active, lo, hi, *search)
+            except FileNotFoundError:
+                # Segment fusionné pendant la recherche: ses événements sont relus dans le segment qui le
+                # contient désormais. Absent de la liste, il a été supprimé par la rétention.
+                merged = self._containing(info)
+                if merged is None:
+                    continue
+                shift = info.first_seq - merged.first_seq
+                try:
+                    found = self._search(merged, None, lo + shift, hi + shift, *search)
+                except FileNotFoundError:
+                    continue
+            scanned += 1
+            events.extend(found)
+            if len(events) >= limit:
+                break
+        return {
+            'events': events,
+            'next_cursor': events[-1]['seq'] if len(events) >= limit else None,
+            'scanned_segments': scanned
+        }
+
+    def _search(self, info: SegmentInfo, active: Optional[SegmentIndex], lo: int, hi: int,
+                filters: Dict[str, str], terms: List[str], since_ms: Optional[int], until_ms: Optional[int],
+                descending: bool, remaining: int) -> List[dict]:
+        index = active if active is not None else self._index(info)
+        ordinals = index.candidates(filters, terms, since_ms, until_ms, lo, hi)
+        if descending:
+            ordinals.reverse()
+        return self._read(info, index, ordinals[:remaining])
+
+    def _containing(self, info: SegmentInfo) -> Optional[SegmentInfo]:
+        """Segment scellé actuel qui contient les événements d'un segment fusionné"""
+        with self._lock:
+            return next((current for current in self._sealed if current is not info
+                         and current.first_seq <= info.first_seq and info.last_seq <= current.last_seq), None)
+
+    def _read(self, info: SegmentInfo, index: SegmentIndex, ordinals: List[int]) -> List[dict]:
+        if not ordinals:
+            return []
+        records = {}
+        with open(self._path(info.first_seq, '.log'), 'rb') as f:
+            for ordinal in sorted(ordinals):
+                f.seek(index.offsets[ordinal])
+                records[ordinal] = {'seq': info.first_seq + ordinal, **_loads(f.readline())['event']}
+        return [records[ordinal] for ordinal in ordinals]
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._open_locked()
+            infos = list(self._sealed) + ([self._active.info] if self._active is not None else [])
+        with self._cache_lock:
+            cached = len(self._indexes)
+        return {
+            'segments': len(infos),
+            'events': sum(info.count for info in infos),
+            'bytes': sum(info.size for info in infos),
+            'cached_indexes': cached
+        }
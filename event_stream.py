@@ -0,0 +1,164 @@
+"""
+Encodage et diffusion des événements Server-Sent Events.
+Chaque événement est encodé une seule fois dans son format SSE final, puis partagé par tous les abonnés.
+"""
+
+import json
+import logging
+import threading
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime
+from itertools import islice
+from typing import Callable, Iterator, List, Optional
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - dépendance optionnelle
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+# Nombre d'événements conservés pour la reprise des abonnés
+MAX_BUFFERED_EVENTS = 1000
+# Délai sans événement avant l'envoi d'un heartbeat
+HEARTBEAT_INTERVAL = 30
+
+# Commentaire SSE: maintient la connexion sans déclencher de gestionnaire côté navigateur
+HEARTBEAT_WIRE = b': heartbeat\n\n'
+
+def _default(obj):
+    """Sérialise les objets non natifs (équivalent de l'ancien CustomJSONEncoder)"""
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+    try:
+        return str(obj)
+    except Exception as e:
+        logger.error(f"Erreur lors de l'encodage JSON: {str(e)}")
+        return f"<Non encodable: {type(obj).__name__}>"
+
+def dumps(payload) -> bytes:
+    """Sérialise en JSON compact UTF-8, avec orjson lorsqu'il est disponible"""
+    if orjson is not None:
+        return orjson.dumps(payload, default=_default)
+    return json.dumps(payload, default=_default, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+@dataclass(frozen=True)
+class EncodedEvent:
+    """Événement encodé une fois pour toutes"""
+    event_id: int
+    event_type: str
+    data: bytes
+    wire: bytes
+    # Exécution d'origine, pour filtrer sans décoder les données
+    run_id: Optional[str] = None
+
+def encode_event(event_id: int, event_type: str, data: bytes, run_id: Optional[str] = None) -> EncodedEvent:
+    """Assemble les octets SSE d'un événement à partir de ses données JSON déjà encodées"""
+    wire = b'id: %d\nevent: %s\ndata: %s\n\n' % (event_id, event_type.encode('ascii'), data)
+    return EncodedEvent(event_id=event_id, event_type=event_type, data=data, wire=wire, run_id=run_id)
+
+class EventBroadcaster:
+    """Diffuse les événements encodés à tous les abonnés via un tampon circulaire borné en nombre et en octets"""
+    def __init__(self, maxlen: int = MAX_BUFFERED_EVENTS, max_bytes: Optional[int] = None):
+        self.maxlen = maxlen
+        self.max_bytes = max_bytes
+        self._events: 'deque[EncodedEvent]' = deque()
+        self._bytes = 0
+        self._condition = threading.Condition()
+        self._last_id = 0
+        self._subscribers = 0
+        # Fonctions appelées à chaque publication (réveil des connexions WebSocket)
+        self._listeners: List[Callable[[], None]] = []
+
+    @property
+    def last_id(self) -> int:
+        return self._last_id
+
+    @property
+    def buffered_bytes(self) -> int:
+        return self._bytes
+
+    @property
+    def subscribers(self) -> int:
+        """Nombre d'abonnés connectés (flux SSE et canaux WebSocket)"""
+        return self._subscribers
+
+    def attach(self, listener: Optional[Callable[[], None]] = None) -> None:
+        """Enregistre un abonné; listener, s'il est fourni, est appelé à chaque publication"""
+        with self._condition:
+            self._subscribers += 1
+            if listener is not None:
+                self._listeners.append(listener)
+
+    def detach(self, listener: Optional[Callable[[], None]] = None) -> None:
+        with self._condition:
+            self._subscribers = max(0, self._subscribers - 1)
+            if listener is not None and listener in self._listeners:
+                self._listeners.remove(listener)
+
+    def publish(self, event_type: str, payload: dict) -> EncodedEvent:
+        """Encode un événement et réveille les abonnés"""
+        data = dumps(payload)
+        with self._condition:
+            self._last_id += 1
+            event = encode_event(self._last_id, event_type, data, payload.get('run_id'))
+            self._events.append(event)
+            self._bytes += len(event.wire)
+            # Le plus récent est toujours conservé, même s'il dépasse à lui seul le budget
+            while len(self._events) > 1 and (
+                len(self._events) > self.maxlen
+                or (self.max_bytes is not None and self._bytes > self.max_bytes)
+            ):
+                self._bytes -= len(self._events.popleft().wire)
+            self._condition.notify_all()
+            listeners = list(self._listeners)
+        for listener in listeners:
+            listener()
+        return event
+
+    def clear(self) -> None:
+        """Vide le tampon; les identifiants continuent de croître"""
+        with self._condition:
+            self._events.clear()
+            self._bytes = 0
+
+    def events_after(self, last_id: int) -> List[EncodedEvent]:
+        """Renvoie les événements tamponnés dont l'identifiant est supérieur à last_id"""
+        with self._condition:
+            return self._events_after_locked(last_id)
+
+    def wait(self, last_id: int, timeout: float) -> List[EncodedEvent]:
+        """Attend des événements postérieurs à last_id, au plus timeout secondes"""
+        with self._condition:
+            self._condition.wait_for(lambda: self._last_id > last_id, timeout)
+            return self._events_after_locked(last_id)
+
+    def stream(self, last_id: Optional[int] = None, heartbeat: float = HEARTBEAT_INTERVAL) -> Iterator[bytes]:
+        """Génère les octets SSE à envoyer à un abonné; sans last_id, rejoue le tampon"""
+        cursor = 0 if last_id is None else last_id
+        if cursor > self._last_id:
+            # Identifiant inconnu (serveur redémarré, session recréée): le tampon est rejoué
+            cursor = 0
+        self.attach()
+        try:
+            while True:
+                events = self.wait(cursor, heartbeat)
+                if not events:
+                    if self._last_id > cursor:
+                        # Le tampon a été vidé: on se recale sur le dernier identifiant
+                        cursor = self._last_id
+                        continue
+                    yield HEARTBEAT_WIRE
+                    continue
+                for event in events:
+                    yield event.wire
+                cursor = events[-1].event_id
+        finally:
+            self.detach()
+
+    def _events_after_locked(self, last_id: int) -> List[EncodedEvent]:
+        if not self._events or self._events[-1].event_id <= last_id:
+            return []
+        offset = max(0, last_id - self._events[0].event_id + 1)
+        return list(islice(self._events, offset, None))
@@ -0,0 +1,8 @@
+"""
+Configuration de gunicorn, chargée automatiquement depuis le répertoire de lancement (Procfile, render.yaml).
+"""
+
+def post_fork(server, worker):
+    """Démarre la réserve de threads préchauffés dans le worker: les threads ne survivent pas au fork"""
+    from crew_server import crew_workers
+    crew_workers.start()
@@ -0,0 +1,172 @@
+"""
+Mise en cache HTTP: réponses conditionnelles (ETag, Last-Modified, 304), ressources statiques
+adressées par leur condensat et servies avec un cache de longue durée, et compression gzip ou
+brotli des réponses qui ne sont pas diffusées en continu.
+"""
+
+import gzip
+import hashlib
+import logging
+import mimetypes
+import os
+import threading
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Hashable, Optional, Tuple
+
+from flask import Response
+from werkzeug.security import safe_join
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - dépendance optionnelle
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# En dessous de cette taille, la compression ne fait pas gagner de temps
+COMPRESS_MIN_BYTES = 1024
+# Niveaux pour les réponses dynamiques (compressées à chaque requête) et pour les ressources statiques (une fois)
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+STATIC_GZIP_LEVEL = 9
+STATIC_BROTLI_QUALITY = 11
+COMPRESSIBLE_TYPES = ('text/', 'application/json', 'application/javascript', 'image/svg+xml')
+
+# Ressource adressée par son condensat: son contenu ne change jamais
+CACHE_IMMUTABLE = 'public, max-age=31536000, immutable'
+# Réponse conservée par le navigateur mais revalidée à chaque utilisation (304 si inchangée)
+CACHE_REVALIDATE = 'no-cache'
+CACHE_PRIVATE_REVALIDATE = 'private, no-cache'
+
+def content_digest(data: bytes) -> str:
+    """Condensat court d'un contenu, utilisé comme ETag et dans les URL des ressources"""
+    return hashlib.sha256(data).hexdigest()[:16]
+
+def available_encodings() -> Tuple[str, ...]:
+    """Encodages proposés, par ordre de préférence à qualité égale"""
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+def compress(data: bytes, encoding: str, static: bool = False) -> bytes:
+    if encoding == 'br':
+        return brotli.compress(data, quality=STATIC_BROTLI_QUALITY if static else BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=STATIC_GZIP_LEVEL if static else GZIP_LEVEL, mtime=0)
+
+def is_compressible(mimetype: Optional[str]) -> bool:
+    return bool(mimetype) and mimetype.startswith(COMPRESSIBLE_TYPES)
+
+def conditional(response: Response, request, cache_control: str = CACHE_REVALIDATE,
+                last_modified: Optional[float] = None) -> Response:
+    """Ajoute ETag et Last-Modified, puis répond 304 si le client possède déjà cette version"""
+    if response.get_etag()[0] is None:
+        response.add_etag()
+    if last_modified is not None:
+        response.last_modified = last_modified
+    response.headers['Cache-Control'] = cache_control
+    return response.make_conditional(request)
+
+def compress_response(response: Response, accept_encodings) -> Response:
+    """Compresse une réponse complète selon Accept-Encoding; les flux et les plages sont laissés intacts"""
+    if (response.status_code != 200 or response.is_streamed or response.direct_passthrough
+            or 'Content-Encoding' in response.headers or 'Content-Range' in response.headers
+            or response.headers.get('Accept-Ranges', 'none') != 'none'
+            or not is_compressible(response.mimetype)):
+        return response
+    data = response.get_data()
+    if len(data) < COMPRESS_MIN_BYTES:
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = accept_encodings.best_match(available_encodings())
+    if encoding is None:
+        return response
+    response.set_data(compress(data, encoding))
+    response.headers['Content-Encoding'] = encoding
+    # Le contenu encodé diffère octet par octet: l'ETag fort devient faible, comme le fait nginx
+    etag, weak = response.get_etag()
+    if etag is not None and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+@dataclass(frozen=True)
+class Asset:
+    """Ressource statique chargée en mémoire, avec ses variantes précompressées"""
+    name: str
+    digest: str
+    mimetype: str
+    data: bytes
+    mtime: float
+    encoded: Dict[str, bytes] = field(default_factory=dict)
+
+class StaticAssets:
+    """Ressources statiques servies sous /<préfixe>/<condensat>/<nom> et mises en cache sans limite de durée"""
+    def __init__(self, directory: str, url_prefix: str = '/assets'):
+        self.directory = directory
+        self.url_prefix = url_prefix.rstrip('/')
+        self._assets: Dict[str, Asset] = {}
+        self._lock = threading.Lock()
+
+    def get(self, name: str) -> Optional[Asset]:
+        """Renvoie la ressource, rechargée si le fichier a été modifié"""
+        path = safe_join(self.directory, name)
+        if path is None or not os.path.isfile(path):
+            return None
+        mtime = os.path.getmtime(path)
+        with self._lock:
+            asset = self._assets.get(name)
+        if asset is not None and asset.mtime == mtime:
+            return asset
+        with open(path, 'rb') as f:
+            data = f.read()
+        mimetype = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+        if mimetype.startswith('text/') or mimetype == 'application/javascript':
+            mimetype += '; charset=utf-8'
+        encoded = {}
+        if is_compressible(mimetype) and len(data) >= COMPRESS_MIN_BYTES:
+            encoded = {encoding: compress(data, encoding, static=True) for encoding in available_encodings()}
+        asset = Asset(name, content_digest(data), mimetype, data, mtime, encoded)
+        with self._lock:
+            self._assets[name] = asset
+        logger.info(f"Ressource statique chargée: {name} ({asset.digest})")
+        return asset
+
+    def url(self, name: str) -> str:
+        """URL versionnée d'une ressource, à utiliser dans les gabarits"""
+        asset = self.get(name)
+        if asset is None:
+            raise ValueError(f"Ressource statique introuvable: {name}")
+        return f'{self.url_prefix}/{asset.digest}/{name}'
+
+    def fingerprint(self) -> str:
+        """Empreinte des ressources déjà chargées: change dès que l'une d'elles est modifiée"""
+        with self._lock:
+            names = list(self._assets)
+        digests = [(name, asset.digest) for name in sorted(names) if (asset := self.get(name)) is not None]
+        return content_digest(repr(digests).encode('utf-8'))
+
+    def response(self, asset: Asset, digest: str, request) -> Response:
+        """Sert une ressource: cache immuable si le condensat demandé est le bon, revalidation sinon"""
+        encoding = request.accept_encodings.best_match(list(asset.encoded)) if asset.encoded else None
+        response = Response(asset.encoded[encoding] if encoding else asset.data, mimetype=asset.mimetype)
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        if asset.encoded:
+            response.vary.add('Accept-Encoding')
+        response.set_etag(asset.digest, weak=encoding is not None)
+        # Un ancien condensat (page servie avant un déploiement) reçoit le contenu actuel, sans cache durable
+        return conditional(response, request, CACHE_IMMUTABLE if digest == asset.digest else CACHE_REVALIDATE)
+
+class RenderCache:
+    """Dernier rendu de chaque gabarit, conservé tant que sa version (ex. empreinte des ressources) ne change pas"""
+    def __init__(self):
+        self._entries: Dict[str, Tuple[Hashable, bytes, str]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, name: str, version: Hashable, render: Callable[[], str]) -> Tuple[bytes, str]:
+        """Renvoie le contenu rendu et son ETag"""
+        with self._lock:
+            entry = self._entries.get(name)
+        if entry is None or entry[0] != version:
+            data = render().encode('utf-8')
+            entry = (version, data, content_digest(data))
+            with self._lock:
+                self._entries[name] = entry
+        return entry[1], entry[2]
@@ -0,0 +1,25 @@
+"""
+Statistiques de latence partagées par les outils de mesure (générateur de charge, exécuteur parallèle).
+"""
+
+from typing import List, Optional
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """Percentile par rang le plus proche, ou None sans valeur"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[rank]
+
+def summarize(values: List[float]) -> dict:
+    """Résumé en millisecondes d'une série de durées exprimées en secondes"""
+    def ms(value):
+        return None if value is None else round(value * 1000, 3)
+    return {
+        'count': len(values),
+        'p50_ms': ms(percentile(values, 50)),
+        'p90_ms': ms(percentile(values, 90)),
+        'p99_ms': ms(percentile(values, 99)),
+        'max_ms': ms(max(values) if values else None)
+    }
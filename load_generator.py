@@ -0,0 +1,333 @@
+"""
+Générateur de charge et test d'endurance SSE pour le serveur Flask.
+Ouvre N connexions /stream, pilote /restart_crew et /update_factory_goal avec une équipe simulée,
+et produit un rapport JSON comparable d'une version à l'autre.
+
+Par défaut, le serveur tourne dans le processus du générateur avec une équipe simulée: la mémoire et le
+nombre de threads du rapport incluent alors les clients du générateur. Avec --url, la charge vise un
+serveur externe et les ressources sont celles du serveur, lues sur /debug/memory (l'équipe n'y est pas
+simulée: les exécutions sont celles du serveur visé).
+
+Exemples:
+    python load_generator.py --clients 200 --duration 60 --event-rate 20 --output rapport.json
+    python load_generator.py --url http://127.0.0.1:5000 --clients 200 --duration 60
+"""
+
+import argparse
+import http.client
+import json
+import os
+import resource
+import sys
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+# L'équipe est simulée: aucune clé réelle n'est nécessaire
+os.environ.setdefault('OPENAI_API_KEY', 'load-generator')
+
+import crew_server
+from latency_stats import summarize
+from runs import STATUS_CANCELLED as RUN_CANCELLED
+from werkzeug.serving import make_server
+
+# Serveur visé: (schéma, hôte, port)
+Target = Tuple[str, str, int]
+
+def current_rss_kb() -> int:
+    """Mémoire résidente du processus en kio (pic de mémoire hors Linux)"""
+    return crew_server.current_rss_kb() or resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+def connect(target: Target, timeout: float) -> http.client.HTTPConnection:
+    scheme, host, port = target
+    connection_class = http.client.HTTPSConnection if scheme == 'https' else http.client.HTTPConnection
+    return connection_class(host, port, timeout=timeout)
+
+def request_json(target: Target, method: str, path: str, body: Optional[dict] = None,
+                 session_id: Optional[str] = None) -> Tuple[int, dict]:
+    """Envoie une requête au serveur visé et renvoie son statut et son corps JSON"""
+    headers = {'Content-Type': 'application/json'}
+    if session_id:
+        headers['X-Session-ID'] = session_id
+    conn = connect(target, 30)
+    try:
+        conn.request(method, path, body=json.dumps(body) if body is not None else None, headers=headers)
+        response = conn.getresponse()
+        data = response.read()
+    finally:
+        conn.close()
+    try:
+        return response.status, json.loads(data or b'{}')
+    except ValueError:
+        return response.status, {}
+
+def parse_sse(lines):
+    """Découpe un flux de lignes SSE en événements (dict) et heartbeats (None)"""
+    event: Dict[str, str] = {}
+    for raw in lines:
+        line = raw.decode('utf-8').rstrip('\r\n')
+        if not line:
+            if event:
+                yield event
+                event = {}
+            continue
+        if line.startswith(':'):
+            yield None
+            continue
+        name, _, value = line.partition(':')
+        event[name] = value[1:] if value.startswith(' ') else value
+
+def stub_run_crew(event_rate: float, payload_bytes: int):
+    """Remplace run_crew: publie des task_update horodatés jusqu'à l'arrêt de l'exécution"""
+    agents = ['Directeur Factory', 'Chef de Projet', 'Développeur', 'Testeur']
+    interval = 1.0 / event_rate if event_rate > 0 else 1.0
+    filler = 'x' * payload_bytes
+
+    def run_crew(run, resume_from=None, kit=None):
+        session = run.session
+        crew_server.run_registry.start(run)
+        crew_server.publish_event(session, 'status', run_id=run.run_id, message='Équipe simulée')
+        sequence = 0
+        while not run.stop_event.is_set():
+            crew_server.publish_event(
+                session, 'task_update', agents[sequence % len(agents)],
+                run_id=run.run_id, message=filler, sent_ns=time.time_ns()
+            )
+            sequence += 1
+            run.stop_event.wait(interval)
+        crew_server.run_registry.finish(run, RUN_CANCELLED)
+    return run_crew
+
+class StreamClient(threading.Thread):
+    """Connexion équivalente à un EventSource, qui mesure la livraison des événements"""
+    def __init__(self, target: Target, session_id: str, stop_event: threading.Event):
+        super().__init__(daemon=True)
+        self.target = target
+        self.session_id = session_id
+        self.stop_event = stop_event
+        self.latencies: List[float] = []
+        self.received = 0
+        self.missed = 0
+        self.heartbeats = 0
+        self.max_gap = 0.0
+        self.error: Optional[str] = None
+
+    def run(self):
+        last_id = None
+        last_seen = time.monotonic()
+        try:
+            conn = connect(self.target, 60)
+            conn.request('GET', '/stream', headers={'X-Session-ID': self.session_id})
+            response = conn.getresponse()
+            for event in parse_sse(iter(response.fp.readline, b'')):
+                now = time.monotonic()
+                self.max_gap = max(self.max_gap, now - last_seen)
+                last_seen = now
+                if self.stop_event.is_set():
+                    break
+                if event is None:
+                    self.heartbeats += 1
+                    continue
+                event_id = int(event.get('id', 0))
+                if last_id is not None and event_id > last_id + 1:
+                    self.missed += event_id - last_id - 1
+                last_id = event_id
+                self.received += 1
+                data = json.loads(event.get('data', '{}'))
+                if 'sent_ns' in data:
+                    self.latencies.append((time.time_ns() - data['sent_ns']) / 1e9)
+            conn.close()
+        except Exception as e:
+            if not self.stop_event.is_set():
+                self.error = str(e)
+
+class ControlDriver(threading.Thread):
+    """Envoie des POST de contrôle à cadence fixe et mesure leur latence"""
+    def __init__(self, target: Target, path: str, rate: float, session_ids: List[str],
+                 stop_event: threading.Event):
+        super().__init__(daemon=True)
+        self.target = target
+        self.path = path
+        self.rate = rate
+        self.session_ids = session_ids
+        self.stop_event = stop_event
+        self.latencies: List[float] = []
+        self.errors = 0
+
+    def run(self):
+        if self.rate <= 0:
+            return
+        sequence = 0
+        while not self.stop_event.wait(1.0 / self.rate):
+            session_id = self.session_ids[sequence % len(self.session_ids)]
+            started = time.monotonic()
+            try:
+                status, _ = request_json(self.target, 'POST', self.path,
+                                         {'goal': f'Objectif de charge {sequence}'}, session_id)
+                if status != 200:
+                    self.errors += 1
+            except Exception:
+                self.errors += 1
+            self.latencies.append(time.monotonic() - started)
+            sequence += 1
+
+def run_load(args) -> dict:
+    """Exécute le scénario de charge et renvoie le rapport"""
+    if args.url:
+        parts = urlsplit(args.url)
+        default_port = 443 if parts.scheme == 'https' else 80
+        return _run_scenario(args, (parts.scheme, parts.hostname, parts.port or default_port))
+    original = (crew_server.run_crew, crew_server.STREAM_HEARTBEAT)
+    crew_server.run_crew = stub_run_crew(args.event_rate, args.payload_bytes)
+    crew_server.STREAM_HEARTBEAT = args.heartbeat
+    try:
+        return _run_scenario(args)
+    finally:
+        crew_server.run_crew, crew_server.STREAM_HEARTBEAT = original
+
+def sample_resources(target: Optional[Target]) -> dict:
+    """Mémoire et threads du serveur: ceux du processus courant, ou ceux rapportés par /debug/memory"""
+    if target is None:
+        return {'rss_kb': current_rss_kb(), 'threads': threading.active_count()}
+    try:
+        status, data = request_json(target, 'GET', '/debug/memory?limit=0')
+    except OSError:
+        status, data = None, {}
+    if status != 200:
+        return {'rss_kb': None, 'threads': None}
+    return {'rss_kb': data.get('rss_kb'), 'threads': data.get('threads')}
+
+def _growth(start: Optional[int], end: Optional[int]) -> Optional[int]:
+    return end - start if start is not None and end is not None else None
+
+def _run_scenario(args, external: Optional[Target] = None) -> dict:
+    server = None
+    if external is None:
+        # Réserve démarrée comme sous gunicorn (post_fork); sans effet si elle l'est déjà
+        crew_server.crew_workers.start()
+        server = make_server('127.0.0.1', 0, crew_server.app, threaded=True)
+        server_thread = threading.Thread(target=server.serve_forever, daemon=True)
+        server_thread.start()
+    target = external or ('http', '127.0.0.1', server.server_port)
+
+    session_ids = [f'charge-{i}' for i in range(args.sessions)]
+    # Dans le processus, les sessions sont conservées ici: le rapport ne dépend pas de leur présence
+    # dans le registre. Sur un serveur externe, chaque session est démarrée par POST /restart_crew.
+    sessions = {}
+    start_errors = 0
+    for session_id in session_ids:
+        if external is None:
+            sessions[session_id] = crew_server.session_manager.get_or_create(session_id)
+            crew_server.start_crew(sessions[session_id])
+        elif request_json(target, 'POST', '/restart_crew', {}, session_id)[0] != 200:
+            start_errors += 1
+
+    stop_event = threading.Event()
+    baseline = sample_resources(external)
+    clients = [StreamClient(target, session_ids[i % len(session_ids)], stop_event) for i in range(args.clients)]
+    for client in clients:
+        client.start()
+    drivers = [
+        ControlDriver(target, '/restart_crew', args.restart_rate, session_ids, stop_event),
+        ControlDriver(target, '/update_factory_goal', args.goal_rate, session_ids, stop_event)
+    ]
+    for driver in drivers:
+        driver.start()
+
+    timeline = []
+    started = time.monotonic()
+    while time.monotonic() - started < args.duration:
+        time.sleep(min(args.sample_interval, max(0.0, args.duration - (time.monotonic() - started))))
+        timeline.append({
+            't_s': round(time.monotonic() - started, 3),
+            **sample_resources(external),
+            'delivered': sum(client.received for client in clients)
+        })
+
+    # Sur un serveur externe, le nombre d'événements publiés n'est pas observable
+    published = {session_id: session.broadcaster.last_id for session_id, session in sessions.items()}
+    stop_event.set()
+    for session in sessions.values():
+        session.stop_event.set()
+        # Réveille les abonnés pour qu'ils constatent l'arrêt
+        session.broadcaster.publish('status', {'type': 'status', 'message': 'fin'})
+    for client in clients:
+        client.join(timeout=5)
+    if server is not None:
+        server.shutdown()
+
+    end = timeline[-1] if timeline else sample_resources(external)
+    latencies = [value for client in clients for value in client.latencies]
+    duration = time.monotonic() - started
+    delivered = sum(client.received for client in clients)
+    return {
+        'config': {
+            'clients': args.clients, 'sessions': args.sessions, 'duration_s': args.duration,
+            'event_rate': args.event_rate, 'payload_bytes': args.payload_bytes,
+            'restart_rate': args.restart_rate, 'goal_rate': args.goal_rate, 'heartbeat_s': args.heartbeat,
+            'url': args.url
+        },
+        'events': {
+            'published': sum(published.values()) if external is None else None,
+            'start_errors': start_errors,
+            'delivered': delivered,
+            'delivered_per_s': round(delivered / duration, 1) if duration else None,
+            'missed': sum(client.missed for client in clients),
+            'heartbeats': sum(client.heartbeats for client in clients),
+            'max_gap_ms': round(max((client.max_gap for client in clients), default=0) * 1000, 3),
+            'client_errors': sorted({client.error for client in clients if client.error})
+        },
+        'delivery_latency': summarize(latencies),
+        'control_latency': {
+            driver.path: dict(summarize(driver.latencies), errors=driver.errors) for driver in drivers
+        },
+        'resources': {
+            # in_process: processus du générateur, clients compris; server: valeurs de /debug/memory
+            'source': 'server' if external is not None else 'in_process',
+            'rss_kb_start': baseline['rss_kb'],
+            'rss_kb_end': end['rss_kb'],
+            'rss_kb_growth': _growth(baseline['rss_kb'], end['rss_kb']),
+            'threads_start': baseline['threads'],
+            'threads_max': max((sample['threads'] for sample in timeline if sample['threads'] is not None),
+                               default=baseline['threads'])
+        },
+        'timeline': timeline
+    }
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Test de charge SSE du serveur CrewAI")
+    parser.add_argument('--clients', type=int, default=50, help="Nombre de connexions /stream")
+    parser.add_argument('--sessions', type=int, default=1, help="Nombre de sessions réparties entre les clients")
+    parser.add_argument('--duration', type=float, default=30.0, help="Durée du test en secondes")
+    parser.add_argument('--event-rate', type=float, default=10.0, help="Événements publiés par seconde et par session")
+    parser.add_argument('--payload-bytes', type=int, default=200, help="Taille du message de chaque événement")
+    parser.add_argument('--restart-rate', type=float, default=0.2, help="POST /restart_crew par seconde")
+    parser.add_argument('--goal-rate', type=float, default=0.1, help="POST /update_factory_goal par seconde")
+    parser.add_argument('--heartbeat', type=float, default=5.0, help="Intervalle des heartbeats SSE en secondes")
+    parser.add_argument('--sample-interval', type=float, default=1.0, help="Intervalle d'échantillonnage des ressources")
+    parser.add_argument('--output', help="Fichier du rapport JSON (sortie standard par défaut)")
+    parser.add_argument('--url', help="Serveur externe visé (http://hôte:port); par défaut, serveur dans le processus "
+                                      "avec une équipe simulée")
+    args = parser.parse_args(argv)
+    if args.url and (urlsplit(args.url).scheme not in ('http', 'https') or not urlsplit(args.url).hostname):
+        parser.error("--url doit être une URL http(s)://hôte[:port]")
+    max_sessions = crew_server.session_manager.max_sessions
+    if not 1 <= args.sessions <= max_sessions:
+        # Au-delà, les premières sessions seraient évincées pendant le test
+        parser.error(f"--sessions doit être compris entre 1 et {max_sessions}")
+    return args
+
+def main(argv=None):
+    args = parse_args(argv)
+    report = run_load(args)
+    text = json.dumps(report, indent=2, sort_keys=True, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+    return report
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
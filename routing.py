@@ -0,0 +1,363 @@
+"""
+Routage des modèles par agent et par tâche: modèles économiques pour la planification et la supervision,
+modèles plus puissants pour le code, repli sur un autre modèle en cas de délai dépassé et escalade
+lorsqu'une sortie échoue à la validation. Décisions et résultats sont consignés par exécution.
+"""
+
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import deque
+from contextlib import nullcontext
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from crewai import LLM, BaseLLM
+
+from costs import BUDGET_OK
+from latency_stats import summarize
+
+try:
+    from crewai.llms.base_llm import call_stop_override
+except ImportError:  # pragma: no cover - dépend de la version de crewai
+    call_stop_override = None
+
+try:
+    import yaml
+except ImportError:  # pragma: no cover - dépendance optionnelle
+    yaml = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL = 'gpt-4o-mini'
+# Règles par défaut: la première règle correspondante s'applique
+DEFAULT_ROUTING_RULES = [
+    {'agent': 'Directeur Factory', 'model': 'gpt-4o-mini', 'timeout_s': 60, 'fallbacks': ['gpt-3.5-turbo']},
+    {'agent': 'Chef de Projet', 'model': 'gpt-4o-mini', 'timeout_s': 60, 'fallbacks': ['gpt-3.5-turbo'],
+     'escalation': ['gpt-4o'], 'validation': {'min_chars': 200}},
+    {'agent': 'Développeur', 'model': 'gpt-4o', 'timeout_s': 120, 'fallbacks': ['gpt-4o-mini'],
+     'escalation': ['gpt-4.1'], 'validation': {'min_chars': 200, 'code_block': True}},
+    {'agent': 'Testeur', 'model': 'gpt-4o-mini', 'timeout_s': 90, 'fallbacks': ['gpt-3.5-turbo'],
+     'escalation': ['gpt-4o'], 'validation': {'min_chars': 200}}
+]
+# Nombre de décisions détaillées conservées par exécution
+MAX_DECISIONS = 200
+
+_CODE_PATTERN = re.compile(r'```|^\s*(def|class|import|from)\s', re.MULTILINE)
+
+@dataclass
+class RoutingRule:
+    """Modèle d'un agent et/ou d'une tâche, avec ses replis, son escalade et sa validation"""
+    model: str
+    agent: Optional[str] = None
+    task: Optional[int] = None
+    timeout_s: Optional[float] = None
+    fallbacks: List[str] = field(default_factory=list)
+    escalation: List[str] = field(default_factory=list)
+    validation: Dict[str, Any] = field(default_factory=dict)
+
+    def matches(self, agent: str, task_index: int) -> bool:
+        return (self.agent is None or self.agent == agent) and (self.task is None or self.task == task_index)
+
+def validate_output(text: str, validation: Dict[str, Any]) -> Optional[str]:
+    """Vérifie une sortie selon les critères de la règle; renvoie le motif de l'échec, ou None"""
+    if not text or not text.strip():
+        return "La sortie est vide"
+    min_chars = validation.get('min_chars')
+    if min_chars and len(text.strip()) < min_chars:
+        return f"La sortie est trop courte ({len(text.strip())} caractères, {min_chars} attendus)"
+    if validation.get('code_block') and not _CODE_PATTERN.search(text):
+        return "La sortie attendue doit contenir du code"
+    pattern = validation.get('pattern')
+    if pattern and not re.search(pattern, text):
+        return f"La sortie ne correspond pas au motif attendu: {pattern}"
+    missing = [term for term in validation.get('must_include', []) if term.lower() not in text.lower()]
+    if missing:
+        return f"Éléments attendus absents de la sortie: {', '.join(missing)}"
+    return None
+
+def is_timeout(error: BaseException) -> bool:
+    """Reconnaît un délai dépassé, y compris enveloppé par crewai ou le client du fournisseur"""
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        if isinstance(error, TimeoutError) or 'timeout' in type(error).__name__.lower():
+            return True
+        error = error.__cause__ or error.__context__
+    return False
+
+class RoutingLog:
+    """Décisions de routage et résultats des appels d'une exécution"""
+    def __init__(self, max_decisions: int = MAX_DECISIONS):
+        self._decisions: 'deque[dict]' = deque(maxlen=max_decisions)
+        self._calls: Dict[str, Dict[str, Any]] = {}
+        self._counts: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def decision(self, kind: str, agent: Optional[str], task: Optional[int], model: str, **details) -> None:
+        """Consigne une décision: route, fallback, escalation, accepted_invalid ou downgrade"""
+        with self._lock:
+            self._counts[kind] = self._counts.get(kind, 0) + 1
+            self._decisions.append({'kind': kind, 'agent': agent, 'task': task, 'model': model,
+                                    'at': time.time(), **details})
+
+    def call(self, model: str, latency: float, outcome: str) -> None:
+        """Consigne le résultat d'un appel: ok, timeout ou error"""
+        with self._lock:
+            stats = self._calls.setdefault(model, {'latencies': [], 'outcomes': {}})
+            stats['latencies'].append(latency)
+            stats['outcomes'][outcome] = stats['outcomes'].get(outcome, 0) + 1
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {
+                'counts': dict(self._counts),
+                'models': {
+                    model: {'outcomes': dict(stats['outcomes']), 'latency': summarize(stats['latencies'])}
+                    for model, stats in self._calls.items()
+                },
+                'decisions': list(self._decisions)
+            }
+
+class RoutedLLM(BaseLLM):
+    """Modèle principal suivi de modèles de repli, essayés successivement lorsqu'un appel dépasse son délai"""
+    llm_type: str = 'routed'
+    chain: List[Any]
+    agent_role: Optional[str] = None
+    task_index: Optional[int] = None
+    log: Optional[Any] = None
+
+    def _attempts(self):
+        """Délègue au modèle suivant de la chaîne avec les mots d'arrêt de l'appel en cours"""
+        stop = self.stop_sequences
+        for position, llm in enumerate(self.chain):
+            override = call_stop_override(llm, stop) if call_stop_override is not None and stop else nullcontext()
+            yield position, llm, override
+
+    def _outcome(self, position: int, llm, started: float, error: Optional[BaseException]) -> bool:
+        """Consigne un essai; renvoie True s'il faut passer au modèle suivant"""
+        outcome = 'ok' if error is None else ('timeout' if is_timeout(error) else 'error')
+        if self.log is not None:
+            self.log.call(llm.model, time.monotonic() - started, outcome)
+        retry = outcome == 'timeout' and position + 1 < len(self.chain)
+        if retry:
+            following = self.chain[position + 1].model
+            logger.warning(f"Délai dépassé avec {llm.model} pour {self.agent_role}: repli sur {following}")
+            if self.log is not None:
+                self.log.decision('fallback', self.agent_role, self.task_index, following, from_model=llm.model)
+        return retry
+
+    def call(self, messages, tools=None, callbacks=None, available_functions=None,
+             from_task=None, from_agent=None, response_model=None):
+        for position, llm, override in self._attempts():
+            started = time.monotonic()
+            try:
+                with override:
+                    result = llm.call(messages, tools=tools, callbacks=callbacks,
+                                      available_functions=available_functions, from_task=from_task,
+                                      from_agent=from_agent, response_model=response_model)
+            except Exception as e:
+                if self._outcome(position, llm, started, e):
+                    continue
+                raise
+            self._outcome(position, llm, started, None)
+            return result
+
+    async def acall(self, messages, tools=None, callbacks=None, available_functions=None,
+                    from_task=None, from_agent=None, response_model=None):
+        for position, llm, override in self._attempts():
+            started = time.monotonic()
+            try:
+                with override:
+                    result = await llm.acall(messages, tools=tools, callbacks=callbacks,
+                                             available_functions=available_functions, from_task=from_task,
+                                             from_agent=from_agent, response_model=response_model)
+            except Exception as e:
+                if self._outcome(position, llm, started, e):
+                    continue
+                raise
+            self._outcome(position, llm, started, None)
+            return result
+
+    def supports_function_calling(self) -> bool:
+        # Méthode absente de BaseLLM: les modèles personnalisés peuvent ne pas la définir
+        supports = getattr(self.chain[0], 'supports_function_calling', None)
+        return bool(supports()) if supports is not None else False
+
+    def supports_stop_words(self) -> bool:
+        return self.chain[0].supports_stop_words()
+
+    def get_context_window_size(self) -> int:
+        return min(llm.get_context_window_size() for llm in self.chain)
+
+    def supports_multimodal(self) -> bool:
+        return all(llm.supports_multimodal() for llm in self.chain)
+
+class TaskRoutedLLM(BaseLLM):
+    """Modèles d'un agent chargé de plusieurs tâches: chaque appel est confié au modèle de la tâche qui l'émet.
+    crewai relit agent.llm au début de chaque tâche, mais les modèles sont attribués avant le lancement:
+    un seul modèle par agent serait celui de sa dernière tâche routée"""
+    llm_type: str = 'per_task'
+    # Modèle de chaque tâche, par index, et index de chaque tâche crewai, par identifiant
+    routes: Dict[int, Any]
+    task_indexes: Dict[str, int] = {}
+
+    def route_for(self, task) -> Any:
+        """Modèle de la tâche; hors tâche connue, celui de la première tâche de l'agent"""
+        index = self.task_indexes.get(str(getattr(task, 'id', None)))
+        return self.routes.get(index) or self.routes[min(self.routes)]
+
+    def call(self, messages, tools=None, callbacks=None, available_functions=None,
+             from_task=None, from_agent=None, response_model=None):
+        llm = self.route_for(from_task)
+        stop = self.stop_sequences
+        with call_stop_override(llm, stop) if call_stop_override is not None and stop else nullcontext():
+            return llm.call(messages, tools=tools, callbacks=callbacks, available_functions=available_functions,
+                            from_task=from_task, from_agent=from_agent, response_model=response_model)
+
+    async def acall(self, messages, tools=None, callbacks=None, available_functions=None,
+                    from_task=None, from_agent=None, response_model=None):
+        llm = self.route_for(from_task)
+        stop = self.stop_sequences
+        with call_stop_override(llm, stop) if call_stop_override is not None and stop else nullcontext():
+            return await llm.acall(messages, tools=tools, callbacks=callbacks,
+                                   available_functions=available_functions, from_task=from_task,
+                                   from_agent=from_agent, response_model=response_model)
+
+    def supports_function_calling(self) -> bool:
+        return all(bool(getattr(llm, 'supports_function_calling', lambda: False)()) for llm in self.routes.values())
+
+    def supports_stop_words(self) -> bool:
+        return all(llm.supports_stop_words() for llm in self.routes.values())
+
+    def get_context_window_size(self) -> int:
+        return min(llm.get_context_window_size() for llm in self.routes.values())
+
+    def supports_multimodal(self) -> bool:
+        return all(llm.supports_multimodal() for llm in self.routes.values())
+
+class ModelRouter:
+    """Choisit le modèle de chaque agent et tâche, et escalade lorsque la validation échoue"""
+    def __init__(self, rules: Optional[List[dict]] = None, default_model: str = DEFAULT_MODEL,
+                 llm_factory: Callable[..., Any] = LLM):
+        self.rules = [RoutingRule(**rule) for rule in (DEFAULT_ROUTING_RULES if rules is None else rules)]
+        self.default_model = default_model
+        self.llm_factory = llm_factory
+
+    @classmethod
+    def from_env(cls) -> Optional['ModelRouter']:
+        """Règles de CREW_ROUTING_FILE (JSON ou YAML) ou CREW_ROUTING_RULES (JSON), ou règles par défaut
+        avec CREW_MODEL_ROUTING=1. Désactivé par défaut: les règles par défaut confient le code à gpt-4o,
+        plus coûteux que le modèle unique utilisé sans routage; CREW_MODEL_ROUTING=0 désactive toujours"""
+        enabled = os.getenv('CREW_MODEL_ROUTING')
+        if enabled == '0':
+            return None
+        rules = None
+        path = os.getenv('CREW_ROUTING_FILE')
+        if path:
+            with open(path, encoding='utf-8') as f:
+                rules = yaml.safe_load(f) if yaml is not None and not path.endswith('.json') else json.load(f)
+        elif os.getenv('CREW_ROUTING_RULES'):
+            rules = json.loads(os.environ['CREW_ROUTING_RULES'])
+        elif enabled != '1':
+            return None
+        return cls(rules, os.getenv('CREW_DEFAULT_MODEL', DEFAULT_MODEL))
+
+    def rule_for(self, agent: str, task_index: int) -> RoutingRule:
+        for rule in self.rules:
+            if rule.matches(agent, task_index):
+                return rule
+        return RoutingRule(model=self.default_model)
+
+    def build_llm(self, models: List[str], rule: RoutingRule, agent: str, task_index: int,
+                  log: Optional[RoutingLog]) -> RoutedLLM:
+        options = {}
+        if rule.timeout_s is not None:
+            # Les nouvelles tentatives du client retarderaient le repli: c'est la chaîne qui réessaie
+            options = {'timeout': rule.timeout_s, 'max_retries': 0}
+        chain = [self.llm_factory(model=model, **options) for model in models]
+        return RoutedLLM(model=models[0], chain=chain, agent_role=agent, task_index=task_index, log=log)
+
+    def prepare(self, agent: str, task_index: int) -> RoutedLLM:
+        """Construit à l'avance le modèle d'un agent et d'une tâche (clients des fournisseurs compris)"""
+        rule = self.rule_for(agent, task_index)
+        return self.build_llm([rule.model] + rule.fallbacks, rule, agent, task_index, None)
+
+    def route(self, agent, task_index: int, log: Optional[RoutingLog] = None,
+              prepared: Optional[RoutedLLM] = None, usage: Optional[Any] = None) -> dict:
+        """Attribue son modèle à l'agent (préparé à l'avance ou construit) et renvoie les options de tâche;
+        usage (costs.RunUsage) suspend l'escalade dès qu'un budget est dépassé"""
+        rule = self.rule_for(agent.role, task_index)
+        if prepared is not None and prepared.agent_role == agent.role and prepared.task_index == task_index:
+            prepared.log = log
+            self.assign(agent, task_index, prepared)
+        else:
+            self.assign(agent, task_index,
+                        self.build_llm([rule.model] + rule.fallbacks, rule, agent.role, task_index, log))
+        if log is not None:
+            log.decision('route', agent.role, task_index, rule.model, fallbacks=rule.fallbacks)
+        if not rule.validation and not rule.escalation:
+            return {}
+        return {
+            'guardrail': self.guardrail(agent, task_index, rule, log, usage),
+            'guardrail_max_retries': len(rule.escalation)
+        }
+
+    @staticmethod
+    def assign(agent, task_index: int, llm) -> None:
+        """Attribue le modèle d'une tâche à l'agent sans remplacer celui de ses autres tâches"""
+        current = agent.llm
+        if isinstance(current, TaskRoutedLLM):
+            current.routes[task_index] = llm
+        elif isinstance(current, RoutedLLM) and current.task_index is not None and current.task_index != task_index:
+            agent.llm = TaskRoutedLLM(model=current.model, routes={current.task_index: current, task_index: llm})
+        else:
+            agent.llm = llm
+
+    @staticmethod
+    def bind_task(agent, task, task_index: int) -> None:
+        """Associe une tâche crewai créée à son index, pour les agents chargés de plusieurs tâches"""
+        if isinstance(agent.llm, TaskRoutedLLM):
+            agent.llm.task_indexes[str(task.id)] = task_index
+
+    @staticmethod
+    def model_for(agent, task_index: int) -> str:
+        llm = agent.llm
+        if isinstance(llm, TaskRoutedLLM):
+            llm = llm.routes.get(task_index, llm)
+        return llm.model
+
+    def guardrail(self, agent, task_index: int, rule: RoutingRule, log: Optional[RoutingLog],
+                  usage: Optional[Any] = None):
+        """Garde-fou crewai: une sortie invalide fait passer l'agent au modèle d'escalade suivant,
+        sauf si le budget de l'exécution est dépassé (l'escalade annulerait le passage au modèle de repli)"""
+        escalation = list(rule.escalation)
+
+        def check(output) -> Tuple[bool, Any]:
+            error = validate_output(getattr(output, 'raw', None) or str(output), rule.validation)
+            if error is None:
+                return True, output
+            if not escalation:
+                # Plus de modèle plus puissant: la sortie est acceptée et l'échec consigné
+                if log is not None:
+                    log.decision('accepted_invalid', agent.role, task_index, self.model_for(agent, task_index),
+                                 reason=error)
+                return True, output
+            if usage is not None and usage.state != BUDGET_OK:
+                logger.info(f"Validation échouée pour {agent.role} ({error}): escalade suspendue, budget dépassé")
+                if log is not None:
+                    log.decision('accepted_invalid', agent.role, task_index, self.model_for(agent, task_index),
+                                 reason=error, budget=usage.state)
+                return True, output
+            model = escalation.pop(0)
+            logger.info(f"Validation échouée pour {agent.role} ({error}): escalade vers {model}")
+            if log is not None:
+                log.decision('escalation', agent.role, task_index, model,
+                             from_model=self.model_for(agent, task_index), reason=error)
+            self.assign(agent, task_index, self.build_llm([model], rule, agent.role, task_index, log))
+            return False, error
+
+        return check
@@ -0,0 +1,210 @@
+"""
+Cycle de vie des exécutions d'équipe: suivi, comptabilité mémoire, libération et plafonnement des exécutions zombies.
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Nombre d'exécutions arrêtées mais dont le thread tourne encore, au-delà duquel on refuse d'en lancer
+MAX_ZOMBIE_RUNS = 4
+# Nombre d'exécutions en attente ou en cours, toutes sessions confondues, au-delà duquel on refuse d'en lancer
+MAX_ACTIVE_RUNS = 8
+# Nombre d'exécutions terminées dont le résumé est conservé
+MAX_FINISHED_RUNS = 200
+
+STATUS_PENDING = 'pending'
+STATUS_RUNNING = 'running'
+STATUS_COMPLETED = 'completed'
+STATUS_FAILED = 'failed'
+STATUS_CANCELLED = 'cancelled'
+
+FINISHED_STATUSES = (STATUS_COMPLETED, STATUS_FAILED, STATUS_CANCELLED)
+
+class RunCancelled(Exception):
+    """Levée dans le thread d'une exécution dont l'arrêt a été demandé"""
+
+class TooManyZombieRuns(RuntimeError):
+    """Levée lorsque trop d'exécutions arrêtées n'ont pas encore rendu leur thread"""
+
+class TooManyActiveRuns(RuntimeError):
+    """Levée lorsque le nombre maximal d'exécutions simultanées est atteint"""
+
+class RunStillActive(RuntimeError):
+    """Levée lorsqu'on tente de reprendre une exécution dont le thread tourne encore"""
+
+@dataclass
+class CrewRun:
+    """Exécution d'équipe rattachée à une session, avec son point de reprise et sa comptabilité mémoire"""
+    run_id: str
+    session: Any
+    stop_event: threading.Event = field(default_factory=threading.Event)
+    checkpoint: Optional[Any] = None
+    # Thread de l'exécution, ou tâche confiée à la réserve (warm_pool.WorkerHandle)
+    thread: Optional[Any] = None
+    crew: Optional[Any] = None
+    agents: Optional[List[Any]] = None
+    status: str = STATUS_PENDING
+    error: Optional[str] = None
+    started_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+    events_published: int = 0
+    event_bytes: int = 0
+    output_bytes: int = 0
+    # Comptabilité des tokens et des coûts (costs.RunUsage), conservée après la fin de l'exécution
+    usage: Optional[Any] = None
+    # Décisions de routage des modèles et résultats des appels (routing.RoutingLog)
+    routing: Optional[Any] = None
+    # Démarrage: thread préchauffé ou non, début effectif et premier appel LLM
+    worker: Optional[str] = None
+    running_at: Optional[float] = None
+    first_llm_call_at: Optional[float] = None
+
+    def check_cancelled(self, *_args) -> None:
+        """Interrompt l'exécution si son arrêt a été demandé; utilisable comme step_callback"""
+        if self.stop_event.is_set():
+            raise RunCancelled(f"Exécution {self.run_id} annulée")
+
+    def mark_first_llm_call(self, at: float) -> None:
+        if self.first_llm_call_at is None:
+            self.first_llm_call_at = at
+
+    def account_event(self, size: int) -> None:
+        self.events_published += 1
+        self.event_bytes += size
+
+    def account_output(self, size: int) -> None:
+        self.output_bytes += size
+
+    @property
+    def is_alive(self) -> bool:
+        return self.thread is not None and self.thread.is_alive()
+
+    @property
+    def is_active(self) -> bool:
+        """En attente de son thread ou en cours, sans arrêt demandé"""
+        return self.status not in FINISHED_STATUSES and (self.thread is None or self.is_alive)
+
+    @property
+    def is_zombie(self) -> bool:
+        return self.stop_event.is_set() and self.is_alive
+
+    def release(self) -> None:
+        """Libère l'équipe, les agents et le point de reprise en mémoire"""
+        self.crew = None
+        self.agents = None
+        self.checkpoint = None
+
+    def to_dict(self) -> dict:
+        end = self.finished_at or time.time()
+        return {
+            'run_id': self.run_id,
+            'session_id': getattr(self.session, 'session_id', None),
+            'status': self.status,
+            'error': self.error,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'duration_s': round(end - self.started_at, 3),
+            'alive': self.is_alive,
+            'zombie': self.is_zombie,
+            'memory': {
+                'events_published': self.events_published,
+                'event_bytes': self.event_bytes,
+                'output_bytes': self.output_bytes,
+                'holds_crew': self.crew is not None
+            },
+            'usage': self.usage.to_dict() if self.usage is not None else None,
+            'routing': self.routing.to_dict() if self.routing is not None else None,
+            'startup': {
+                'worker': self.worker,
+                'handoff_ms': self._since_start(self.running_at),
+                'first_llm_call_ms': self._since_start(self.first_llm_call_at)
+            }
+        }
+
+    def _since_start(self, at: Optional[float]) -> Optional[float]:
+        return None if at is None else round((at - self.started_at) * 1000, 1)
+
+class RunRegistry:
+    """Registre des exécutions: actives, zombies et historique borné des exécutions terminées"""
+    def __init__(self, max_zombies: int = MAX_ZOMBIE_RUNS, max_finished: int = MAX_FINISHED_RUNS,
+                 max_active: int = MAX_ACTIVE_RUNS):
+        self.max_zombies = max_zombies
+        self.max_active = max_active
+        self.max_finished = max_finished
+        self._runs: 'OrderedDict[str, CrewRun]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def register(self, run: CrewRun) -> CrewRun:
+        """Enregistre une nouvelle exécution, sauf si trop d'exécutions zombies ou actives subsistent"""
+        with self._lock:
+            zombies = sum(1 for existing in self._runs.values() if existing.is_zombie)
+            if zombies >= self.max_zombies:
+                raise TooManyZombieRuns(
+                    f"{zombies} exécution(s) arrêtée(s) encore actives, réessayez plus tard"
+                )
+            active = sum(1 for existing in self._runs.values() if existing.is_active)
+            if active >= self.max_active:
+                raise TooManyActiveRuns(
+                    f"{active} exécution(s) déjà en cours sur le serveur, réessayez plus tard"
+                )
+            self._runs[run.run_id] = run
+            self._runs.move_to_end(run.run_id)
+            self._prune_locked()
+        return run
+
+    def get(self, run_id: Optional[str]) -> Optional[CrewRun]:
+        return self._runs.get(run_id) if run_id else None
+
+    def start(self, run: CrewRun) -> None:
+        run.status = STATUS_RUNNING
+        run.running_at = time.time()
+
+    def finish(self, run: CrewRun, status: str, error: Optional[str] = None) -> None:
+        """Marque une exécution comme terminée et libère ses références lourdes;
+        une exécution annulée le reste, même si son thread s'est terminé normalement"""
+        if run.status == STATUS_CANCELLED:
+            status, error = STATUS_CANCELLED, run.error or error
+        run.status = status
+        run.error = error
+        run.finished_at = time.time()
+        run.release()
+        with self._lock:
+            self._prune_locked()
+
+    def cancel(self, run: CrewRun, reason: Optional[str] = None) -> None:
+        """Demande l'arrêt coopératif d'une exécution"""
+        run.stop_event.set()
+        if run.status not in FINISHED_STATUSES:
+            run.status = STATUS_CANCELLED
+            if reason:
+                run.error = reason
+
+    def runs(self) -> List[CrewRun]:
+        with self._lock:
+            return list(self._runs.values())
+
+    def zombies(self) -> List[CrewRun]:
+        return [run for run in self.runs() if run.is_zombie]
+
+    def summary(self) -> Dict[str, int]:
+        runs = self.runs()
+        return {
+            'tracked': len(runs),
+            'alive': sum(1 for run in runs if run.is_alive),
+            'active': sum(1 for run in runs if run.is_active),
+            'zombies': sum(1 for run in runs if run.is_zombie),
+            'holding_crew': sum(1 for run in runs if run.crew is not None)
+        }
+
+    def _prune_locked(self) -> None:
+        """Oublie les exécutions terminées les plus anciennes au-delà de l'historique autorisé"""
+        finished = [run_id for run_id, run in self._runs.items()
+                    if run.status in FINISHED_STATUSES and not run.is_alive]
+        for run_id in finished[:max(0, len(finished) - self.max_finished)]:
+            del self._runs[run_id]
@@ -0,0 +1,172 @@
+"""
+Gestion des sessions: chaque session possède sa configuration, son flux d'événements et son exécution d'équipe.
+Les sessions inactives sont évincées par LRU et par durée de vie afin de borner la mémoire;
+une session dont l'exécution tourne ou dont le flux est suivi n'est jamais évincée, et la création
+de nouvelles sessions est refusée lorsque les sessions occupées atteignent la limite stricte.
+"""
+
+import logging
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, List, Optional
+
+from deltas import TextVersions
+from event_stream import EventBroadcaster
+
+logger = logging.getLogger(__name__)
+
+SESSION_COOKIE = 'crew_session'
+SESSION_HEADER = 'X-Session-ID'
+# Nombre maximal de sessions conservées simultanément
+MAX_SESSIONS = 100
+# Nombre de sessions au-delà duquel une nouvelle session est refusée (sessions occupées non évincées)
+SESSION_HARD_LIMIT = 200
+# Durée d'inactivité (en secondes) au-delà de laquelle une session est évincée
+SESSION_TTL = 3600
+# Nombre d'événements et d'octets conservés par session
+SESSION_BUFFER_SIZE = 1000
+SESSION_BUFFER_BYTES = 2 * 1024 * 1024
+
+_SESSION_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+def is_valid_session_id(session_id: Optional[str]) -> bool:
+    """Vérifie qu'un identifiant de session est bien formé"""
+    return bool(session_id and _SESSION_ID_PATTERN.match(session_id))
+
+def new_session_id() -> str:
+    """Génère un identifiant de session aléatoire"""
+    return uuid.uuid4().hex
+
+class TooManySessions(RuntimeError):
+    """Levée lorsqu'une session ne peut être créée: la limite stricte est atteinte"""
+
+@dataclass
+class Session:
+    """État propre à une session: configuration, flux d'événements et exécution en cours"""
+    session_id: str
+    config: Any
+    broadcaster: EventBroadcaster = field(
+        default_factory=lambda: EventBroadcaster(maxlen=SESSION_BUFFER_SIZE, max_bytes=SESSION_BUFFER_BYTES)
+    )
+    # Thread de l'exécution en cours, ou tâche confiée à la réserve de threads préchauffés
+    crew_thread: Optional[Any] = None
+    # Signal d'arrêt de l'exécution en cours (partagé avec celle-ci)
+    stop_event: threading.Event = field(default_factory=threading.Event)
+    current_run: Optional[Any] = None
+    # Dernière version diffusée de chaque sortie (agent, tâche), conservée d'une exécution à l'autre
+    versions: TextVersions = field(default_factory=TextVersions)
+    last_seen: float = field(default_factory=time.monotonic)
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def touch(self) -> None:
+        self.last_seen = time.monotonic()
+
+    @property
+    def is_busy(self) -> bool:
+        """Une exécution tourne encore ou un abonné suit le flux de la session"""
+        if self.broadcaster.subscribers > 0:
+            return True
+        run, thread = self.current_run, self.crew_thread
+        return (run is not None and run.is_alive) or (thread is not None and thread.is_alive())
+
+    def stop(self) -> None:
+        """Demande l'arrêt de l'exécution en cours et libère le tampon et l'exécution"""
+        self.stop_event.set()
+        self.broadcaster.clear()
+        self.current_run = None
+
+class SessionManager:
+    """Registre des sessions avec recherche en O(1) et éviction LRU/TTL"""
+    def __init__(self, config_factory: Callable[[], Any], max_sessions: int = MAX_SESSIONS,
+                 ttl: float = SESSION_TTL, hard_limit: int = SESSION_HARD_LIMIT):
+        self.config_factory = config_factory
+        self.max_sessions = max_sessions
+        self.hard_limit = max(hard_limit, max_sessions)
+        self.ttl = ttl
+        self._sessions: 'OrderedDict[str, Session]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str) -> Optional[Session]:
+        """Renvoie une session existante et la marque comme récemment utilisée"""
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                return None
+            expired = self._is_expired(session)
+            if expired:
+                self._remove_locked(session_id)
+            else:
+                self._sessions.move_to_end(session_id)
+                session.touch()
+        if expired:
+            session.stop()
+            return None
+        return session
+
+    def get_or_create(self, session_id: str) -> Session:
+        """Renvoie la session demandée, en la créant au besoin (TooManySessions si la limite stricte est atteinte)"""
+        evicted: List[Session] = []
+        rejected = False
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is not None and not self._is_expired(session):
+                self._sessions.move_to_end(session_id)
+                session.touch()
+                return session
+            if session is not None:
+                evicted.append(self._remove_locked(session_id))
+            session = Session(session_id=session_id, config=self.config_factory())
+            session.touch()
+            self._sessions[session_id] = session
+            evicted.extend(self._evict_locked(keep=session_id))
+            if len(self._sessions) > self.hard_limit:
+                # Les autres sessions sont toutes occupées: la nouvelle n'est pas conservée
+                del self._sessions[session_id]
+                rejected = True
+        for old in evicted:
+            old.stop()
+        if rejected:
+            raise TooManySessions(f"Nombre maximal de sessions actives atteint ({self.hard_limit})")
+        return session
+
+    def remove(self, session_id: str) -> None:
+        """Supprime explicitement une session"""
+        with self._lock:
+            session = self._remove_locked(session_id) if session_id in self._sessions else None
+        if session is not None:
+            session.stop()
+
+    def sessions(self) -> List[Session]:
+        with self._lock:
+            return list(self._sessions.values())
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self._sessions
+
+    def _is_expired(self, session: Session) -> bool:
+        return time.monotonic() - session.last_seen > self.ttl and not session.is_busy
+
+    def _remove_locked(self, session_id: str) -> Session:
+        session = self._sessions.pop(session_id)
+        logger.info(f"Session {session_id} évincée")
+        return session
+
+    def _evict_locked(self, keep: Optional[str] = None) -> List[Session]:
+        """Évince les sessions inactives expirées puis les moins récemment utilisées (verrou déjà acquis);
+        les sessions occupées sont conservées, quitte à dépasser max_sessions jusqu'à hard_limit"""
+        evicted = []
+        # Les sessions sont ordonnées par dernier accès: les expirées sont en tête
+        for session_id, session in list(self._sessions.items()):
+            if session_id == keep or session.is_busy:
+                continue
+            if len(self._sessions) <= self.max_sessions and not self._is_expired(session):
+                break
+            evicted.append(self._remove_locked(session_id))
+        return evicted
@@ -0,0 +1,189 @@
+const eventSource = new EventSource('/stream');
+const agentCards = {
+    'Directeur Factory': {
+        card: document.getElementById('factory-card'),
+        status: document.getElementById('factory-status'),
+        output: document.getElementById('factory-output')
+    },
+    'Chef de Projet': {
+        card: document.getElementById('chef-card'),
+        status: document.getElementById('chef-status'),
+        output: document.getElementById('chef-output')
+    },
+    'Développeur': {
+        card: document.getElementById('dev-card'),
+        status: document.getElementById('dev-status'),
+        output: document.getElementById('dev-output')
+    },
+    'Testeur': {
+        card: document.getElementById('test-card'),
+        status: document.getElementById('test-status'),
+        output: document.getElementById('test-output')
+    }
+};
+
+// Charger la configuration initiale du Directeur Factory
+fetch('/get_factory_config')
+    .then(response => response.json())
+    .then(data => {
+        document.getElementById('factory-goal').value = data.goal;
+        document.getElementById('factory-backstory').value = data.backstory;
+    });
+
+function updateFactoryGoal() {
+    const goal = document.getElementById('factory-goal').value;
+    fetch('/update_factory_goal', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({ goal: goal })
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (data.success) {
+            alert('Objectif du Directeur Factory mis à jour avec succès !');
+            // Redémarrer l'équipe
+            fetch('/restart_crew', { method: 'POST' })
+                .then(response => response.json())
+                .then(data => {
+                    if (data.success) {
+                        console.log('Équipe redémarrée avec succès');
+                    }
+                });
+        } else {
+            alert('Erreur lors de la mise à jour de l\'objectif');
+        }
+    });
+}
+
+function updateFactoryBackstory() {
+    const backstory = document.getElementById('factory-backstory').value;
+    fetch('/update_factory_backstory', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({ backstory: backstory })
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (data.success) {
+            alert('Histoire du Directeur Factory mise à jour avec succès !');
+            // Redémarrer l'équipe
+            fetch('/restart_crew', { method: 'POST' })
+                .then(response => response.json())
+                .then(data => {
+                    if (data.success) {
+                        console.log('Équipe redémarrée avec succès');
+                    }
+                });
+        } else {
+            alert('Erreur lors de la mise à jour de l\'histoire');
+        }
+    });
+}
+
+// Affiche l'aperçu puis charge le contenu complet stocké hors bande; renvoie le texte complet
+function showMessage(element, data) {
+    element.textContent = data.message;
+    if (!data.blob) {
+        return Promise.resolve(data.message);
+    }
+    return fetch(data.blob.url)
+        .then(response => response.text())
+        .then(text => {
+            element.textContent = text;
+            return text;
+        });
+}
+
+// Dernière version reçue de chaque sortie (agent, tâche), base des différences suivantes
+const outputVersions = {};
+
+// Applique les opérations d'une différence: n > 0 recopie, n < 0 saute, chaîne insère
+function applyPatch(base, ops) {
+    let position = 0;
+    let result = '';
+    for (const op of ops) {
+        if (typeof op === 'string') {
+            result += op;
+        } else if (op > 0) {
+            result += base.slice(position, position + op);
+            position += op;
+        } else {
+            position -= op;
+        }
+    }
+    return result;
+}
+
+// Affiche une sortie de tâche, complète ou sous forme de différence avec la version connue
+function showOutput(element, data) {
+    const key = `${data.agent}:${data.task_index}`;
+    if (!data.delta) {
+        showMessage(element, data).then(text => {
+            if (data.version !== undefined) {
+                outputVersions[key] = { version: data.version, text: text };
+            }
+        });
+        return;
+    }
+    const known = outputVersions[key];
+    if (known && known.version === data.delta.base) {
+        const text = applyPatch(known.text, data.delta.ops);
+        if (text.length === data.delta.length) {
+            outputVersions[key] = { version: data.version, text: text };
+            element.textContent = text;
+            return;
+        }
+    }
+    // Version de base absente ou divergente: on recharge la version complète
+    fetch(`/snapshots/${data.task_index}?agent=${encodeURIComponent(data.agent)}`)
+        .then(response => response.json())
+        .then(snapshot => {
+            const current = outputVersions[key];
+            if (snapshot.text !== undefined && (!current || current.version < snapshot.version)) {
+                outputVersions[key] = { version: snapshot.version, text: snapshot.text };
+                element.textContent = snapshot.text;
+            }
+        });
+}
+
+function handleEvent(event) {
+    const data = JSON.parse(event.data);
+
+    if (data.type === 'complete') {
+        showMessage(document.getElementById('final-result'), data);
+        if (data.run_id) {
+            // Sorties, code extrait et rapport de tests, en archive reprenable
+            const link = document.getElementById('download-artifacts');
+            link.href = `/runs/${data.run_id}/artifacts.zip`;
+            link.classList.remove('hidden');
+        }
+        return;
+    }
+
+    if (data.type === 'status') {
+        console.log(data.message);
+        return;
+    }
+
+    const agentInfo = agentCards[data.agent];
+    if (agentInfo) {
+        // Mise à jour du statut et de l'output
+        agentInfo.status.textContent = 'En cours...';
+        showOutput(agentInfo.output, data);
+
+        // Animation de la carte
+        agentInfo.card.classList.add('active');
+        setTimeout(() => {
+            agentInfo.card.classList.remove('active');
+        }, 1000);
+    }
+}
+
+// Le serveur nomme chaque événement SSE d'après son type
+['status', 'task_update', 'complete', 'error'].forEach(type => {
+    eventSource.addEventListener(type, handleEvent);
+});
@@ -0,0 +1,102 @@
+"""
+Tests unitaires pour les livrables des exécutions.
+"""
+
+import io
+import json
+import unittest
+import zipfile
+from unittest.mock import patch
+import artifacts as artifacts_module
+from artifacts import RunArtifacts, cached_run_artifacts, extract_code_blocks, iter_chunks, slice_stream
+from checkpoints import RunCheckpoint, TaskCheckpoint
+
+DEV_OUTPUT = "Voici le code:\n```python\ndef f():\n    return 1\n```\nEt la config:\n```yaml\na: 1\n```\n"
+
+def make_checkpoint(result='Fin', size=0):
+    tasks = [
+        TaskCheckpoint(0, 'Chef de Projet', 'Plan ' + 'x' * size, '2024-01-01T10:00:00'),
+        TaskCheckpoint(2, 'Développeur', DEV_OUTPUT, '2024-01-01T10:05:00'),
+        TaskCheckpoint(3, 'Testeur', 'Tous les tests passent', '2024-01-01T10:10:00')
+    ]
+    return RunCheckpoint(run_id='run-1', session_id='s', agents={}, status='completed', tasks=tasks,
+                         result=result, updated_at='2024-01-01T10:11:00')
+
+class TestArtifacts(unittest.TestCase):
+    """Tests pour l'extraction des livrables et l'archive produite au fil de l'eau"""
+
+    def test_extract_code_blocks(self):
+        """Test de l'extraction des blocs de code et de leur langage"""
+        self.assertEqual(extract_code_blocks(DEV_OUTPUT), [('python', 'def f():\n    return 1\n'), ('yaml', 'a: 1\n')])
+        self.assertEqual(extract_code_blocks('pas de code'), [])
+
+    def test_artifacts_from_checkpoint(self):
+        """Test des livrables construits à partir d'un point de reprise"""
+        artifacts = RunArtifacts(make_checkpoint())
+        names = [artifact.name for artifact in artifacts.artifacts]
+        self.assertEqual(names, [
+            'taches/01-chef-de-projet.md', 'taches/03-developpeur.md', 'code/03-developpeur-1.py',
+            'code/03-developpeur-2.yaml', 'taches/04-testeur.md', 'rapport-tests.md', 'resultat.md'
+        ])
+        self.assertEqual(artifacts.get('code/03-developpeur-1.py').data, b'def f():\n    return 1\n')
+        self.assertIn(b'Tous les tests passent', artifacts.get('rapport-tests.md').data)
+        self.assertEqual(len(artifacts.manifest()['artifacts']), 7)
+
+    def test_streamed_zip_is_valid_and_resumable(self):
+        """Test que l'archive est valide, déterministe et découpable en plages"""
+        artifacts = RunArtifacts(make_checkpoint(size=300_000))
+        chunks = list(artifacts.iter_zip())
+        self.assertGreater(len(chunks), 1)
+        data = b''.join(chunks)
+        self.assertEqual(artifacts.zip_size(), len(data))
+        self.assertEqual(b''.join(RunArtifacts(make_checkpoint(size=300_000)).iter_zip()), data)
+
+        with zipfile.ZipFile(io.BytesIO(data)) as archive:
+            self.assertIsNone(archive.testzip())
+            manifest = json.loads(archive.read('run-1/manifest.json'))
+            self.assertEqual(manifest['run_id'], 'run-1')
+            self.assertEqual(archive.read('run-1/resultat.md'), b'Fin')
+
+        resumed = b''.join(artifacts.read_zip(0, 1000)) + b''.join(artifacts.read_zip(1000, len(data)))
+        self.assertEqual(resumed, data)
+
+    def test_built_once_per_checkpoint_version(self):
+        """Test de la réutilisation des livrables, des condensats et de l'archive tant que le point de reprise
+        n'a pas changé"""
+        loads = []
+
+        def load():
+            loads.append(1)
+            return make_checkpoint()
+
+        first = cached_run_artifacts('run-1', '2024-01-01T10:11:00', load)
+        self.assertIs(cached_run_artifacts('run-1', '2024-01-01T10:11:00', load), first)
+        self.assertEqual(len(loads), 1)
+
+        artifact = first.get('resultat.md')
+        # Condensat calculé une fois pour l'ETag de l'archive, puis réutilisé
+        with patch.object(artifacts_module.hashlib, 'sha256', wraps=artifacts_module.hashlib.sha256) as sha256:
+            self.assertEqual(artifact.digest, artifact.digest)
+        self.assertEqual(sha256.call_count, 0)
+
+        with patch.object(RunArtifacts, 'iter_zip', autospec=True, side_effect=RunArtifacts.iter_zip) as iter_zip:
+            size = first.zip_size()
+            data = b''.join(first.read_zip(0, 100)) + b''.join(first.read_zip(100, size))
+        self.assertEqual(iter_zip.call_count, 1)
+        self.assertEqual(data, b''.join(first.iter_zip()))
+
+        updated = make_checkpoint(result='Autre fin')
+        updated.updated_at = '2024-01-01T10:12:00'
+        second = cached_run_artifacts('run-1', updated.updated_at, lambda: updated)
+        self.assertIsNot(second, first)
+        self.assertEqual(second.get('resultat.md').data, b'Autre fin')
+        self.assertIsNone(cached_run_artifacts('absent', 'v', lambda: None))
+
+    def test_chunk_helpers(self):
+        """Test du découpage en morceaux et de l'extraction d'une plage"""
+        data = bytes(range(256)) * 10
+        self.assertEqual(b''.join(iter_chunks(data, 10, 2000, chunk_size=7)), data[10:2000])
+        self.assertEqual(b''.join(slice_stream(iter_chunks(data, chunk_size=100), 150, 1234)), data[150:1234])
+
+if __name__ == '__main__':
+    unittest.main()
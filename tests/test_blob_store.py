@@ -0,0 +1,83 @@
+"""
+Tests unitaires pour le stockage de blobs.
+"""
+
+import os
+import tempfile
+import time
+import unittest
+from blob_store import BlobStore
+
+class TestBlobStore(unittest.TestCase):
+    """Tests pour le stockage adressé par contenu"""
+
+    def setUp(self):
+        """Configuration initiale pour les tests"""
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.store = BlobStore(max_memory_bytes=100, spill_dir=self.tmp_dir.name)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_put_is_content_addressed(self):
+        """Test qu'un contenu identique n'est stocké qu'une fois"""
+        first = self.store.put(b"contenu")
+        second = self.store.put(b"contenu")
+        self.assertEqual(first, second)
+        self.assertTrue(BlobStore.is_valid_id(first))
+        self.assertEqual(self.store.memory_bytes, len(b"contenu"))
+
+    def test_put_text_preview(self):
+        """Test de la référence et de l'aperçu d'un texte"""
+        ref = self.store.put_text("é" * 50, preview_chars=10)
+        self.assertEqual(ref.size, 100)
+        self.assertEqual(ref.preview, "é" * 10)
+        self.assertEqual(ref.to_dict()['url'], f"/blobs/{ref.blob_id}")
+
+    def test_spill_to_disk_and_range_read(self):
+        """Test du déversement sur disque et de la lecture partielle"""
+        old = self.store.put(b"a" * 80)
+        new = self.store.put(b"b" * 80)
+        self.assertEqual(self.store.memory_bytes, 80)
+        self.assertTrue(os.path.exists(os.path.join(self.tmp_dir.name, old)))
+        self.assertEqual(self.store.read(old, 10, 15), b"aaaaa")
+        self.assertEqual(self.store.read(new, 78), b"bb")
+        self.assertEqual(self.store.size(old), 80)
+
+    def test_discard_and_unknown(self):
+        """Test de la suppression et des blobs inconnus"""
+        blob_id = self.store.put(b"x" * 150)
+        self.assertIn(blob_id, self.store)
+        self.store.discard(blob_id)
+        self.assertNotIn(blob_id, self.store)
+        self.assertIsNone(self.store.read(blob_id))
+        self.assertIsNone(self.store.size(blob_id))
+
+    def test_disk_budget_evicts_oldest(self):
+        """Test du budget disque: les blobs déversés les plus anciens sont supprimés"""
+        store = BlobStore(max_memory_bytes=100, spill_dir=self.tmp_dir.name, max_disk_bytes=200)
+        ids = [store.put(bytes([65 + index]) * 80) for index in range(5)]
+        self.assertEqual(store.disk_bytes, 160)
+        self.assertNotIn(ids[0], store)
+        self.assertNotIn(ids[1], store)
+        self.assertEqual(sorted(os.listdir(self.tmp_dir.name)), sorted(ids[2:4]))
+        self.assertEqual(store.read(ids[2], 0, 2), b"CC")
+
+    def test_reload_after_restart(self):
+        """Test de la reprise des blobs déversés et du nettoyage des fichiers expirés ou incomplets"""
+        old = self.store.put(b"a" * 80)
+        kept = self.store.put(b"b" * 80)
+        self.store.put(b"c" * 80)
+        stale = time.time() - 8 * 86400
+        os.utime(os.path.join(self.tmp_dir.name, old), (stale, stale))
+        with open(os.path.join(self.tmp_dir.name, f"{kept}.tmp"), 'wb') as f:
+            f.write(b"incomplet")
+
+        reopened = BlobStore(max_memory_bytes=100, spill_dir=self.tmp_dir.name, ttl_days=7)
+        self.assertNotIn(old, reopened)
+        self.assertEqual(reopened.read(kept, 0, 3), b"bbb")
+        self.assertEqual(reopened.disk_bytes, 80)
+        self.assertEqual(os.listdir(self.tmp_dir.name), [kept])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+"""
+Tests unitaires pour les points de reprise.
+"""
+
+import json
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from checkpoints import (
+    CheckpointStore, RunCheckpoint, CHECKPOINT_VERSION, STATUS_COMPLETED, STATUS_FAILED
+)
+
+class TestCheckpointStore(unittest.TestCase):
+    """Tests pour le stockage des points de reprise"""
+
+    def setUp(self):
+        """Configuration initiale pour les tests"""
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.store = CheckpointStore(self.tmp_dir.name)
+        self.agents = {'Testeur': {'role': 'Testeur', 'goal': 'g', 'backstory': 'b'}}
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_record_and_reload(self):
+        """Test de l'enregistrement des tâches et du rechargement"""
+        checkpoint = self.store.create('run1', 'session', self.agents)
+        self.store.record_task(checkpoint, 1, 'Testeur', 'sortie 1')
+        self.store.record_task(checkpoint, 0, 'Testeur', 'sortie 0')
+        self.store.record_task(checkpoint, 1, 'Testeur', 'sortie 1 bis')
+
+        loaded = self.store.load('run1')
+        self.assertEqual(loaded.completed_indexes, [0, 1])
+        self.assertEqual(loaded.tasks[1].output, 'sortie 1 bis')
+        self.assertEqual(loaded.agents, self.agents)
+        self.assertEqual(loaded.version, CHECKPOINT_VERSION)
+        self.assertFalse(any(name.endswith('.tmp') for name in os.listdir(self.tmp_dir.name)))
+
+    def test_unsupported_version(self):
+        """Test du refus des formats de version inconnue"""
+        checkpoint = self.store.create('run1', 'session', self.agents)
+        data = checkpoint.to_dict()
+        data['version'] = CHECKPOINT_VERSION + 1
+        with self.assertRaises(ValueError):
+            RunCheckpoint.from_dict(data)
+        with open(os.path.join(self.tmp_dir.name, 'run1.json'), 'w') as f:
+            json.dump(data, f)
+        self.assertIsNone(self.store.load('run1'))
+
+    def test_latest_resumable(self):
+        """Test de la sélection de la dernière exécution reprenable d'une session"""
+        done = self.store.create('done', 'session', self.agents)
+        self.store.finish(done, STATUS_COMPLETED, 'résultat')
+        failed = self.store.create('failed', 'session', self.agents)
+        self.store.finish(failed, STATUS_FAILED)
+        self.store.create('other', 'autre-session', self.agents)
+
+        latest = self.store.latest_resumable('session')
+        self.assertEqual(latest.run_id, 'failed')
+        self.assertIsNone(self.store.latest_resumable('inconnue'))
+
+    def test_index_and_retention(self):
+        """Test de l'index par session et de la suppression des points de reprise anciens ou excédentaires"""
+        store = CheckpointStore(self.tmp_dir.name, retention_days=1, max_checkpoints=2)
+        store.create('a', 'session', self.agents)
+        store.create('b', 'session', self.agents)
+        store.create('c', 'autre-session', self.agents)
+        self.assertEqual(sorted(os.listdir(self.tmp_dir.name)), ['b.json', 'c.json'])
+        self.assertEqual(store.latest_resumable('session').run_id, 'b')
+
+        # Un nouveau magasin reconstruit son index à partir du répertoire
+        reopened = CheckpointStore(self.tmp_dir.name, retention_days=1)
+        self.assertEqual(reopened.latest_resumable('autre-session').run_id, 'c')
+        self.assertEqual(reopened.prune(now=datetime.now() + timedelta(days=2)), 2)
+        self.assertIsNone(reopened.latest_resumable('session'))
+        self.assertEqual(os.listdir(self.tmp_dir.name), [])
+
+    def test_invalid_run_id(self):
+        """Test du rejet des identifiants d'exécution invalides"""
+        self.assertIsNone(self.store.load('../etc/passwd'))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+"""
+Tests unitaires pour la comptabilité des tokens et des coûts.
+"""
+
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch
+from costs import (
+    Budget, RunUsage, UsageTracker, MODEL_PRICES, BUDGET_HARD_EXCEEDED, BUDGET_SOFT_EXCEEDED,
+    load_prices, model_price, normalize_usage
+)
+
+class TestCosts(unittest.TestCase):
+    """Tests pour les prix, les agrégats et les budgets"""
+
+    def test_prices(self):
+        """Test de la résolution des prix et de leur surcharge"""
+        self.assertEqual(model_price('openai/gpt-4o-mini-2024-07-18', MODEL_PRICES), MODEL_PRICES['gpt-4o-mini'])
+        self.assertEqual(model_price('gpt-4o-2024-08-06', MODEL_PRICES), MODEL_PRICES['gpt-4o'])
+        self.assertIsNone(model_price('modele-maison', MODEL_PRICES))
+        prices = load_prices('{"modele-maison": [1, 2]}')
+        self.assertEqual(prices['modele-maison'], (1.0, 2.0))
+        self.assertEqual(load_prices('pas du json'), MODEL_PRICES)
+
+    def test_normalize_usage(self):
+        """Test des différents formats d'usage des fournisseurs"""
+        self.assertEqual(normalize_usage({'prompt_tokens': 10, 'completion_tokens': 5, 'cached_prompt_tokens': 2}),
+                         (10, 5, 2))
+        self.assertEqual(normalize_usage({'input_tokens': 7, 'output_tokens': 3}), (7, 3, 0))
+        self.assertEqual(normalize_usage(None), (0, 0, 0))
+
+    def test_rollups_and_budgets(self):
+        """Test des agrégats par agent, tâche et modèle et des dépassements de budget"""
+        triggered = []
+        usage = RunUsage('r1', Budget(soft_tokens=1500, hard_cost_usd=0.01), {'m': (1.0, 2.0)},
+                         on_soft=lambda u: triggered.append('soft'), on_hard=lambda u: triggered.append('hard'))
+        usage.task_labels['t0'] = '0'
+        cost = usage.record('m', 'Dev', 't0', {'prompt_tokens': 1000, 'completion_tokens': 500})
+        self.assertAlmostEqual(cost, 0.002)
+        self.assertEqual(usage.state, BUDGET_SOFT_EXCEEDED)
+        usage.record('m', 'Dev', 't0', {'prompt_tokens': 1000, 'completion_tokens': 0})
+        usage.record('inconnu', 'Test', 'tX', {'prompt_tokens': 1, 'completion_tokens': 1}, task_name='Tester')
+        self.assertEqual(triggered, ['soft'])
+        usage.record('m', 'Dev', 't0', {'prompt_tokens': 0, 'completion_tokens': 5000})
+        usage.record('m', 'Dev', 't0', {'prompt_tokens': 0, 'completion_tokens': 5000})
+        self.assertEqual(triggered, ['soft', 'hard'])
+        self.assertEqual(usage.state, BUDGET_HARD_EXCEEDED)
+
+        summary = usage.to_dict()
+        self.assertEqual(summary['calls'], 5)
+        self.assertEqual(summary['unpriced_calls'], 1)
+        self.assertEqual(summary['by_agent']['Dev']['prompt_tokens'], 2000)
+        self.assertEqual(set(summary['by_task']), {'0', 'Tester'})
+        self.assertAlmostEqual(summary['by_model']['m']['cost_usd'], 0.023)
+        self.assertEqual(summary['budget']['state'], BUDGET_HARD_EXCEEDED)
+
+    def test_budget_from_env_rejects_invalid_values(self):
+        """Test de l'erreur de configuration levée pour une valeur CREW_BUDGET_* invalide"""
+        with patch.dict('os.environ', {'CREW_BUDGET_HARD_USD': '2.5', 'CREW_BUDGET_SOFT_TOKENS': '1000'}):
+            budget = Budget.from_env()
+        self.assertEqual((budget.hard_cost_usd, budget.soft_tokens), (2.5, 1000))
+        for name, value in (('CREW_BUDGET_HARD_USD', 'beaucoup'), ('CREW_BUDGET_SOFT_USD', 'nan'),
+                            ('CREW_BUDGET_HARD_TOKENS', '-1'), ('CREW_BUDGET_SOFT_TOKENS', '1.5')):
+            with patch.dict('os.environ', {name: value}), self.assertRaisesRegex(ValueError, name):
+                Budget.from_env()
+
+    def test_downgrade_model_must_be_cheaper(self):
+        """Test de la restriction du modèle de repli aux modèles tarifés moins chers"""
+        prices = {'cher': (10.0, 20.0), 'moyen': (1.0, 2.0), 'petit': (0.5, 1.0)}
+        self.assertEqual(Budget(downgrade_model='moyen').apply({'downgrade_model': 'petit'}, prices).downgrade_model,
+                         'petit')
+        self.assertEqual(Budget(downgrade_model='moyen').apply({'downgrade_model': 'moyen'}, prices).downgrade_model,
+                         'moyen')
+        for model in ('cher', 'petit-variante', 'inconnu'):
+            with self.assertRaises(ValueError):
+                Budget(downgrade_model='moyen').apply({'downgrade_model': model}, prices)
+
+    def test_tracker_routes_events_to_run(self):
+        """Test de l'attribution des événements crewai à l'exécution de l'agent"""
+        tracker = UsageTracker()
+        usage = RunUsage('r1')
+        agent = SimpleNamespace(id='a1')
+        tracker.bind(usage, [agent])
+        event = SimpleNamespace(agent_id='a1', task_id=None, model='gpt-4o', agent_role='Dev', call_id='c1',
+                                task_name='Coder', usage={'prompt_tokens': 100, 'completion_tokens': 10})
+        tracker.on_llm_call_completed(None, event)
+        tracker.unbind(usage)
+        tracker.on_llm_call_completed(None, event)
+        self.assertEqual(usage.to_dict()['calls'], 1)
+        self.assertEqual(usage.to_dict()['recent_calls'][0]['call_id'], 'c1')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+"""
+Tests unitaires pour l'exécuteur parallèle de définitions d'équipes.
+"""
+
+import json
+import os
+import tempfile
+import time
+import unittest
+from crew_factory import CrewFactory
+from crew_runner import CrewItem, CrewPool, collect_items, summarize_results
+
+def echo_definition(definition, **options):
+    """Exécution simulée: renvoie le nom de la définition"""
+    if definition.get('sleep'):
+        time.sleep(definition['sleep'])
+    if definition.get('fail'):
+        raise RuntimeError('échec simulé')
+    return {'output': definition['name'], 'pid': os.getpid()}
+
+def crash_definition(definition, **options):
+    """Exécution simulée qui tue son processus"""
+    os._exit(1)
+
+DEFINITION = {
+    'name': 'mini',
+    'agents': [{'name': 'Dev', 'role': 'Développeur', 'goal': 'Coder', 'backstory': 'Senior'}],
+    'tasks': [{'description': 'Écrire le code', 'expected_output': 'Code', 'agent': 'Dev'}]
+}
+
+class TestCrewRunner(unittest.TestCase):
+    """Tests pour le chargement des définitions et le pool de processus"""
+
+    def test_collect_items_from_yaml_and_json(self):
+        """Test du chargement des définitions depuis un répertoire"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            with open(os.path.join(tmp_dir, 'a.json'), 'w', encoding='utf-8') as f:
+                json.dump([DEFINITION, {**DEFINITION, 'name': 'autre'}], f)
+            with open(os.path.join(tmp_dir, 'b.yaml'), 'w', encoding='utf-8') as f:
+                f.write("agents: []\ntasks: []\n")
+            with open(os.path.join(tmp_dir, 'notes.txt'), 'w', encoding='utf-8') as f:
+                f.write("ignoré")
+            items = collect_items([tmp_dir], repeat=2)
+        self.assertEqual([item.name for item in items], ['mini', 'mini', 'autre', 'autre', 'b.yaml#0', 'b.yaml#0'])
+        self.assertEqual([item.index for item in items], list(range(6)))
+
+    def test_create_crew_from_definition(self):
+        """Test de la construction d'une équipe à partir d'une définition"""
+        crew = CrewFactory().create_crew_from_definition(DEFINITION)
+        self.assertEqual(len(crew.tasks), 1)
+        self.assertIs(crew.tasks[0].agent, crew.agents[0])
+        with self.assertRaises(ValueError):
+            CrewFactory().create_crew_from_definition({**DEFINITION, 'tasks': [{'agent': 'Inconnu'}]})
+        with self.assertRaises(ValueError):
+            CrewFactory().create_crew_from_definition({**DEFINITION, 'process': 'parallele'})
+
+    def test_pool_runs_items_in_parallel(self):
+        """Test de l'exécution répartie et de la capture des erreurs"""
+        items = [CrewItem(i, 'x.yaml', f'e{i}', {'name': f'e{i}', 'sleep': 0.3, 'fail': i == 3}) for i in range(4)]
+        results = list(CrewPool(4, timeout=30, execute=echo_definition, start_method='fork').run(items))
+        by_index = {result['index']: result for result in results}
+        self.assertEqual(sorted(by_index), [0, 1, 2, 3])
+        self.assertEqual(by_index[0]['output'], 'e0')
+        self.assertEqual(by_index[3]['status'], 'error')
+        self.assertIn('échec simulé', by_index[3]['error'])
+        self.assertGreater(len({result.get('pid') for result in results if 'pid' in result}), 1)
+
+    def test_timeout_and_crash_replace_worker(self):
+        """Test qu'un dépassement de délai ou un plantage tue et remplace le processus"""
+        pool = CrewPool(1, timeout=0.5, execute=echo_definition, start_method='fork')
+        items = [CrewItem(0, 'x', 'lent', {'name': 'lent', 'sleep': 30}), CrewItem(1, 'x', 'rapide', {'name': 'rapide'})]
+        results = list(pool.run(items))
+        self.assertEqual([result['status'] for result in results], ['timeout', 'ok'])
+        self.assertEqual(pool.restarts, 1)
+
+        crash_pool = CrewPool(1, timeout=30, execute=crash_definition, start_method='fork')
+        self.assertEqual([result['status'] for result in crash_pool.run([items[1]])], ['crashed'])
+
+        summary = summarize_results(results, elapsed=2.0, restarts=pool.restarts)
+        self.assertEqual(summary['statuses'], {'timeout': 1, 'ok': 1})
+        self.assertEqual(summary['throughput_per_min'], 60.0)
+        self.assertEqual(summary['latency']['count'], 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,11 +2,46 @@
 Tests unitaires pour le serveur CrewAI.
 """
 
+import os
+import runpy
 import unittest
 import json
-from unittest.mock import patch
-from crewai import Agent
-from crew_server import app, FactoryConfig, QueueManager, TaskConfig, MAX_QUEUE_SIZE
+import queue
+import threading
+import time
+import tracemalloc
+import tempfile
+from typing import Any
+from unittest.mock import Mock, patch
+from crewai import Agent, BaseLLM
+from crew_server import (
+    app, FactoryConfig, QueueManager, TaskConfig, MAX_QUEUE_SIZE, message_payload,
+    publish_event, session_manager
+)
+import crew_server
+from routing import ModelRouter
+from warm_pool import WarmPool
+from event_log import EventLog
+from checkpoints import CheckpointStore
+from runs import CrewRun
+
+class FinalAnswerLLM(BaseLLM):
+    """Modèle simulé qui conclut immédiatement"""
+    def call(self, messages, tools=None, callbacks=None, available_functions=None,
+             from_task=None, from_agent=None, response_model=None):
+        return 'Thought: ok\nFinal Answer: terminé'
+
+class CancellingLLM(BaseLLM):
+    """Modèle simulé qui prévient le test à chaque appel (pour demander l'arrêt), puis répond ou échoue"""
+    on_call: Any = None
+    fail: bool = False
+
+    def call(self, messages, tools=None, callbacks=None, available_functions=None,
+             from_task=None, from_agent=None, response_model=None):
+        self.on_call()
+        if self.fail:
+            raise RuntimeError('fournisseur indisponible')
+        return 'Thought: ok\nFinal Answer: première tâche'
 
 class TestCrewServer(unittest.TestCase):
     """Tests pour le serveur CrewAI"""
@@ -113,6 +148,454 @@ class TestCrewServer(unittest.TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertTrue(json.loads(response.data)['success'])
 
+    def test_large_message_stored_as_blob(self):
+        """Test du stockage hors bande des messages volumineux"""
+        self.assertEqual(message_payload("court"), {'message': "court"})
+
+        text = "ligne de code\n" * 500
+        payload = message_payload(text)
+        self.assertIn('blob', payload)
+        self.assertLess(len(payload['message']), len(text))
+
+        response = self.app.get(payload['blob']['url'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data.decode('utf-8'), text)
+
+        response = self.app.get(payload['blob']['url'], headers={'Range': 'bytes=0-4'})
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.data, b"ligne")
+        self.assertEqual(response.headers['Content-Range'], f"bytes 0-4/{len(text)}")
+
+        response = self.app.get('/blobs/' + '0' * 64)
+        self.assertEqual(response.status_code, 404)
+
+    def test_regenerated_output_streamed_as_delta(self):
+        """Test de l'envoi d'une différence lorsqu'une sortie est régénérée"""
+        session = session_manager.get_or_create('session-delta')
+        run = crew_server.CrewRun(run_id='run-delta', session=session)
+        text = "ligne de code\n" * 500
+        crew_server.task_callback(text, 'Développeur', run, 2)
+        crew_server.task_callback(text + "ligne ajoutée\n", 'Développeur', run, 2)
+
+        first, second = [json.loads(event.data) for event in session.broadcaster.events_after(0)]
+        self.assertIn('blob', first)
+        self.assertEqual(second['delta'], {'base': 1, 'ops': [len(text), "ligne ajoutée\n"],
+                                           'length': len(text) + 14})
+        self.assertEqual(second['version'], 2)
+        self.assertLess(len(json.dumps(second)), 300)
+
+        headers = {'X-Session-ID': 'session-delta'}
+        snapshot = json.loads(self.app.get('/snapshots/2?agent=Développeur', headers=headers).data)
+        self.assertEqual((snapshot['version'], snapshot['text']), (2, text + "ligne ajoutée\n"))
+        self.assertEqual(self.app.get('/snapshots/1?agent=Développeur', headers=headers).status_code, 404)
+
+    def test_large_delta_sent_as_blob(self):
+        """Test du remplacement d'une différence volumineuse par une référence de blob"""
+        session = session_manager.get_or_create('session-large-delta')
+        run = crew_server.CrewRun(run_id='run-large-delta', session=session)
+        text = "ligne de code\n" * 2000
+        changed = text[:len(text) // 2] + "ligne modifiée\n" * 600 + text[len(text) // 2:]
+        crew_server.task_callback(text, 'Développeur', run, 2)
+        crew_server.task_callback(changed, 'Développeur', run, 2)
+
+        first, second = [json.loads(event.data) for event in session.broadcaster.events_after(0)]
+        self.assertNotIn('delta', second)
+        self.assertEqual(second['version'], 2)
+        self.assertLess(len(json.dumps(second)), crew_server.BLOB_INLINE_THRESHOLD + 1024)
+        self.assertEqual(self.app.get(second['blob']['url']).get_data(as_text=True), changed)
+
+    @patch('crew_server.start_crew')
+    def test_restart_with_budget(self, mock_start):
+        """Test de la transmission et de la validation du budget au redémarrage"""
+        mock_start.return_value = crew_server.CrewRun(run_id='run-budget', session=None)
+        response = self.app.post('/restart_crew', data=json.dumps({'budget': {'hard_cost_usd': 0.5}}),
+                                 content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(mock_start.call_args.kwargs['budget'].hard_cost_usd, 0.5)
+        response = self.app.post('/restart_crew', data=json.dumps({'budget': {'downgrade_model': 'gpt-4.1-nano'}}),
+                                 content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(mock_start.call_args.kwargs['budget'].downgrade_model, 'gpt-4.1-nano')
+        for budget in ({'inconnu': 1}, {'hard_cost_usd': 'beaucoup'}, {'soft_tokens': True},
+                       {'hard_tokens': -1}, {'downgrade_model': 3}, {'_over': 1},
+                       {'downgrade_model': 'gpt-4'}, {'downgrade_model': 'gpt-4o-mini-inconnu'},
+                       {'downgrade_model': 'fournisseur/modele-prive'}):
+            response = self.app.post('/restart_crew', data=json.dumps({'budget': budget}),
+                                     content_type='application/json')
+            self.assertEqual(response.status_code, 400, budget)
+        self.assertEqual(mock_start.call_count, 2)
+
+    def test_budgets_downgrade_then_cancel_run(self):
+        """Test du changement de modèle puis de l'arrêt d'une exécution selon son budget"""
+        session = session_manager.get_or_create('session-budget')
+        run = crew_server.CrewRun(run_id='run-budget', session=session, agents=[self.test_agent])
+        run.usage = crew_server.RunUsage(
+            run.run_id, crew_server.Budget(soft_tokens=100, hard_tokens=1000, downgrade_model='gpt-4o-mini'),
+            on_soft=lambda usage: crew_server.on_soft_budget(run, usage),
+            on_hard=lambda usage: crew_server.on_hard_budget(run, usage)
+        )
+        run.usage.record('gpt-4o', 'Test Role', None, {'prompt_tokens': 200, 'completion_tokens': 0})
+        self.assertEqual(self.test_agent.llm.model, 'gpt-4o-mini')
+        self.assertFalse(run.stop_event.is_set())
+
+        run.usage.record('gpt-4o-mini', 'Test Role', None, {'prompt_tokens': 900, 'completion_tokens': 0})
+        self.assertTrue(run.stop_event.is_set())
+        self.assertIn('Budget dépassé', run.error)
+        with self.assertRaises(crew_server.RunCancelled):
+            run.check_cancelled()
+        types = [event.event_type for event in session.broadcaster.events_after(0)]
+        self.assertEqual(types, ['status', 'error'])
+        self.assertEqual(run.to_dict()['usage']['total_tokens'], 1100)
+
+    @patch('crew_server.restart_crew')
+    def test_sessions_are_isolated(self, mock_restart):
+        """Test que chaque session a sa propre configuration et son propre flux"""
+        response = self.app.post('/update_factory_goal',
+                               data=json.dumps({'goal': 'Objectif A'}),
+                               content_type='application/json',
+                               headers={'X-Session-ID': 'session-a'})
+        self.assertEqual(response.status_code, 200)
+
+        config_a = json.loads(self.app.get('/get_factory_config', headers={'X-Session-ID': 'session-a'}).data)
+        config_b = json.loads(self.app.get('/get_factory_config', headers={'X-Session-ID': 'session-b'}).data)
+        self.assertEqual(config_a['goal'], 'Objectif A')
+        self.assertNotEqual(config_b['goal'], 'Objectif A')
+
+        session_a = session_manager.get('session-a')
+        session_b = session_manager.get('session-b')
+        publish_event(session_a, 'status', message='pour A')
+        self.assertEqual(len(session_a.broadcaster.events_after(0)), 1)
+        self.assertEqual(session_b.broadcaster.events_after(0), [])
+
+    def test_factory_config_conditional_requests(self):
+        """Test que la configuration est revalidée par ETag et change de version à chaque mise à jour"""
+        headers = {'X-Session-ID': 'session-cache'}
+        first = self.app.get('/get_factory_config', headers=headers)
+        etag = first.headers['ETag']
+        self.assertIn('Last-Modified', first.headers)
+        self.assertIn('private', first.headers['Cache-Control'])
+        unchanged = self.app.get('/get_factory_config', headers={**headers, 'If-None-Match': etag})
+        self.assertEqual(unchanged.status_code, 304)
+
+        with patch('crew_server.restart_crew'):
+            self.app.post('/update_factory_goal', data=json.dumps({'goal': 'Nouvel objectif'}),
+                          content_type='application/json', headers=headers)
+        updated = self.app.get('/get_factory_config', headers={**headers, 'If-None-Match': etag})
+        self.assertEqual(updated.status_code, 200)
+        data = json.loads(updated.data)
+        self.assertEqual(data['goal'], 'Nouvel objectif')
+        self.assertEqual(data['version'], json.loads(first.data)['version'] + 1)
+
+        with patch('crew_server.restart_crew'):
+            response = self.app.post('/update_factory_goal', data=json.dumps({'goal': ''}),
+                                     content_type='application/json', headers=headers)
+        self.assertEqual(response.status_code, 400)
+
+    def test_index_and_static_assets_cached(self):
+        """Test de la page revalidée par ETag et des ressources versionnées mises en cache sans limite"""
+        page = self.app.get('/')
+        self.assertEqual(page.status_code, 200)
+        self.assertEqual(self.app.get('/', headers={'If-None-Match': page.headers['ETag']}).status_code, 304)
+        script_url = crew_server.static_assets.url('dashboard.js')
+        self.assertIn(script_url, page.get_data(as_text=True))
+
+        script = self.app.get(script_url, headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(script.status_code, 200)
+        self.assertIn('immutable', script.headers['Cache-Control'])
+        self.assertEqual(script.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(self.app.get('/assets/0/inconnu.js').status_code, 404)
+
+    def test_session_cookie_is_issued(self):
+        """Test qu'un cookie de session est attribué aux nouveaux clients"""
+        response = self.app.get('/get_factory_config')
+        self.assertIn('crew_session=', response.headers.get('Set-Cookie', ''))
+
+    def test_run_artifacts_download(self):
+        """Test du téléchargement des livrables: liste, plages, archive zip et reprise"""
+        with tempfile.TemporaryDirectory() as tmp_dir, \
+                patch.object(crew_server, 'checkpoint_store', CheckpointStore(tmp_dir)):
+            headers = {'X-Session-ID': 'session-livrables'}
+            checkpoint = crew_server.checkpoint_store.create('run-livrables', 'session-livrables', {})
+            crew_server.checkpoint_store.record_task(checkpoint, 2, 'Développeur', "```python\nprint('ok')\n```")
+            crew_server.checkpoint_store.finish(checkpoint, 'completed', 'Résultat ' * 5000)
+
+            manifest = json.loads(self.app.get('/runs/run-livrables/artifacts', headers=headers).data)
+            names = [entry['name'] for entry in manifest['artifacts']]
+            self.assertEqual(names, ['taches/03-developpeur.md', 'code/03-developpeur-1.py', 'resultat.md'])
+            self.assertEqual(self.app.get('/runs/run-livrables/artifacts', headers={'X-Session-ID': 'autre'}).status_code, 404)
+
+            code = self.app.get('/runs/run-livrables/artifacts/code/03-developpeur-1.py', headers=headers)
+            self.assertEqual(code.data, b"print('ok')\n")
+            partial = self.app.get('/runs/run-livrables/artifacts/resultat.md',
+                                   headers={**headers, 'Range': 'bytes=0-8'})
+            self.assertEqual(partial.status_code, 206)
+            self.assertEqual(partial.data.decode('utf-8'), 'Résultat')
+            self.assertEqual(partial.headers['Content-Range'], f"bytes 0-8/{len(('Résultat ' * 5000).encode('utf-8'))}")
+
+            full = self.app.get('/runs/run-livrables/artifacts.zip', headers=headers)
+            self.assertEqual(full.status_code, 200)
+            self.assertTrue(full.is_streamed)
+            self.assertEqual(full.headers['Accept-Ranges'], 'bytes')
+            etag = full.headers['ETag']
+            resumed = self.app.get('/runs/run-livrables/artifacts.zip',
+                                   headers={**headers, 'Range': 'bytes=100-', 'If-Range': etag})
+            self.assertEqual(resumed.status_code, 206)
+            self.assertEqual(full.data[:100] + resumed.data, full.data)
+            stale = self.app.get('/runs/run-livrables/artifacts.zip',
+                                 headers={**headers, 'Range': 'bytes=100-', 'If-Range': '"autre"'})
+            self.assertEqual(stale.status_code, 200)
+            self.assertEqual(self.app.get('/runs/run-livrables/artifacts.zip',
+                                          headers={**headers, 'If-None-Match': etag}).status_code, 304)
+
+    def test_resume_crew(self):
+        """Test de la reprise d'une exécution à partir de son point de reprise"""
+        with tempfile.TemporaryDirectory() as tmp_dir, tempfile.TemporaryDirectory() as trace_dir, \
+                patch.object(crew_server, 'checkpoint_store', CheckpointStore(tmp_dir)), \
+                patch.object(crew_server.tracer, 'directory', trace_dir), \
+                patch.object(crew_server.tracer, 'sample_rate', 1.0):
+            headers = {'X-Session-ID': 'session-reprise'}
+            response = self.app.post('/resume_crew', headers=headers)
+            self.assertEqual(response.status_code, 404)
+
+            # Exécution interrompue après ses quatre tâches, avant la notification de fin
+            checkpoint = crew_server.checkpoint_store.create('run-reprise', 'session-reprise', {
+                'Directeur Factory': {'role': 'Directeur Factory', 'goal': 'g', 'backstory': 'b'}
+            })
+            for index in range(4):
+                crew_server.checkpoint_store.record_task(checkpoint, index, 'Testeur', f'sortie {index}')
+
+            response = self.app.post('/resume_crew', headers=headers)
+            self.assertEqual(response.status_code, 200)
+            data = json.loads(response.data)
+            self.assertEqual(data['run_id'], 'run-reprise')
+            self.assertEqual(data['completed_tasks'], 4)
+
+            session = session_manager.get('session-reprise')
+            session.crew_thread.join(timeout=5)
+            resumed = crew_server.checkpoint_store.load('run-reprise')
+            self.assertEqual(resumed.status, 'completed')
+            self.assertEqual(resumed.result, 'sortie 3')
+            self.assertEqual(resumed.resume_count, 1)
+            types = [e.event_type for e in session.broadcaster.events_after(0)]
+            self.assertEqual(types.count('task_update'), 4)
+            self.assertEqual(types[-1], 'complete')
+
+            trace = json.loads(self.app.get('/runs/run-reprise/trace', headers=headers).data)
+            names = {event['name'] for event in trace['traceEvents']}
+            self.assertTrue({'run', 'build_crew', 'publish'} <= names)
+            response = self.app.get('/runs/run-reprise/trace', headers={'X-Session-ID': 'autre'})
+            self.assertEqual(response.status_code, 404)
+
+            status = json.loads(self.app.get('/runs/run-reprise', headers=headers).data)
+            self.assertEqual(status['status'], 'completed')
+            self.assertFalse(status['memory']['holds_crew'])
+            self.assertGreater(status['memory']['event_bytes'], 0)
+            response = self.app.get('/runs/run-reprise', headers={'X-Session-ID': 'autre'})
+            self.assertEqual(response.status_code, 404)
+
+            response = self.app.post('/resume_crew', data=json.dumps({'run_id': 'run-reprise'}),
+                                     content_type='application/json', headers=headers)
+            self.assertEqual(response.status_code, 409)
+
+    def test_resume_refused_while_run_alive(self):
+        """Test du refus de reprendre une exécution dont le thread tourne encore"""
+        with tempfile.TemporaryDirectory() as tmp_dir, \
+                patch.object(crew_server, 'checkpoint_store', CheckpointStore(tmp_dir)):
+            headers = {'X-Session-ID': 'session-vivante'}
+            crew_server.checkpoint_store.create('run-vivante', 'session-vivante', {})
+            release = threading.Event()
+            thread = threading.Thread(target=release.wait, daemon=True)
+            thread.start()
+            self.addCleanup(release.set)
+            crew_server.run_registry.register(CrewRun(
+                run_id='run-vivante', session=session_manager.get_or_create('session-vivante'), thread=thread
+            ))
+
+            response = self.app.post('/resume_crew', headers=headers)
+            self.assertEqual(response.status_code, 409)
+            self.assertIn('toujours en cours', json.loads(response.data)['error'])
+
+    def test_gunicorn_post_fork_starts_warm_pool(self):
+        """Test du démarrage de la réserve dans le worker gunicorn, et non à l'import du module"""
+        hooks = runpy.run_path(os.path.join(os.path.dirname(crew_server.__file__), 'gunicorn.conf.py'))
+        with patch.object(crew_server, 'crew_workers', Mock()) as pool:
+            hooks['post_fork'](None, None)
+        pool.start.assert_called_once_with()
+
+    def test_restart_handed_to_warm_worker(self):
+        """Test d'un redémarrage confié à un thread préchauffé: agents et modèles préconstruits, configuration appliquée"""
+        router = ModelRouter([], default_model='simule', llm_factory=lambda model, **options: FinalAnswerLLM(model=model))
+        with tempfile.TemporaryDirectory() as tmp_dir, tempfile.TemporaryDirectory() as trace_dir, \
+                patch.object(crew_server, 'checkpoint_store', CheckpointStore(tmp_dir)), \
+                patch.object(crew_server.tracer, 'directory', trace_dir), \
+                patch.object(crew_server, 'model_router', router):
+            pool = WarmPool(size=1, prepare=crew_server.prepare_warm_kit, replenish_delay=60).start()
+            self.addCleanup(pool.stop)
+            deadline = time.monotonic() + 10
+            while pool.stats()['standby'] == 0 and time.monotonic() < deadline:
+                time.sleep(0.01)
+
+            session = session_manager.get_or_create('session-prechauffee')
+            session.config.update(goal='Objectif préchauffé')
+            with patch.object(crew_server, 'crew_workers', pool):
+                run = crew_server.start_crew(session)
+            run.thread.join(timeout=10)
+
+            self.assertEqual(run.status, 'completed')
+            self.assertEqual(pool.stats()['warm_handoffs'], 1)
+            checkpoint = crew_server.checkpoint_store.load(run.run_id)
+            self.assertEqual(checkpoint.agents['Directeur Factory']['goal'], 'Objectif préchauffé')
+            self.assertEqual(len(checkpoint.tasks), 4)
+
+            status = json.loads(self.app.get(f'/runs/{run.run_id}',
+                                             headers={'X-Session-ID': 'session-prechauffee'}).data)
+            self.assertEqual(status['startup']['worker'], 'warm')
+            self.assertIsNotNone(status['startup']['handoff_ms'])
+
+    def test_cancelled_run_stops_llm_calls(self):
+        """Test de bout en bout: une exécution annulée n'appelle plus le modèle et ne publie pas sa fin"""
+        # Réponse finale: arrêt après la tâche; échec: les nouvelles tentatives de crewai sont bloquées
+        for fail in (False, True):
+            with self.subTest(fail=fail):
+                self.check_cancelled_run(fail)
+
+    def test_hard_budget_stops_run(self):
+        """Test de bout en bout: le dépassement du budget strict arrête l'exécution avant l'appel suivant"""
+        calls = []
+        session = session_manager.get_or_create('session-budget-strict')
+
+        def spend():
+            calls.append(1)
+            session.current_run.usage.record('simule', 'Directeur Factory', None,
+                                             {'prompt_tokens': 2000, 'completion_tokens': 0})
+        router = ModelRouter([], default_model='simule', llm_factory=lambda model, **options: CancellingLLM(
+            model=model, on_call=spend))
+        with tempfile.TemporaryDirectory() as tmp_dir, tempfile.TemporaryDirectory() as trace_dir, \
+                patch.object(crew_server, 'checkpoint_store', CheckpointStore(tmp_dir)), \
+                patch.object(crew_server.tracer, 'directory', trace_dir), \
+                patch.object(crew_server, 'model_router', router), \
+                patch.object(crew_server, 'crew_workers', WarmPool(size=0)):
+            run = crew_server.start_crew(session, budget=crew_server.Budget(hard_tokens=1000))
+            run.thread.join(timeout=30)
+
+            self.assertEqual(len(calls), 1)
+            self.assertEqual(run.status, 'cancelled')
+            self.assertIn('Budget dépassé', run.error)
+            types = [e.event_type for e in session.broadcaster.events_after(0)]
+            self.assertNotIn('complete', types)
+
+    def check_cancelled_run(self, fail):
+        calls = []
+        session = session_manager.get_or_create(f'session-annulee-{fail}')
+
+        def cancel():
+            calls.append(session.current_run.run_id)
+            crew_server.run_registry.cancel(session.current_run, 'arrêt demandé')
+        router = ModelRouter([], default_model='simule', llm_factory=lambda model, **options: CancellingLLM(
+            model=model, on_call=cancel, fail=fail))
+        with tempfile.TemporaryDirectory() as tmp_dir, tempfile.TemporaryDirectory() as trace_dir, \
+                patch.object(crew_server, 'checkpoint_store', CheckpointStore(tmp_dir)), \
+                patch.object(crew_server.tracer, 'directory', trace_dir), \
+                patch.object(crew_server, 'model_router', router), \
+                patch.object(crew_server, 'crew_workers', WarmPool(size=0)):
+            run = crew_server.start_crew(session)
+            run.thread.join(timeout=30)
+
+            self.assertFalse(run.is_alive)
+            self.assertEqual(len(calls), 1)
+            self.assertEqual(run.status, 'cancelled')
+            self.assertEqual(run.error, 'arrêt demandé')
+            types = [e.event_type for e in session.broadcaster.events_after(0)]
+            self.assertNotIn('complete', types)
+            self.assertNotIn('error', types)
+            self.assertEqual(crew_server.checkpoint_store.load(run.run_id).status, 'running')
+
+    def test_event_log_search(self):
+        """Test de la journalisation des événements d'exécution et de leur recherche"""
+        with tempfile.TemporaryDirectory() as tmp_dir, \
+                patch.object(crew_server, 'event_log', EventLog(tmp_dir)):
+            session = session_manager.get_or_create('session-journal')
+            publish_event(session, 'status', run_id='run-journal', message='Équipe créée')
+            publish_event(session, 'error', run_id='run-journal', message='Échec de connexion au fournisseur')
+            # Sans exécution, l'événement n'est pas journalisé
+            publish_event(session, 'status', message='Échec hors exécution')
+
+            headers = {'X-Session-ID': 'session-journal'}
+            data = json.loads(self.app.get('/events/search?q=echec', headers=headers).data)
+            self.assertEqual([event['type'] for event in data['events']], ['error'])
+            self.assertEqual(data['events'][0]['run_id'], 'run-journal')
+
+            data = json.loads(self.app.get('/events/search?run_id=run-journal&order=desc&limit=1', headers=headers).data)
+            self.assertEqual(data['events'][0]['type'], 'error')
+            cursor = data['next_cursor']
+            data = json.loads(self.app.get(f'/events/search?run_id=run-journal&order=desc&cursor={cursor}',
+                                           headers=headers).data)
+            self.assertEqual([event['message'] for event in data['events']], ['Équipe créée'])
+
+            data = json.loads(self.app.get('/events/search?since=2000-01-01T00:00:00&type=status', headers=headers).data)
+            self.assertEqual(len(data['events']), 1)
+            data = json.loads(self.app.get('/events/search', headers={'X-Session-ID': 'autre'}).data)
+            self.assertEqual(data['events'], [])
+            self.assertEqual(self.app.get('/events/search?since=hier', headers=headers).status_code, 400)
+
+            # Une sortie volumineuse n'est publiée qu'en aperçu: son texte complet est indexé
+            output = 'Introduction. ' * 300 + 'Conclusion: zephyrine'
+            run = crew_server.CrewRun(run_id='run-journal', session=session)
+            crew_server.task_callback(output, 'Testeur', run, 3)
+            data = json.loads(self.app.get('/events/search?q=zephyrine', headers=headers).data)
+            self.assertEqual([event['type'] for event in data['events']], ['task_update'])
+            self.assertIn('blob', data['events'][0])
+
+    def test_debug_memory(self):
+        """Test de la vue mémoire: tracemalloc n'est jamais démarré par une requête"""
+        with patch('crew_server.tracemalloc.is_tracing', return_value=False), \
+                patch('crew_server.tracemalloc.start') as mock_start:
+            data = json.loads(self.app.get('/debug/memory').data)
+        mock_start.assert_not_called()
+        self.assertFalse(data['tracemalloc']['enabled'])
+        self.assertIn('CREW_TRACEMALLOC', data['tracemalloc']['message'])
+        self.assertIn('zombies', data['runs'])
+        self.assertIn('buffered_bytes', data['sessions'])
+
+        tracing = tracemalloc.is_tracing()
+        tracemalloc.start(crew_server.TRACEMALLOC_FRAMES)
+        try:
+            response = self.app.get('/debug/memory?limit=5')
+        finally:
+            if not tracing:
+                tracemalloc.stop()
+        self.assertEqual(response.status_code, 200)
+        self.assertLessEqual(len(json.loads(response.data)['tracemalloc']['top']), 5)
+
+        # Les identifiants de session donnent accès aux sessions: ils ne sont jamais exposés
+        run = crew_server.run_registry.register(crew_server.CrewRun(
+            run_id='run-debug', session=session_manager.get_or_create('session-secrete')))
+        crew_server.run_registry.finish(run, 'completed')
+        response = self.app.get('/debug/memory?limit=500')
+        self.assertIn(b'run-debug', response.data)
+        self.assertNotIn(b'session-secrete', response.data)
+
+    @patch('crew_server.run_registry.register', side_effect=crew_server.TooManyZombieRuns('trop'))
+    def test_restart_refused_with_too_many_zombies(self, mock_register):
+        """Test du refus de redémarrage lorsque trop d'exécutions zombies subsistent"""
+        response = self.app.post('/restart_crew', headers={'X-Session-ID': 'session-zombies'})
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.headers['Retry-After'], '5')
+
+    def test_capacity_limits_return_503(self):
+        """Test des réponses 503 lorsque les exécutions ou les sessions simultanées atteignent leur limite"""
+        with patch('crew_server.run_registry.register', side_effect=crew_server.TooManyActiveRuns('plein')):
+            response = self.app.post('/restart_crew', headers={'X-Session-ID': 'session-pleine'})
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.headers['Retry-After'], '5')
+
+        with patch.object(crew_server.session_manager, 'get_or_create',
+                          side_effect=crew_server.TooManySessions('plein')):
+            for method, path in (('post', '/restart_crew'), ('get', '/get_factory_config')):
+                response = getattr(self.app, method)(path, headers={'X-Session-ID': 'session-nouvelle'})
+                self.assertEqual(response.status_code, 503, path)
+                self.assertEqual(json.loads(response.data)['error'], 'plein')
+
     def test_task_config_validation(self):
         """Test de la validation de la configuration des tâches"""
         # Test avec des valeurs valides
@@ -0,0 +1,55 @@
+"""
+Tests unitaires pour la diffusion incrémentale des sorties.
+"""
+
+import unittest
+from deltas import TextVersions, apply_delta, compute_delta, utf16_len
+
+class TestDeltas(unittest.TestCase):
+    """Tests pour le calcul et l'application des différences"""
+
+    def test_round_trip(self):
+        """Test qu'une différence appliquée à la base redonne le nouveau texte"""
+        cases = [
+            ('', 'nouveau'),
+            ('ancien\n', ''),
+            ('a\nb\nc\n', 'a\nB\nc\nd\n'),
+            ('un long paragraphe sans retour', 'un court paragraphe sans retour'),
+            ('émoji 😀 ici\nfin', 'émoji 😀 là\nfin 🎉')
+        ]
+        for old, new in cases:
+            self.assertEqual(apply_delta(old, compute_delta(old, new)), new)
+
+    def test_lengths_in_utf16_units(self):
+        """Test que les longueurs suivent les chaînes JavaScript"""
+        self.assertEqual(utf16_len('a😀'), 3)
+        self.assertEqual(compute_delta('😀\nx', '😀\ny'), [3, -1, 'y'])
+
+    def test_versions_fall_back_to_full_text(self):
+        """Test des cas où le texte complet est préférable à une différence"""
+        versions = TextVersions(min_chars=10)
+        text = 'ligne stable\n' * 50
+        first = versions.update(('Dev', 2), text)
+        self.assertEqual((first.version, first.ops), (1, None))
+
+        second = versions.update(('Dev', 2), text + 'ajout\n')
+        self.assertEqual((second.version, second.base_version), (2, 1))
+        self.assertEqual(second.ops, [len(text), 'ajout\n'])
+        self.assertEqual(second.length, len(text) + 6)
+
+        rewritten = versions.update(('Dev', 2), 'tout autre chose\n' * 50)
+        self.assertIsNone(rewritten.ops)
+        self.assertEqual(versions.get(('Dev', 2))[0], 3)
+        self.assertIsNone(versions.update(('Dev', 2), 'court').ops)
+        self.assertIsNone(versions.update(('Test', 3), text).ops)
+
+    def test_versions_bounded(self):
+        """Test du nombre borné de sorties suivies"""
+        versions = TextVersions(max_outputs=2)
+        for index in range(3):
+            versions.update(('Dev', index), 'x')
+        self.assertIsNone(versions.get(('Dev', 0)))
+        self.assertEqual(versions.get(('Dev', 2)), (1, 'x'))
+
+if __name__ == '__main__':
+    unittest.main()
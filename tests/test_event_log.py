@@ -0,0 +1,164 @@
+"""
+Tests unitaires pour le journal des événements d'exécution.
+"""
+
+import os
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+from event_log import EventLog, tokenize
+from event_stream import dumps
+
+def make_event(index):
+    return {
+        'type': 'error' if index % 10 == 9 else 'task_update',
+        'agent': 'Développeur' if index % 2 else 'Testeur',
+        'run_id': f"run-{index // 20}",
+        'message': f"Échec de la compilation {index}" if index % 10 == 9 else f"Étape {index} terminée"
+    }
+
+class TestEventLog(unittest.TestCase):
+    """Tests pour l'indexation, la recherche, la reprise après arrêt, la fusion et la rétention"""
+
+    def setUp(self):
+        """Configuration initiale pour les tests"""
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.directory = self.tmp_dir.name
+
+    def fill(self, log, count, session='s1'):
+        for index in range(count):
+            event = make_event(index)
+            log.append(session, event, dumps(event))
+
+    def test_tokenize(self):
+        """Test des termes indexés: minuscules, sans accents ni doublons"""
+        self.assertEqual(tokenize("Échec de l'API: échec"), ['echec', 'de', 'api'])
+
+    def test_query_across_segments(self):
+        """Test des recherches par critères et par texte sur plusieurs segments, avec pagination"""
+        log = EventLog(self.directory, segment_max_bytes=1500)
+        self.fill(log, 100)
+        self.assertGreater(log.stats()['segments'], 3)
+
+        result = log.query(session_id='s1', run_id='run-2', event_type='error')
+        self.assertEqual([event['seq'] for event in result['events']], [49, 59])
+        self.assertEqual(result['events'][0]['message'], 'Échec de la compilation 49')
+
+        result = log.query(text='ECHEC compilation', agent='Développeur')
+        self.assertEqual(len(result['events']), 10)
+        # Le filtre de Bloom écarte les segments qui ne contiennent pas le terme
+        result = log.query(text='compilation 79')
+        self.assertEqual([event['seq'] for event in result['events']], [79])
+        self.assertEqual(result['scanned_segments'], 1)
+        self.assertEqual(log.query(session_id='autre')['events'], [])
+
+        first = log.query(run_id='run-1', limit=15)
+        self.assertEqual(first['next_cursor'], 34)
+        second = log.query(run_id='run-1', limit=15, cursor=first['next_cursor'])
+        self.assertEqual([event['seq'] for event in second['events']], list(range(35, 40)))
+        self.assertIsNone(second['next_cursor'])
+        latest = log.query(limit=3, descending=True, cursor=50)
+        self.assertEqual([event['seq'] for event in latest['events']], [49, 48, 47])
+
+    def test_time_range(self):
+        """Test d'une recherche par période, y compris sur le segment en cours d'écriture"""
+        log = EventLog(self.directory, segment_max_bytes=1500)
+        with patch('event_log.time.time') as clock:
+            for index in range(60):
+                clock.return_value = 1000.0 + index
+                event = make_event(index)
+                log.append('s1', event, dumps(event))
+        result = log.query(since=1010.0, until=1013.0)
+        self.assertEqual([event['seq'] for event in result['events']], [10, 11, 12])
+        self.assertEqual(len(log.query(since=1055.0)['events']), 5)
+
+    def test_recovery_after_crash(self):
+        """Test de la réindexation d'un segment non scellé et de la troncature d'une ligne incomplète"""
+        log = EventLog(self.directory)
+        self.fill(log, 10)
+        log._file.write(b'{"ts":1,"session":"s1","ev')
+        log._file.flush()
+
+        reopened = EventLog(self.directory)
+        self.assertEqual(reopened.stats()['events'], 10)
+        event = make_event(10)
+        self.assertEqual(reopened.append('s1', event, dumps(event)), 10)
+        self.assertEqual(len(reopened.query(text='echec')['events']), 1)
+
+    def test_full_text_indexed_beyond_preview(self):
+        """Test de l'indexation du texte complet d'un événement réduit à un aperçu, y compris après reprise"""
+        log = EventLog(self.directory)
+        event = {'type': 'task_update', 'run_id': 'run-0', 'message': 'Aperçu de la sortie'}
+        log.append('s1', event, dumps(event), text='Aperçu de la sortie ' + 'suite ' * 100 + 'zephyrine')
+        self.assertEqual(len(log.query(text='zephyrine')['events']), 1)
+        self.assertNotIn('terms', log.query(text='zephyrine')['events'][0])
+
+        reopened = EventLog(self.directory)
+        self.assertEqual(len(reopened.query(text='zephyrine aperçu')['events']), 1)
+
+    @patch.object(EventLog, '_maintain_in_background')
+    def test_compaction_and_retention(self, mock_maintain):
+        """Test de la fusion des petits segments et de la suppression des segments expirés"""
+        # Trois démarrages successifs laissent chacun un petit segment
+        for _ in range(3):
+            log = EventLog(self.directory, retention_days=1)
+            self.fill(log, 10)
+            log.close()
+        log = EventLog(self.directory, retention_days=1)
+        self.assertEqual(log.stats()['segments'], 3)
+        self.assertTrue(mock_maintain.called)
+        self.assertEqual(log.maintain(), {'removed_segments': 0, 'merged_segments': 1})
+        self.assertEqual(log.stats()['segments'], 1)
+        self.assertEqual(sorted(os.listdir(self.directory)),
+                         ['000000000000.idx', '000000000000.log', '000000000000.terms'])
+        result = log.query(event_type='error')
+        self.assertEqual([event['seq'] for event in result['events']], [9, 19, 29])
+
+        self.assertEqual(log.maintain(now=time.time() + 2 * 86400)['removed_segments'], 1)
+        self.assertEqual(log.stats()['events'], 0)
+        self.assertEqual(os.listdir(self.directory), [])
+
+    @patch.object(EventLog, '_maintain_in_background')
+    def test_query_during_compaction(self, mock_maintain):
+        """Test qu'une recherche commencée avant une fusion relit les segments fusionnés au lieu de les ignorer"""
+        for _ in range(3):
+            log = EventLog(self.directory, maintenance_interval=0)
+            self.fill(log, 10)
+            log.close()
+        log = EventLog(self.directory, maintenance_interval=0)
+        self.assertEqual(log.stats()['segments'], 3)
+        original_index = EventLog._index
+        compacted = []
+
+        def index_after_compaction(event_log, info):
+            # La fusion survient entre la lecture de la liste des segments et celle de leurs index
+            if not compacted:
+                compacted.append(None)
+                compacted[0] = event_log._compact()
+            return original_index(event_log, info)
+
+        with patch.object(EventLog, '_index', index_after_compaction):
+            result = log.query(event_type='error')
+        self.assertEqual(compacted, [1])
+        self.assertEqual([event['seq'] for event in result['events']], [9, 19, 29])
+
+    def test_retention_without_sealing(self):
+        """Test de la rétention d'un journal dont le segment courant n'est jamais scellé par un ajout"""
+        log = EventLog(self.directory, retention_days=1, maintenance_interval=0)
+        self.fill(log, 10)
+        self.assertEqual(log.maintain(now=time.time() + 2 * 86400)['removed_segments'], 1)
+        self.assertEqual(log.stats()['events'], 0)
+
+        periodic = EventLog(self.directory, maintenance_interval=0.01)
+        with patch.object(periodic, 'maintain', wraps=periodic.maintain) as maintain:
+            periodic.stats()
+            deadline = time.monotonic() + 5
+            while not maintain.called and time.monotonic() < deadline:
+                time.sleep(0.01)
+            periodic.close()
+        self.assertTrue(maintain.called)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+"""
+Tests unitaires pour l'encodage et la diffusion des événements.
+"""
+
+import json
+import unittest
+from datetime import datetime
+from unittest.mock import patch
+import event_stream
+from event_stream import EventBroadcaster, HEARTBEAT_WIRE, dumps, encode_event
+
+class TestEventStream(unittest.TestCase):
+    """Tests pour la couche d'encodage des événements"""
+
+    def test_encode_event_wire_format(self):
+        """Test du format SSE produit"""
+        event = encode_event(7, 'task_update', b'{"a":1}')
+        self.assertEqual(event.wire, b'id: 7\nevent: task_update\ndata: {"a":1}\n\n')
+
+    def test_dumps_fallback_without_orjson(self):
+        """Test de l'encodage avec la bibliothèque standard"""
+        moment = datetime(2024, 1, 2, 3, 4, 5)
+        with patch.object(event_stream, 'orjson', None):
+            data = dumps({'timestamp': moment, 'message': 'é\nfin', 'obj': object})
+        decoded = json.loads(data)
+        self.assertEqual(decoded['timestamp'], '2024-01-02T03:04:05')
+        self.assertEqual(decoded['message'], 'é\nfin')
+        self.assertNotIn(b'\n', data)
+
+    def test_subscribers_share_encoded_bytes(self):
+        """Test que tous les abonnés reçoivent les mêmes octets"""
+        broadcaster = EventBroadcaster()
+        first = broadcaster.stream(last_id=0, heartbeat=0.01)
+        second = broadcaster.stream(last_id=0, heartbeat=0.01)
+        event = broadcaster.publish('status', {'type': 'status', 'message': 'ok'})
+        self.assertIs(next(first), event.wire)
+        self.assertIs(next(second), event.wire)
+        self.assertEqual(next(first), HEARTBEAT_WIRE)
+        self.assertEqual(broadcaster.subscribers, 2)
+        first.close()
+        second.close()
+        self.assertEqual(broadcaster.subscribers, 0)
+
+    def test_resume_with_unknown_last_id_replays_buffer(self):
+        """Test qu'un Last-Event-ID postérieur au dernier identifiant (redémarrage) rejoue le tampon"""
+        broadcaster = EventBroadcaster()
+        first = broadcaster.publish('status', {'i': 1})
+        stream = broadcaster.stream(last_id=500, heartbeat=0.01)
+        self.assertIs(next(stream), first.wire)
+        second = broadcaster.publish('status', {'i': 2})
+        self.assertIs(next(stream), second.wire)
+        stream.close()
+
+    def test_resume_and_bounded_buffer(self):
+        """Test de la reprise après un identifiant et de la taille du tampon"""
+        broadcaster = EventBroadcaster(maxlen=3)
+        for i in range(5):
+            broadcaster.publish('status', {'i': i})
+        self.assertEqual([e.event_id for e in broadcaster.events_after(0)], [3, 4, 5])
+        self.assertEqual([e.event_id for e in broadcaster.events_after(4)], [5])
+        broadcaster.clear()
+        self.assertEqual(broadcaster.events_after(0), [])
+        self.assertEqual(broadcaster.publish('status', {}).event_id, 6)
+
+    def test_buffer_bounded_in_bytes(self):
+        """Test de la limite en octets du tampon"""
+        broadcaster = EventBroadcaster(maxlen=100, max_bytes=200)
+        for i in range(10):
+            broadcaster.publish('status', {'message': 'x' * 50})
+        events = broadcaster.events_after(0)
+        self.assertLessEqual(broadcaster.buffered_bytes, 200)
+        self.assertEqual(broadcaster.buffered_bytes, sum(len(e.wire) for e in events))
+        self.assertEqual(events[-1].event_id, 10)
+        broadcaster.publish('status', {'message': 'y' * 500})
+        self.assertEqual(len(broadcaster.events_after(0)), 1)
+
+if __name__ == '__main__':
+    unittest.main()
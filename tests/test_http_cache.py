@@ -0,0 +1,123 @@
+"""
+Tests unitaires pour la mise en cache HTTP.
+"""
+
+import gzip
+import os
+import tempfile
+import unittest
+from flask import Flask, Response, jsonify, request
+from http_cache import (
+    CACHE_IMMUTABLE, COMPRESS_MIN_BYTES, RenderCache, StaticAssets, brotli, compress_response, conditional
+)
+
+class TestHttpCache(unittest.TestCase):
+    """Tests pour les réponses conditionnelles, la compression et les ressources statiques"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.assets = StaticAssets(self.tmp_dir.name)
+        self.write('app.js', 'console.log("version 1");\n' * 100)
+
+        app = Flask(__name__)
+        assets = self.assets
+
+        @app.route('/data')
+        def data():
+            return conditional(jsonify({'items': list(range(int(request.args.get('n', 1000))))}), request)
+
+        @app.route('/stream')
+        def stream():
+            return Response((chunk for chunk in ['x' * 2000]), mimetype='text/plain')
+
+        @app.route('/assets/<digest>/<path:filename>')
+        def asset(digest, filename):
+            found = assets.get(filename)
+            return assets.response(found, digest, request) if found else ('', 404)
+
+        @app.after_request
+        def after(response):
+            return compress_response(response, request.accept_encodings)
+
+        self.client = app.test_client()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def write(self, name, text):
+        path = os.path.join(self.tmp_dir.name, name)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        # Garantit une date de modification différente d'une écriture à l'autre
+        stat = os.stat(path)
+        os.utime(path, (stat.st_atime, stat.st_mtime + len(text)))
+
+    def test_conditional_returns_304(self):
+        """Test qu'une requête conditionnelle sur un contenu inchangé reçoit 304"""
+        first = self.client.get('/data')
+        self.assertEqual(first.status_code, 200)
+        etag = first.headers['ETag']
+        self.assertEqual(first.headers['Cache-Control'], 'no-cache')
+        second = self.client.get('/data', headers={'If-None-Match': etag})
+        self.assertEqual(second.status_code, 304)
+        self.assertEqual(second.data, b'')
+        changed = self.client.get('/data?n=5', headers={'If-None-Match': etag})
+        self.assertEqual(changed.status_code, 200)
+
+    def test_gzip_compression_and_weak_etag(self):
+        """Test de la compression gzip, de l'ETag faible et de la revalidation de la version compressée"""
+        response = self.client.get('/data', headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response.headers['Vary'])
+        self.assertIn(b'"items"', gzip.decompress(response.data))
+        self.assertTrue(response.headers['ETag'].startswith('W/'))
+        revalidated = self.client.get('/data', headers={'Accept-Encoding': 'gzip',
+                                                        'If-None-Match': response.headers['ETag']})
+        self.assertEqual(revalidated.status_code, 304)
+
+        small = self.client.get('/data?n=3', headers={'Accept-Encoding': 'gzip'})
+        self.assertLess(len(small.data), COMPRESS_MIN_BYTES)
+        self.assertNotIn('Content-Encoding', small.headers)
+        identity = self.client.get('/data')
+        self.assertNotIn('Content-Encoding', identity.headers)
+        streamed = self.client.get('/stream', headers={'Accept-Encoding': 'gzip'})
+        self.assertNotIn('Content-Encoding', streamed.headers)
+
+    @unittest.skipIf(brotli is None, "brotli non installé")
+    def test_brotli_preferred(self):
+        """Test que brotli est préféré à gzip lorsque le client accepte les deux"""
+        response = self.client.get('/data', headers={'Accept-Encoding': 'gzip, deflate, br'})
+        self.assertEqual(response.headers['Content-Encoding'], 'br')
+        self.assertIn(b'"items"', brotli.decompress(response.data))
+
+    def test_static_asset_versioning(self):
+        """Test des URL versionnées, du cache immuable et du changement d'URL à la modification"""
+        url = self.assets.url('app.js')
+        response = self.client.get(url, headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers['Cache-Control'], CACHE_IMMUTABLE)
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertIn(b'version 1', gzip.decompress(response.data))
+        fingerprint = self.assets.fingerprint()
+
+        self.write('app.js', 'console.log("version 2");\n' * 100)
+        new_url = self.assets.url('app.js')
+        self.assertNotEqual(new_url, url)
+        self.assertNotEqual(self.assets.fingerprint(), fingerprint)
+        stale = self.client.get(url)
+        self.assertEqual(stale.headers['Cache-Control'], 'no-cache')
+        self.assertIn(b'version 2', stale.data)
+        self.assertEqual(self.client.get('/assets/x/../secret').status_code, 404)
+
+    def test_render_cache(self):
+        """Test qu'un gabarit n'est rendu à nouveau que lorsque sa version change"""
+        renders = []
+        cache = RenderCache()
+        render = lambda: renders.append(1) or f'page {len(renders)}'
+        first = cache.get('index.html', 'v1', render)
+        self.assertEqual(cache.get('index.html', 'v1', render), first)
+        self.assertEqual(len(renders), 1)
+        self.assertEqual(cache.get('index.html', 'v2', render)[0], b'page 2')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+"""
+Tests unitaires pour le générateur de charge SSE.
+"""
+
+import contextlib
+import io
+import threading
+import unittest
+from unittest.mock import patch
+import crew_server
+from latency_stats import percentile
+from load_generator import parse_args, parse_sse, run_load, stub_run_crew
+from werkzeug.serving import make_server
+
+class TestLoadGenerator(unittest.TestCase):
+    """Tests pour le générateur de charge"""
+
+    def test_percentile(self):
+        """Test du percentile par rang le plus proche"""
+        values = [float(i) for i in range(1, 101)]
+        self.assertEqual(percentile(values, 50), 50.0)
+        self.assertEqual(percentile(values, 99), 99.0)
+        self.assertEqual(percentile([3.0], 90), 3.0)
+        self.assertIsNone(percentile([], 50))
+
+    def test_parse_sse(self):
+        """Test du découpage d'un flux SSE"""
+        lines = [b'id: 1\n', b'event: status\n', b'data: {"a":1}\n', b'\n', b': heartbeat\n', b'\n']
+        events = list(parse_sse(lines))
+        self.assertEqual(events, [{'id': '1', 'event': 'status', 'data': '{"a":1}'}, None])
+
+    def test_sessions_bounded_by_registry(self):
+        """Test du refus d'un nombre de sessions supérieur à la capacité du registre"""
+        with self.assertRaises(SystemExit), contextlib.redirect_stderr(io.StringIO()):
+            parse_args(['--sessions', str(crew_server.session_manager.max_sessions + 1)])
+        self.assertEqual(parse_args(['--sessions', '3']).sessions, 3)
+
+    def test_short_run_report(self):
+        """Test d'un court scénario de charge avec une équipe simulée"""
+        original_run_crew = crew_server.run_crew
+        report = run_load(parse_args([
+            '--clients', '3', '--duration', '1', '--event-rate', '20',
+            '--restart-rate', '0', '--goal-rate', '0', '--sample-interval', '0.5'
+        ]))
+        self.assertIs(crew_server.run_crew, original_run_crew)
+        self.assertGreater(report['events']['delivered'], 0)
+        self.assertEqual(report['events']['client_errors'], [])
+        self.assertGreater(report['delivery_latency']['count'], 0)
+        self.assertEqual(len(report['timeline']), 2)
+        self.assertEqual(report['resources']['source'], 'in_process')
+
+    def test_external_server_report(self):
+        """Test du mode --url: la charge vise un serveur externe et ses ressources viennent de /debug/memory"""
+        server = make_server('127.0.0.1', 0, crew_server.app, threaded=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            with patch('crew_server.run_crew', stub_run_crew(20, 50)):
+                report = run_load(parse_args([
+                    '--url', f'http://127.0.0.1:{server.server_port}', '--clients', '2', '--duration', '1',
+                    '--restart-rate', '0', '--goal-rate', '0', '--sample-interval', '0.5'
+                ]))
+                crew_server.session_manager.get_or_create('charge-0').stop_event.set()
+        finally:
+            server.shutdown()
+        self.assertEqual(report['resources']['source'], 'server')
+        self.assertEqual(report['events']['start_errors'], 0)
+        self.assertIsNone(report['events']['published'])
+        self.assertGreater(report['events']['delivered'], 0)
+        self.assertIsNotNone(report['resources']['threads_max'])
+        self.assertIsNotNone(report['resources']['rss_kb_end'])
+
+    def test_url_must_be_http(self):
+        """Test du refus d'une URL de serveur externe invalide"""
+        with self.assertRaises(SystemExit), contextlib.redirect_stderr(io.StringIO()):
+            parse_args(['--url', 'ftp://exemple'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,155 @@
+"""
+Tests unitaires pour le routage des modèles.
+"""
+
+import json
+import os
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch
+from crewai import Agent, BaseLLM, Crew, Task
+from routing import ModelRouter, RoutingLog, RoutingRule, is_timeout, validate_output
+
+class FakeLLM(BaseLLM):
+    """Modèle simulé: répond un texte fixe, ou dépasse son délai"""
+    reply: str = ''
+    fail: bool = False
+
+    def call(self, messages, tools=None, callbacks=None, available_functions=None,
+             from_task=None, from_agent=None, response_model=None):
+        if self.fail:
+            raise TimeoutError('trop long')
+        return self.reply
+
+REPLIES = {
+    'lent': None,
+    'rapide': 'Thought: ok\nFinal Answer: trop court',
+    'fort': 'Thought: ok\nFinal Answer: ```python\ndef f():\n    return 1\n```'
+}
+
+def fake_llm(model, **options):
+    return FakeLLM(model=model, reply=REPLIES[model] or '', fail=REPLIES[model] is None)
+
+class TestRouting(unittest.TestCase):
+    """Tests pour les règles, la validation, le repli et l'escalade"""
+
+    def test_rule_matching(self):
+        """Test de la première règle correspondante et du modèle par défaut"""
+        router = ModelRouter([{'agent': 'Dev', 'task': 2, 'model': 'a'}, {'agent': 'Dev', 'model': 'b'}],
+                             default_model='c', llm_factory=fake_llm)
+        self.assertEqual(router.rule_for('Dev', 2).model, 'a')
+        self.assertEqual(router.rule_for('Dev', 3).model, 'b')
+        self.assertEqual(router.rule_for('Testeur', 3).model, 'c')
+
+    def test_prepared_llm_reused(self):
+        """Test de la réutilisation d'un modèle préparé à l'avance pour le même agent et la même tâche"""
+        router = ModelRouter([{'agent': 'Dev', 'model': 'fort', 'fallbacks': ['rapide']}], llm_factory=fake_llm)
+        prepared = router.prepare('Dev', 2)
+        self.assertEqual([llm.model for llm in prepared.chain], ['fort', 'rapide'])
+        agent = Agent(role='Dev', goal='g', backstory='b', llm=fake_llm('rapide'))
+        log = RoutingLog()
+        router.route(agent, 2, log, prepared)
+        self.assertIs(agent.llm, prepared)
+        self.assertIs(prepared.log, log)
+        router.route(agent, 3, log, prepared)
+        self.assertIsNot(agent.llm, prepared)
+
+    def test_validate_output(self):
+        """Test des critères de validation"""
+        self.assertEqual(validate_output('  ', {}), "La sortie est vide")
+        self.assertIn('trop courte', validate_output('abc', {'min_chars': 10}))
+        self.assertIn('code', validate_output('Aucun code ici', {'code_block': True}))
+        self.assertIsNone(validate_output('def f():\n    pass', {'code_block': True}))
+        self.assertIn('tests', validate_output('Rapport', {'must_include': ['Rapport', 'tests']}))
+
+    def test_is_timeout_follows_cause(self):
+        """Test de la détection d'un délai dépassé enveloppé"""
+        class APITimeoutError(Exception):
+            pass
+        try:
+            try:
+                raise APITimeoutError('délai')
+            except APITimeoutError as e:
+                raise RuntimeError('appel échoué') from e
+        except RuntimeError as wrapped:
+            self.assertTrue(is_timeout(wrapped))
+        self.assertFalse(is_timeout(ValueError('autre')))
+
+    def test_fallback_then_escalation_in_crew(self):
+        """Test du repli sur délai puis de l'escalade sur validation échouée, dans une vraie équipe"""
+        router = ModelRouter([{'agent': 'Dev', 'model': 'lent', 'fallbacks': ['rapide'], 'escalation': ['fort'],
+                               'timeout_s': 1, 'validation': {'code_block': True}}], llm_factory=fake_llm)
+        log = RoutingLog()
+        agent = Agent(role='Dev', goal='Coder', backstory='Senior', verbose=False)
+        task = Task(description='Écrire le code', expected_output='Code', agent=agent, **router.route(agent, 0, log))
+        result = Crew(agents=[agent], tasks=[task]).kickoff()
+
+        self.assertIn('def f()', str(result))
+        summary = log.to_dict()
+        self.assertEqual(summary['counts'], {'route': 1, 'fallback': 1, 'escalation': 1})
+        self.assertEqual(summary['models']['lent']['outcomes'], {'timeout': 1})
+        self.assertEqual(summary['models']['fort']['outcomes'], {'ok': 1})
+        self.assertEqual(agent.llm.model, 'fort')
+
+    def test_agent_with_several_tasks_uses_each_task_model(self):
+        """Test qu'un agent chargé de plusieurs tâches utilise le modèle routé de chacune, pas celui de la dernière"""
+        router = ModelRouter([{'agent': 'Dev', 'task': 0, 'model': 'rapide'},
+                              {'agent': 'Dev', 'task': 1, 'model': 'fort'}], llm_factory=fake_llm)
+        log = RoutingLog()
+        agent = Agent(role='Dev', goal='Coder', backstory='Senior', verbose=False)
+        tasks = []
+        for index, description in enumerate(('Planifier', 'Écrire le code')):
+            options = router.route(agent, index, log)
+            tasks.append(Task(description=description, expected_output='Texte', agent=agent, **options))
+        for index, task in enumerate(tasks):
+            router.bind_task(agent, task, index)
+        result = Crew(agents=[agent], tasks=tasks).kickoff()
+
+        self.assertEqual(result.tasks_output[0].raw, 'trop court')
+        self.assertIn('def f()', result.tasks_output[1].raw)
+        models = log.to_dict()['models']
+        self.assertEqual((models['rapide']['outcomes'], models['fort']['outcomes']), ({'ok': 1}, {'ok': 1}))
+
+    def test_invalid_output_accepted_without_escalation(self):
+        """Test qu'une sortie invalide est acceptée et consignée quand l'escalade est épuisée"""
+        router = ModelRouter([], llm_factory=fake_llm)
+        log = RoutingLog()
+        agent = Agent(role='Dev', goal='Coder', backstory='Senior', verbose=False)
+        check = router.guardrail(agent, 0, RoutingRule(model='rapide', validation={'min_chars': 50}), log)
+        self.assertEqual(check('court'), (True, 'court'))
+        self.assertEqual(log.to_dict()['counts'], {'accepted_invalid': 1})
+
+    def test_escalation_suspended_over_budget(self):
+        """Test qu'un budget dépassé suspend l'escalade, qui annulerait le passage au modèle de repli"""
+        router = ModelRouter([], llm_factory=fake_llm)
+        log = RoutingLog()
+        usage = SimpleNamespace(state='ok')
+        agent = Agent(role='Dev', goal='Coder', backstory='Senior', llm=fake_llm('rapide'), verbose=False)
+        rule = RoutingRule(model='rapide', escalation=['fort', 'fort'], validation={'min_chars': 50})
+        check = router.guardrail(agent, 0, rule, log, usage)
+        self.assertEqual(check('court')[0], False)
+        self.assertEqual(agent.llm.model, 'fort')
+
+        usage.state = 'soft_exceeded'
+        agent.llm = fake_llm('rapide')
+        self.assertEqual(check('court'), (True, 'court'))
+        self.assertEqual(agent.llm.model, 'rapide')
+        self.assertEqual(log.to_dict()['counts'], {'escalation': 1, 'accepted_invalid': 1})
+
+    def test_from_env(self):
+        """Test de la configuration par l'environnement: désactivé sauf demande explicite ou règles fournies"""
+        environ = {name: value for name, value in os.environ.items() if not name.startswith('CREW_')}
+        with patch.dict(os.environ, environ, clear=True):
+            self.assertIsNone(ModelRouter.from_env())
+        with patch.dict(os.environ, {**environ, 'CREW_MODEL_ROUTING': '1'}, clear=True):
+            self.assertEqual(ModelRouter.from_env().rule_for('Développeur', 2).model, 'gpt-4o')
+        with patch.dict(os.environ, {'CREW_MODEL_ROUTING': '0', 'CREW_ROUTING_RULES': '[]'}):
+            self.assertIsNone(ModelRouter.from_env())
+        rules = [{'agent': 'Dev', 'model': 'gpt-4o'}]
+        with patch.dict(os.environ, {'CREW_ROUTING_RULES': json.dumps(rules), 'CREW_DEFAULT_MODEL': 'gpt-4.1-mini'}):
+            router = ModelRouter.from_env()
+        self.assertEqual([rule.model for rule in router.rules], ['gpt-4o'])
+        self.assertEqual(router.default_model, 'gpt-4.1-mini')
+
+if __name__ == '__main__':
+    unittest.main()
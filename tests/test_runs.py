@@ -0,0 +1,88 @@
+"""
+Tests unitaires pour le cycle de vie des exécutions.
+"""
+
+import threading
+import unittest
+from runs import (
+    CrewRun, RunRegistry, RunCancelled, TooManyActiveRuns, TooManyZombieRuns, STATUS_CANCELLED, STATUS_COMPLETED
+)
+
+class TestRunRegistry(unittest.TestCase):
+    """Tests pour le registre des exécutions"""
+
+    def setUp(self):
+        """Configuration initiale pour les tests"""
+        self.registry = RunRegistry(max_zombies=1, max_finished=2)
+        self.release = threading.Event()
+
+    def tearDown(self):
+        self.release.set()
+
+    def _start_thread(self, run: CrewRun) -> None:
+        run.thread = threading.Thread(target=self.release.wait, daemon=True)
+        run.thread.start()
+
+    def test_finish_releases_heavy_references(self):
+        """Test de la libération de l'équipe et des agents en fin d'exécution"""
+        run = self.registry.register(CrewRun(run_id='r1', session=None))
+        run.crew, run.agents, run.checkpoint = object(), [object()], object()
+        run.account_event(10)
+        run.account_output(5)
+        self.registry.finish(run, STATUS_COMPLETED)
+        self.assertIsNone(run.crew)
+        self.assertIsNone(run.agents)
+        self.assertIsNone(run.checkpoint)
+        memory = run.to_dict()['memory']
+        self.assertEqual((memory['event_bytes'], memory['output_bytes']), (10, 5))
+
+    def test_cancel_and_zombie_cap(self):
+        """Test de l'annulation coopérative et du plafond d'exécutions zombies"""
+        run = self.registry.register(CrewRun(run_id='r1', session=None))
+        self._start_thread(run)
+        run.check_cancelled()
+        self.registry.cancel(run)
+        self.assertEqual(run.status, STATUS_CANCELLED)
+        with self.assertRaises(RunCancelled):
+            run.check_cancelled()
+        self.assertEqual([zombie.run_id for zombie in self.registry.zombies()], ['r1'])
+        with self.assertRaises(TooManyZombieRuns):
+            self.registry.register(CrewRun(run_id='r2', session=None))
+
+        self.release.set()
+        run.thread.join(timeout=5)
+        self.registry.register(CrewRun(run_id='r2', session=None))
+
+    def test_active_runs_cap(self):
+        """Test du plafond d'exécutions simultanées, toutes sessions confondues"""
+        registry = RunRegistry(max_active=2)
+        first = registry.register(CrewRun(run_id='r1', session=None))
+        second = registry.register(CrewRun(run_id='r2', session=None))
+        self._start_thread(second)
+        with self.assertRaises(TooManyActiveRuns):
+            registry.register(CrewRun(run_id='r3', session=None))
+        self.assertEqual(registry.summary()['active'], 2)
+
+        registry.finish(first, STATUS_COMPLETED)
+        registry.register(CrewRun(run_id='r3', session=None))
+        # Une exécution annulée ne compte plus parmi les exécutions actives
+        registry.cancel(second)
+        registry.register(CrewRun(run_id='r4', session=None))
+
+    def test_finish_keeps_cancelled_status(self):
+        """Test qu'une exécution annulée dont le thread termine normalement reste annulée"""
+        run = self.registry.register(CrewRun(run_id='r1', session=None))
+        self.registry.cancel(run, 'budget dépassé')
+        self.registry.finish(run, STATUS_COMPLETED)
+        self.assertEqual((run.status, run.error), (STATUS_CANCELLED, 'budget dépassé'))
+
+    def test_finished_history_is_bounded(self):
+        """Test de l'oubli des exécutions terminées les plus anciennes"""
+        for i in range(4):
+            run = self.registry.register(CrewRun(run_id=f'r{i}', session=None))
+            self.registry.finish(run, STATUS_COMPLETED)
+        self.assertEqual([run.run_id for run in self.registry.runs()], ['r2', 'r3'])
+        self.assertIsNone(self.registry.get('r0'))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+"""
+Tests unitaires pour la gestion des sessions.
+"""
+
+import unittest
+from unittest.mock import Mock, patch
+from sessions import SessionManager, TooManySessions, is_valid_session_id
+
+class TestSessionManager(unittest.TestCase):
+    """Tests pour le registre des sessions"""
+
+    def setUp(self):
+        """Configuration initiale pour les tests"""
+        self.manager = SessionManager(lambda: {'goal': 'Test'}, max_sessions=2, ttl=60)
+
+    def test_get_or_create_returns_same_session(self):
+        """Test que la même session est renvoyée pour un même identifiant"""
+        first = self.manager.get_or_create('a')
+        self.assertIs(self.manager.get_or_create('a'), first)
+        self.assertIsNot(self.manager.get_or_create('b').config, first.config)
+
+    def test_lru_eviction(self):
+        """Test de l'éviction de la session la moins récemment utilisée"""
+        a = self.manager.get_or_create('a')
+        self.manager.get_or_create('b')
+        self.manager.get('a')
+        self.manager.get_or_create('c')
+        self.assertIn('a', self.manager)
+        self.assertNotIn('b', self.manager)
+        self.assertEqual(len(self.manager), 2)
+        self.assertFalse(a.stop_event.is_set())
+
+    def test_ttl_eviction_stops_session(self):
+        """Test de l'éviction des sessions inactives"""
+        with patch('sessions.time.monotonic', return_value=1000.0):
+            a = self.manager.get_or_create('a')
+            a.broadcaster.publish('status', {})
+        with patch('sessions.time.monotonic', return_value=1100.0):
+            self.assertIsNone(self.manager.get('a'))
+            self.manager.get_or_create('b')
+        self.assertNotIn('a', self.manager)
+        self.assertTrue(a.stop_event.is_set())
+        self.assertEqual(a.broadcaster.events_after(0), [])
+
+    def test_busy_sessions_not_evicted(self):
+        """Test que les sessions dont l'exécution tourne ou dont le flux est suivi ne sont pas évincées"""
+        with patch('sessions.time.monotonic', return_value=1000.0):
+            a = self.manager.get_or_create('a')
+            a.broadcaster.attach()
+            b = self.manager.get_or_create('b')
+            b.current_run = Mock(is_alive=True)
+        with patch('sessions.time.monotonic', return_value=1100.0):
+            self.manager.get_or_create('c')
+            self.manager.get_or_create('d')
+            self.assertIs(self.manager.get('a'), a)
+        self.assertEqual([session.session_id for session in self.manager.sessions()], ['b', 'd', 'a'])
+        self.assertFalse(b.stop_event.is_set())
+
+        a.broadcaster.detach()
+        self.manager.get_or_create('e')
+        self.assertEqual([session.session_id for session in self.manager.sessions()], ['b', 'e'])
+        self.assertTrue(a.stop_event.is_set())
+
+    def test_new_sessions_refused_at_hard_limit(self):
+        """Test du refus d'une nouvelle session lorsque toutes les sessions occupées atteignent la limite stricte"""
+        manager = SessionManager(lambda: {'goal': 'Test'}, max_sessions=1, ttl=60, hard_limit=2)
+        busy = []
+        for session_id in ('a', 'b'):
+            busy.append(manager.get_or_create(session_id))
+            busy[-1].broadcaster.attach()
+        with self.assertRaises(TooManySessions):
+            manager.get_or_create('c')
+        self.assertNotIn('c', manager)
+        self.assertIs(manager.get_or_create('a'), busy[0])
+
+        busy[0].broadcaster.detach()
+        manager.get_or_create('c')
+        self.assertEqual([session.session_id for session in manager.sessions()], ['b', 'c'])
+
+    def test_session_id_validation(self):
+        """Test de la validation des identifiants de session"""
+        self.assertTrue(is_valid_session_id('abc-123_DEF'))
+        self.assertFalse(is_valid_session_id(''))
+        self.assertFalse(is_valid_session_id('../etc'))
+        self.assertFalse(is_valid_session_id('x' * 65))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+"""
+Tests unitaires pour le traçage des exécutions.
+"""
+
+import os
+import tempfile
+import time
+import unittest
+from types import SimpleNamespace
+from tracing import Tracer, RunTrace, current_trace, trace_span
+
+class TestTracing(unittest.TestCase):
+    """Tests pour les spans et l'export Chrome trace"""
+
+    def setUp(self):
+        """Configuration initiale pour les tests"""
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.tracer = Tracer(self.tmp_dir.name, sample_rate=1.0)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_run_spans_are_exported(self):
+        """Test de l'enregistrement des spans et de leur export"""
+        with self.tracer.run('run1', 'session') as trace:
+            self.assertIs(current_trace(), trace)
+            with trace_span('publish', 'publish', type='status'):
+                pass
+            self.assertEqual(self.tracer.get('run1')['otherData']['run_id'], 'run1')
+        self.assertIsNone(current_trace())
+
+        exported = self.tracer.get('run1')
+        names = [event['name'] for event in exported['traceEvents']]
+        self.assertEqual(names, ['run', 'publish'])
+        publish = exported['traceEvents'][1]
+        self.assertEqual(publish['ph'], 'X')
+        self.assertEqual(publish['args'], {'type': 'status'})
+        self.assertEqual(exported['otherData']['session_id'], 'session')
+
+    def test_begin_end_pairs(self):
+        """Test des spans ouverts et fermés par des événements distincts"""
+        trace = RunTrace('run1', 'session')
+        trace.begin('llm_call:1', 'llm_call', 'llm', 1_000, agent='Testeur')
+        trace.end('llm_call:1', 4_000, model='gpt')
+        trace.end('inconnu', 5_000)
+        events = trace.to_chrome_trace()['traceEvents']
+        self.assertEqual(len(events), 1)
+        self.assertEqual(events[0]['dur'], 3_000)
+        self.assertEqual(events[0]['args'], {'agent': 'Testeur', 'model': 'gpt'})
+
+    def test_unsampled_run_records_nothing(self):
+        """Test qu'une exécution non échantillonnée n'est ni enregistrée ni exportée"""
+        tracer = Tracer(self.tmp_dir.name, sample_rate=0.0)
+        with tracer.run('run2', 'session') as trace:
+            with trace_span('publish', 'publish'):
+                pass
+            trace.begin('k', 'n', 'c', 0)
+            trace.end('k', 10)
+        self.assertIsNone(tracer.get('run2'))
+
+    def test_entity_binding(self):
+        """Test de l'association des agents et tâches à la trace de leur exécution"""
+        agent = SimpleNamespace(id='agent-1')
+        task = SimpleNamespace(id='task-1')
+        with self.tracer.run('run3', 'session') as trace:
+            self.tracer.bind(trace, [agent, task])
+            self.assertIs(self.tracer.trace_for(SimpleNamespace(agent_id='agent-1')), trace)
+            self.assertIs(self.tracer.trace_for(SimpleNamespace(agent_id=None, task_id='task-1')), trace)
+        self.assertIsNone(self.tracer.trace_for(SimpleNamespace(agent_id='agent-1')))
+        self.assertIsNone(self.tracer.trace_for(SimpleNamespace()))
+
+    def test_exported_traces_are_pruned(self):
+        """Test de la rétention des traces exportées par âge et par nombre"""
+        tracer = Tracer(self.tmp_dir.name, sample_rate=1.0, retention_days=1, max_traces=2)
+        now = time.time()
+        for age, run_id in ((2 * 86400, 'ancienne'), (60, 'run1')):
+            with tracer.run(run_id, 'session'):
+                pass
+            os.utime(os.path.join(self.tmp_dir.name, f"{run_id}.json"), (now - age, now - age))
+        # L'export de run1 a supprimé la trace expirée
+        self.assertIsNone(tracer.get('ancienne'))
+        self.assertEqual(tracer.prune(), 0)
+
+        for run_id in ('run2', 'run3'):
+            with tracer.run(run_id, 'session'):
+                pass
+        self.assertEqual(sorted(os.listdir(self.tmp_dir.name)), ['run2.json', 'run3.json'])
+
+if __name__ == '__main__':
+    unittest.main()
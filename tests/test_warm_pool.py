@@ -0,0 +1,93 @@
+"""
+Tests unitaires pour la réserve de threads préchauffés.
+"""
+
+import threading
+import time
+import unittest
+from warm_pool import WarmPool
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("Condition non atteinte")
+        time.sleep(0.005)
+
+class TestWarmPool(unittest.TestCase):
+    """Tests pour la remise des exécutions aux threads préchauffés"""
+
+    def setUp(self):
+        """Configuration initiale pour les tests"""
+        self.prepared = 0
+        self.lock = threading.Lock()
+
+    def prepare(self):
+        with self.lock:
+            self.prepared += 1
+            return f"kit-{self.prepared}"
+
+    def test_warm_handoff_uses_prepared_value(self):
+        """Test de la remise à un thread préchauffé, qui reçoit sa préparation"""
+        pool = WarmPool(size=1, prepare=self.prepare, replenish_delay=0.01).start()
+        self.addCleanup(pool.stop)
+        wait_for(lambda: pool.stats()['standby'] == 1)
+
+        received = []
+        handle = pool.submit(received.append)
+        handle.join(timeout=2)
+        self.assertFalse(handle.is_alive())
+        self.assertTrue(handle.warm)
+        self.assertEqual(received, ['kit-1'])
+        self.assertLess(handle.handoff_latency, 0.5)
+
+        # La réserve est reconstituée par un nouveau thread, jamais par celui qui a servi
+        wait_for(lambda: pool.stats()['standby'] == 1)
+        stats = pool.stats()
+        self.assertEqual((stats['warm_handoffs'], stats['cold_handoffs']), (1, 0))
+        self.assertEqual(stats['handoff_latency']['count'], 1)
+        self.assertEqual(self.prepared, 2)
+
+    def test_cold_fallback(self):
+        """Test du démarrage sur un thread froid lorsque la réserve est vide ou désactivée"""
+        pool = WarmPool(size=0, prepare=self.prepare)
+        received = []
+        handle = pool.submit(received.append)
+        handle.join(timeout=2)
+        self.assertFalse(handle.warm)
+        self.assertEqual(received, [None])
+        self.assertEqual(self.prepared, 0)
+        self.assertEqual(pool.stats()['cold_handoffs'], 1)
+
+    def test_prepare_error_leaves_usable_worker(self):
+        """Test d'un échec de préchauffage: le thread reste utilisable sans préparation"""
+        def failing():
+            raise RuntimeError("fournisseur indisponible")
+        pool = WarmPool(size=1, prepare=failing, replenish_delay=60).start()
+        self.addCleanup(pool.stop)
+        wait_for(lambda: pool.stats()['standby'] == 1)
+        self.assertEqual(pool.stats()['prepare_errors'], 1)
+
+        received = []
+        pool.submit(received.append).join(timeout=2)
+        self.assertEqual(received, [None])
+
+    def test_job_error_does_not_escape(self):
+        """Test d'une exécution en erreur: la tâche se termine quand même"""
+        def job(_prepared):
+            raise ValueError("échec")
+        handle = WarmPool(size=0).submit(job)
+        handle.join(timeout=2)
+        self.assertFalse(handle.is_alive())
+
+    def test_stop_releases_standby_workers(self):
+        """Test de l'arrêt: les threads en attente se terminent et la réserve n'est plus reconstituée"""
+        pool = WarmPool(size=2, prepare=self.prepare, name='test-stop').start()
+        wait_for(lambda: pool.stats()['standby'] == 2)
+        pool.stop()
+        wait_for(lambda: not any(t.name.startswith('test-stop') for t in threading.enumerate()))
+        pool.start()
+        self.assertEqual(pool.stats()['warming'] + pool.stats()['standby'], 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,177 @@
+"""
+Tests unitaires pour le transport WebSocket multiplexé.
+"""
+
+import json
+import queue
+import threading
+import time
+import unittest
+import zlib
+from unittest.mock import patch
+from sessions import SessionManager
+from ws_transport import ChannelMultiplexer, serve
+
+try:
+    import flask_sock
+    import simple_websocket
+except ImportError:
+    flask_sock = None
+
+class TestChannelMultiplexer(unittest.TestCase):
+    """Tests pour le multiplexage des canaux d'une connexion"""
+
+    def setUp(self):
+        """Configuration initiale pour les tests"""
+        self.manager = SessionManager(lambda: {'goal': 'Test'})
+        self.restarted = []
+        controls = {'restart': lambda session, message: self.restarted.append(session) or {'run_id': 'r1'}}
+        self.mux = ChannelMultiplexer(
+            self.manager.get_or_create('defaut'), self.manager.get_or_create, controls
+        )
+
+    def send(self, **message):
+        return json.loads(self.mux.handle(json.dumps(message)))
+
+    def events(self):
+        return [event for frame in self.mux.collect() for event in json.loads(frame)['events']]
+
+    def test_channels_multiplexed_in_one_frame(self):
+        """Test que les événements de plusieurs sessions partagent une trame"""
+        a = self.manager.get_or_create('a')
+        b = self.manager.get_or_create('b')
+        a.broadcaster.publish('status', {'message': 'ancien'})
+        self.assertEqual(self.send(op='subscribe', channel='A', session='a', ref=1),
+                         {'op': 'ack', 'ref': 1, 'channel': 'A', 'subscribed': True, 'session': 'a'})
+        self.send(op='subscribe', channel='B', session='b')
+        self.assertEqual((a.broadcaster.subscribers, b.broadcaster.subscribers), (1, 1))
+        b.broadcaster.publish('task_update', {'message': 'pour B'})
+        frames = self.mux.collect()
+        self.assertEqual(len(frames), 1)
+        events = json.loads(frames[0])['events']
+        self.assertEqual([(e['channel'], e['event'], e['data']['message']) for e in events],
+                         [('A', 'status', 'ancien'), ('B', 'task_update', 'pour B')])
+        self.assertEqual(self.mux.collect(), [])
+
+        self.send(op='unsubscribe', channel='A')
+        a.broadcaster.publish('status', {'message': 'ignoré'})
+        self.assertEqual(self.events(), [])
+        self.assertEqual(a.broadcaster.subscribers, 0)
+        self.mux.close()
+        self.assertEqual(b.broadcaster.subscribers, 0)
+
+    def test_run_filter_and_resume(self):
+        """Test du filtrage par exécution et de la reprise après un identifiant"""
+        session = self.manager.get_or_create('a')
+        for run_id in ('r1', 'r2', 'r1'):
+            session.broadcaster.publish('status', {'run_id': run_id})
+        self.send(op='subscribe', channel='A', session='a', run_id='r1', last_id=1)
+        self.assertEqual([e['id'] for e in self.events()], [3])
+
+    def test_unknown_last_id_replays_buffer(self):
+        """Test qu'un last_id postérieur au dernier identifiant de la session (redémarrage) rejoue le tampon"""
+        session = self.manager.get_or_create('a')
+        session.broadcaster.publish('status', {'message': 'nouveau'})
+        self.send(op='subscribe', channel='A', session='a', last_id=500)
+        self.assertEqual([e['data']['message'] for e in self.events()], ['nouveau'])
+        session.broadcaster.publish('status', {'message': 'suivant'})
+        self.assertEqual([e['data']['message'] for e in self.events()], ['suivant'])
+
+    def test_controls_target_channel_session(self):
+        """Test des opérations de contrôle et des erreurs"""
+        self.send(op='subscribe', channel='A', session='a')
+        self.assertEqual(self.send(op='restart', channel='A', ref=7), {'op': 'ack', 'ref': 7, 'run_id': 'r1'})
+        self.assertIs(self.restarted[0], self.manager.get('a'))
+        self.assertEqual(self.send(op='inconnue', ref=8)['op'], 'error')
+        self.assertEqual(json.loads(self.mux.handle('pas du json'))['op'], 'error')
+
+    def test_batches_and_compression(self):
+        """Test du découpage en trames et de la compression des grandes trames"""
+        self.mux.batch_max_bytes = 300
+        self.mux.compress = True
+        session = self.manager.get_or_create('a')
+        self.send(op='subscribe', channel='A', session='a')
+        for i in range(6):
+            session.broadcaster.publish('task_update', {'message': 'x' * 100, 'i': i})
+        frames = self.mux.collect()
+        self.assertGreater(len(frames), 1)
+        self.assertTrue(all(isinstance(frame, str) for frame in frames))
+        self.mux.batch_max_bytes = 64 * 1024
+        for i in range(6):
+            session.broadcaster.publish('task_update', {'message': 'x' * 100, 'i': i})
+        frames = self.mux.collect()
+        self.assertIsInstance(frames[0], bytes)
+        self.assertEqual(len(json.loads(zlib.decompress(frames[0]))['events']), 6)
+
+class FakeSocket:
+    """Socket simulé: les messages du client sont lus dans une file, None ferme la connexion"""
+    def __init__(self):
+        self.incoming = queue.Queue()
+        self.sent = queue.Queue()
+
+    def receive(self, timeout=None):
+        message = self.incoming.get()
+        if message is None:
+            raise ConnectionError("connexion fermée")
+        return message
+
+    def send(self, frame):
+        self.sent.put(frame)
+
+class TestServe(unittest.TestCase):
+    """Tests pour la boucle d'une connexion"""
+
+    def test_woken_by_publish_without_polling(self):
+        """Test du réveil par publication, sans collecte périodique des canaux"""
+        manager = SessionManager(lambda: {'goal': 'Test'})
+        session = manager.get_or_create('a')
+        mux = ChannelMultiplexer(session, manager.get_or_create, {})
+        socket = FakeSocket()
+        with patch.object(mux, 'collect', wraps=mux.collect) as collect:
+            thread = threading.Thread(target=serve, args=(socket, mux), kwargs={'heartbeat': 30}, daemon=True)
+            thread.start()
+            socket.incoming.put(json.dumps({'op': 'subscribe', 'channel': 'A'}))
+            self.assertEqual(json.loads(socket.sent.get(timeout=2))['op'], 'ack')
+            time.sleep(0.3)
+            idle_collects = collect.call_count
+            self.assertLessEqual(idle_collects, 2)
+
+            session.broadcaster.publish('status', {'message': 'ok'})
+            frame = json.loads(socket.sent.get(timeout=2))
+            self.assertEqual(frame['events'][0]['data']['message'], 'ok')
+            self.assertEqual(collect.call_count, idle_collects + 1)
+
+        socket.incoming.put(None)
+        thread.join(timeout=2)
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(session.broadcaster.subscribers, 0)
+
+@unittest.skipIf(flask_sock is None, "flask-sock non installé")
+class TestWebSocketEndpoint(unittest.TestCase):
+    """Test de bout en bout de la route /ws"""
+
+    def test_subscribe_and_restart_over_socket(self):
+        """Test d'un abonnement et d'un redémarrage sur la même connexion"""
+        import crew_server
+        from werkzeug.serving import make_server
+        server = make_server('127.0.0.1', 0, crew_server.app, threaded=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            with patch('crew_server.start_crew', return_value=type('Run', (), {'run_id': 'ws-run'})()):
+                ws = simple_websocket.Client(f'ws://127.0.0.1:{server.server_port}/ws?session=ws-a')
+                try:
+                    ws.send(json.dumps({'op': 'subscribe', 'channel': 'A', 'ref': 1}))
+                    self.assertEqual(json.loads(ws.receive(timeout=5))['session'], 'ws-a')
+                    crew_server.publish_event(crew_server.session_manager.get('ws-a'), 'status', message='ok')
+                    frame = json.loads(ws.receive(timeout=5))
+                    self.assertEqual(frame['events'][0]['data']['message'], 'ok')
+                    ws.send(json.dumps({'op': 'update_goal', 'channel': 'A', 'goal': 'Nouveau', 'ref': 2}))
+                    self.assertEqual(json.loads(ws.receive(timeout=5))['run_id'], 'ws-run')
+                    self.assertEqual(crew_server.session_manager.get('ws-a').config.goal, 'Nouveau')
+                finally:
+                    ws.close()
+        finally:
+            server.shutdown()
+
+if __name__ == '__main__':
+    unittest.main()
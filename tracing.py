@@ -0,0 +1,266 @@
+"""
+Traçage des exécutions d'équipe par spans, exporté au format Chrome trace (chrome://tracing, Perfetto).
+Les spans couvrent l'exécution, les tâches, les étapes d'agents, les appels LLM, les délégations et la publication des événements.
+"""
+
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+TRACE_DIR = 'traces'
+# Proportion des exécutions tracées; le coût d'un span est un tuple ajouté à une liste
+TRACE_SAMPLE_RATE = 0.1
+# Rétention des traces exportées: durée et nombre maximal de fichiers, appliqués à chaque export
+TRACE_RETENTION_DAYS = 7
+MAX_TRACES = 500
+# Outils de délégation fournis par crewai aux agents avec allow_delegation=True
+DELEGATION_TOOL_PREFIXES = ('Delegate work', 'Ask question')
+
+_RUN_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+_local = threading.local()
+
+def _now_us() -> int:
+    return time.time_ns() // 1000
+
+def _to_us(timestamp) -> int:
+    """Convertit l'horodatage d'un événement crewai en microsecondes"""
+    if timestamp is None:
+        return _now_us()
+    return int(timestamp.timestamp() * 1_000_000)
+
+class RunTrace:
+    """Spans terminés d'une exécution"""
+    def __init__(self, run_id: str, session_id: str, sampled: bool = True):
+        self.run_id = run_id
+        self.session_id = session_id
+        self.sampled = sampled
+        # Les spans sont rattachés au thread de l'exécution, y compris ceux issus des événements crewai
+        self.tid = threading.get_ident()
+        # (nom, catégorie, début en µs, durée en µs, thread, arguments)
+        self._spans: List[tuple] = []
+        self._open: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+
+    def span(self, name: str, category: str, **args):
+        """Gestionnaire de contexte mesurant un span sur le thread courant"""
+        if not self.sampled:
+            return nullcontext()
+        return self._span(name, category, args)
+
+    @contextmanager
+    def _span(self, name: str, category: str, args: dict):
+        start = _now_us()
+        try:
+            yield
+        finally:
+            self.add(name, category, start, _now_us() - start, args)
+
+    def add(self, name: str, category: str, start_us: int, duration_us: int,
+            args: Optional[dict] = None) -> None:
+        if not self.sampled:
+            return
+        with self._lock:
+            self._spans.append((name, category, start_us, duration_us, self.tid, args or {}))
+
+    def begin(self, key: str, name: str, category: str, start_us: int, **args) -> None:
+        """Ouvre un span dont le début et la fin sont signalés séparément (événements crewai)"""
+        if self.sampled:
+            with self._lock:
+                self._open[key] = (name, category, start_us, args)
+
+    def end(self, key: str, end_us: int, **args) -> None:
+        if not self.sampled:
+            return
+        with self._lock:
+            opened = self._open.pop(key, None)
+        if opened is not None:
+            name, category, start_us, begin_args = opened
+            self.add(name, category, start_us, max(0, end_us - start_us), {**begin_args, **args})
+
+    def to_chrome_trace(self) -> dict:
+        """Exporte les spans au format Chrome trace (événements complets 'X')"""
+        with self._lock:
+            spans = list(self._spans)
+        events = [
+            {'name': name, 'cat': category, 'ph': 'X', 'ts': start, 'dur': duration,
+             'pid': 1, 'tid': tid, 'args': args}
+            for name, category, start, duration, tid, args in spans
+        ]
+        events.sort(key=lambda event: event['ts'])
+        return {
+            'traceEvents': events,
+            'displayTimeUnit': 'ms',
+            'otherData': {'run_id': self.run_id, 'session_id': self.session_id}
+        }
+
+def current_trace() -> Optional[RunTrace]:
+    """Renvoie la trace de l'exécution en cours sur ce thread"""
+    return getattr(_local, 'trace', None)
+
+def trace_span(name: str, category: str, **args):
+    """Span rattaché à la trace du thread courant, sans effet hors exécution tracée"""
+    trace = current_trace()
+    if trace is None:
+        return nullcontext()
+    return trace.span(name, category, **args)
+
+class Tracer:
+    """Crée les traces des exécutions, les associe aux agents et les exporte sur disque"""
+    def __init__(self, directory: str = TRACE_DIR, sample_rate: float = TRACE_SAMPLE_RATE,
+                 retention_days: float = TRACE_RETENTION_DAYS, max_traces: int = MAX_TRACES):
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self.retention_days = retention_days
+        self.max_traces = max_traces
+        self._active: Dict[str, RunTrace] = {}
+        self._by_entity: Dict[str, RunTrace] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def run(self, run_id: str, session_id: str):
+        """Trace une exécution sur le thread courant et l'exporte à la fin"""
+        trace = RunTrace(run_id, session_id, sampled=random.random() < self.sample_rate)
+        with self._lock:
+            self._active[run_id] = trace
+        _local.trace = trace
+        try:
+            with trace.span('run', 'run', run_id=run_id):
+                yield trace
+        finally:
+            _local.trace = None
+            with self._lock:
+                self._active.pop(run_id, None)
+                for entity_id in [k for k, v in self._by_entity.items() if v is trace]:
+                    del self._by_entity[entity_id]
+            if trace.sampled:
+                self.export(trace)
+
+    def bind(self, trace: RunTrace, entities) -> None:
+        """Associe les agents et tâches d'une exécution à sa trace pour les événements crewai"""
+        with self._lock:
+            for entity in entities:
+                self._by_entity[str(entity.id)] = trace
+
+    def trace_for(self, event) -> Optional[RunTrace]:
+        """Retrouve la trace d'un événement crewai par son agent ou, à défaut, par sa tâche"""
+        for entity_id in (getattr(event, 'agent_id', None), getattr(event, 'task_id', None)):
+            if entity_id:
+                trace = self._by_entity.get(str(entity_id))
+                if trace is not None:
+                    return trace
+        return None
+
+    def get(self, run_id: str) -> Optional[dict]:
+        """Renvoie la trace d'une exécution, en cours ou exportée"""
+        trace = self._active.get(run_id)
+        if trace is not None:
+            return trace.to_chrome_trace()
+        if not _RUN_ID_PATTERN.match(run_id or ''):
+            return None
+        try:
+            with open(os.path.join(self.directory, f"{run_id}.json"), encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def export(self, trace: RunTrace) -> None:
+        """Écrit la trace au format Chrome trace dans le répertoire des traces"""
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            path = os.path.join(self.directory, f"{trace.run_id}.json")
+            with open(f"{path}.tmp", 'w', encoding='utf-8') as f:
+                json.dump(trace.to_chrome_trace(), f)
+            os.replace(f"{path}.tmp", path)
+        except OSError as e:
+            logger.error(f"Erreur lors de l'export de la trace {trace.run_id}: {str(e)}")
+        self.prune()
+
+    def prune(self, now: Optional[float] = None) -> int:
+        """Supprime les traces expirées puis les plus anciennes au-delà du nombre maximal"""
+        cutoff = (now or time.time()) - self.retention_days * 86400
+        try:
+            names = [name for name in os.listdir(self.directory) if name.endswith('.json')]
+        except OSError:
+            return 0
+        traces = []
+        for name in names:
+            try:
+                traces.append((os.path.getmtime(os.path.join(self.directory, name)), name))
+            except OSError:
+                continue
+        traces.sort(reverse=True)
+        expired = [name for index, (mtime, name) in enumerate(traces)
+                   if mtime < cutoff or index >= self.max_traces]
+        removed = 0
+        for name in expired:
+            try:
+                os.remove(os.path.join(self.directory, name))
+                removed += 1
+            except OSError:
+                continue
+        if removed:
+            logger.info(f"{removed} trace(s) supprimée(s) par la rétention")
+        return removed
+
+    def install_crewai_listeners(self) -> bool:
+        """Abonne le traceur au bus d'événements de crewai, lorsqu'il existe"""
+        try:
+            from crewai.events import (
+                crewai_event_bus, TaskStartedEvent, TaskCompletedEvent, TaskFailedEvent,
+                AgentExecutionStartedEvent, AgentExecutionCompletedEvent,
+                LLMCallStartedEvent, LLMCallCompletedEvent, LLMCallFailedEvent,
+                ToolUsageStartedEvent, ToolUsageFinishedEvent
+            )
+        except ImportError:
+            logger.info("Bus d'événements crewai indisponible: traçage limité aux spans du serveur")
+            return False
+
+        def begin(kind: str, category: str, key_attr: str):
+            def handler(source, event):
+                trace = self.trace_for(event)
+                if trace is not None:
+                    trace.begin(f"{kind}:{getattr(event, key_attr, None)}", kind, category,
+                                _to_us(event.timestamp), agent=event.agent_role, task=event.task_name)
+            return handler
+
+        def end(kind: str, key_attr: str, **extra):
+            def handler(source, event):
+                trace = self.trace_for(event)
+                if trace is not None:
+                    args = {name: str(getattr(event, attr, '')) for name, attr in extra.items()}
+                    trace.end(f"{kind}:{getattr(event, key_attr, None)}", _to_us(event.timestamp), **args)
+            return handler
+
+        def tool_category(event) -> str:
+            return 'delegation' if str(event.tool_name).startswith(DELEGATION_TOOL_PREFIXES) else 'tool'
+
+        def tool_started(source, event):
+            trace = self.trace_for(event)
+            if trace is not None:
+                trace.begin(f"tool:{event.agent_id}:{event.tool_name}", event.tool_name, tool_category(event),
+                            _to_us(event.timestamp), agent=event.agent_role)
+
+        def tool_finished(source, event):
+            trace = self.trace_for(event)
+            if trace is not None:
+                trace.end(f"tool:{event.agent_id}:{event.tool_name}", _to_us(event.timestamp))
+
+        crewai_event_bus.on(TaskStartedEvent)(begin('task', 'task', 'task_id'))
+        crewai_event_bus.on(TaskCompletedEvent)(end('task', 'task_id'))
+        crewai_event_bus.on(TaskFailedEvent)(end('task', 'task_id', error='error'))
+        crewai_event_bus.on(AgentExecutionStartedEvent)(begin('agent_step', 'agent', 'task_id'))
+        crewai_event_bus.on(AgentExecutionCompletedEvent)(end('agent_step', 'task_id'))
+        crewai_event_bus.on(LLMCallStartedEvent)(begin('llm_call', 'llm', 'call_id'))
+        crewai_event_bus.on(LLMCallCompletedEvent)(end('llm_call', 'call_id', model='model'))
+        crewai_event_bus.on(LLMCallFailedEvent)(end('llm_call', 'call_id', error='error'))
+        crewai_event_bus.on(ToolUsageStartedEvent)(tool_started)
+        crewai_event_bus.on(ToolUsageFinishedEvent)(tool_finished)
+        return True
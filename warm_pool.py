@@ -0,0 +1,166 @@
+"""
+Réserve de processus légers (threads) préchauffés pour les exécutions d'équipe.
+Chaque thread de réserve prépare à l'avance ce qui ne dépend pas de la configuration (agents, clients LLM),
+puis attend une exécution: un redémarrage se contente de lui transmettre la configuration.
+Un thread ne sert qu'une exécution, afin qu'aucun état local ne survive d'une exécution à l'autre;
+la réserve est reconstituée dès qu'un thread est pris.
+"""
+
+import logging
+import os
+import queue
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Optional
+
+from latency_stats import summarize
+
+logger = logging.getLogger(__name__)
+
+# Nombre de threads préchauffés en attente (0 désactive la réserve)
+WARM_WORKERS = int(os.getenv('CREW_WARM_WORKERS', '2'))
+# Délai avant de reconstituer la réserve: la préparation ne concurrence pas le démarrage de l'exécution
+REPLENISH_DELAY = 0.2
+# Nombre de mesures de latence conservées pour les statistiques
+MAX_LATENCY_SAMPLES = 500
+
+class WorkerHandle:
+    """Exécution confiée à la réserve; s'utilise comme un thread (is_alive, join)"""
+    def __init__(self, job: Callable[[Any], None], on_start: Optional[Callable[['WorkerHandle'], None]] = None):
+        self.job = job
+        self.on_start = on_start
+        self.requested_at = time.monotonic()
+        self.started_at: Optional[float] = None
+        self.warm = False
+        self._done = threading.Event()
+
+    def run(self, prepared: Any) -> None:
+        self.started_at = time.monotonic()
+        try:
+            if self.on_start is not None:
+                self.on_start(self)
+            self.job(prepared)
+        except Exception as e:
+            logger.error(f"Erreur non gérée dans une exécution de la réserve: {str(e)}")
+        finally:
+            self._done.set()
+
+    @property
+    def handoff_latency(self) -> Optional[float]:
+        """Délai entre la demande et le début effectif de l'exécution"""
+        return None if self.started_at is None else self.started_at - self.requested_at
+
+    def is_alive(self) -> bool:
+        return not self._done.is_set()
+
+    def join(self, timeout: Optional[float] = None) -> None:
+        self._done.wait(timeout)
+
+class _StandbyWorker:
+    """Thread de réserve: prépare, attend une exécution, l'exécute puis se termine"""
+    def __init__(self, pool: 'WarmPool'):
+        self.pool = pool
+        self.slot: 'queue.Queue[Optional[WorkerHandle]]' = queue.Queue(maxsize=1)
+        self.prepared: Any = None
+        self.thread = threading.Thread(target=self._main, name=f"{pool.name}-{id(self):x}", daemon=True)
+
+    def _main(self) -> None:
+        started = time.monotonic()
+        failed = False
+        try:
+            self.prepared = self.pool.prepare() if self.pool.prepare is not None else None
+        except Exception as e:
+            # Un thread non préparé reste utilisable: l'exécution construira elle-même ce qui manque
+            logger.error(f"Échec du préchauffage d'un thread de réserve: {str(e)}")
+            failed = True
+        self.pool._ready(self, time.monotonic() - started, failed)
+        handle = self.slot.get()
+        if handle is not None:
+            handle.run(self.prepared)
+        self.prepared = None
+
+class WarmPool:
+    """Réserve de threads préchauffés; sans thread disponible, l'exécution démarre sur un thread froid"""
+    def __init__(self, size: int = WARM_WORKERS, prepare: Optional[Callable[[], Any]] = None,
+                 name: str = 'crew-worker', replenish_delay: float = REPLENISH_DELAY):
+        self.size = max(0, size)
+        self.prepare = prepare
+        self.name = name
+        self.replenish_delay = replenish_delay
+        self._standby: 'deque[_StandbyWorker]' = deque()
+        self._warming = 0
+        self._closed = False
+        self._warm_handoffs = 0
+        self._cold_handoffs = 0
+        self._prepare_errors = 0
+        self._handoff_latencies: 'deque[float]' = deque(maxlen=MAX_LATENCY_SAMPLES)
+        self._prepare_latencies: 'deque[float]' = deque(maxlen=MAX_LATENCY_SAMPLES)
+        self._lock = threading.Lock()
+
+    def start(self) -> 'WarmPool':
+        self._replenish()
+        return self
+
+    def _replenish(self) -> None:
+        """Lance les threads nécessaires pour que la réserve retrouve sa taille"""
+        with self._lock:
+            missing = 0 if self._closed else self.size - len(self._standby) - self._warming
+            self._warming += max(0, missing)
+        for _ in range(missing):
+            _StandbyWorker(self).thread.start()
+
+    def _ready(self, worker: _StandbyWorker, prepare_latency: float, failed: bool) -> None:
+        with self._lock:
+            self._warming -= 1
+            self._prepare_errors += failed
+            self._prepare_latencies.append(prepare_latency)
+            if not self._closed:
+                self._standby.append(worker)
+                return
+        worker.slot.put(None)
+
+    def submit(self, job: Callable[[Any], None]) -> WorkerHandle:
+        """Confie une exécution à un thread préchauffé (job reçoit sa préparation) ou, à défaut, à un thread froid"""
+        handle = WorkerHandle(job, on_start=self._record_handoff)
+        with self._lock:
+            worker = self._standby.popleft() if self._standby else None
+            if worker is not None:
+                self._warm_handoffs += 1
+            else:
+                self._cold_handoffs += 1
+        if worker is not None:
+            handle.warm = True
+            worker.slot.put(handle)
+        else:
+            threading.Thread(target=handle.run, args=(None,), name=f"{self.name}-cold", daemon=True).start()
+        if self.size:
+            timer = threading.Timer(self.replenish_delay, self._replenish)
+            timer.daemon = True
+            timer.start()
+        return handle
+
+    def _record_handoff(self, handle: WorkerHandle) -> None:
+        with self._lock:
+            self._handoff_latencies.append(handle.handoff_latency)
+
+    def stop(self) -> None:
+        """Libère les threads en attente; les exécutions en cours se poursuivent"""
+        with self._lock:
+            self._closed = True
+            standby, self._standby = list(self._standby), deque()
+        for worker in standby:
+            worker.slot.put(None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'size': self.size,
+                'standby': len(self._standby),
+                'warming': self._warming,
+                'warm_handoffs': self._warm_handoffs,
+                'cold_handoffs': self._cold_handoffs,
+                'prepare_errors': self._prepare_errors,
+                'handoff_latency': summarize(list(self._handoff_latencies)),
+                'prepare_latency': summarize(list(self._prepare_latencies))
+            }
@@ -0,0 +1,227 @@
+"""
+Transport WebSocket: plusieurs canaux d'événements multiplexés sur une seule connexion.
+Un canal suit le flux d'une session, éventuellement restreint à une exécution; les événements
+de tous les canaux sont regroupés en trames, compressées à la demande, et le même socket
+transporte les opérations de contrôle (redémarrage, mise à jour de l'objectif).
+
+Messages du client (JSON texte, « ref » est renvoyé tel quel dans la réponse):
+    {"op": "subscribe", "channel": "a", "session": "<id>", "run_id": "<id>", "last_id": 12, "ref": 1}
+    {"op": "unsubscribe", "channel": "a"}
+    {"op": "restart", "channel": "a"}
+    {"op": "update_goal", "channel": "a", "goal": "..."}
+    {"op": "ping"}
+
+Trames du serveur:
+    {"op": "events", "events": [{"channel": "a", "id": 13, "event": "task_update", "data": {...}}, ...]}
+    {"op": "ack", "ref": 1, ...} / {"op": "error", "ref": 1, "error": "..."}
+    {"op": "heartbeat"}
+
+La connexion ne scrute pas ses canaux: elle est réveillée par la publication d'un événement sur l'un
+d'eux ou par un message du client, lu par un thread dédié.
+
+Avec ?compress=1 à l'ouverture, les trames dépassant COMPRESS_THRESHOLD octets sont envoyées
+en binaire, compressées au format zlib.
+"""
+
+import json
+import logging
+import queue
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Union
+
+from event_stream import HEARTBEAT_INTERVAL, dumps
+
+logger = logging.getLogger(__name__)
+
+# Nombre maximal de canaux par connexion
+MAX_CHANNELS = 32
+# Taille visée d'une trame d'événements regroupés
+BATCH_MAX_BYTES = 64 * 1024
+# En dessous de ce seuil, la compression coûte plus qu'elle ne rapporte
+COMPRESS_THRESHOLD = 512
+COMPRESS_LEVEL = 6
+
+Frame = Union[str, bytes]
+
+@dataclass
+class Channel:
+    """Abonnement d'une connexion au flux d'une session"""
+    name: str
+    session: Any
+    run_id: Optional[str]
+    cursor: int
+
+class ChannelMultiplexer:
+    """État d'une connexion WebSocket: canaux abonnés, curseurs et encodage des trames"""
+    def __init__(self, default_session, resolve_session: Callable[[str], Optional[Any]],
+                 controls: Dict[str, Callable[[Any, dict], dict]], compress: bool = False,
+                 max_channels: int = MAX_CHANNELS, batch_max_bytes: int = BATCH_MAX_BYTES):
+        self.default_session = default_session
+        self.resolve_session = resolve_session
+        self.controls = controls
+        self.compress = compress
+        self.max_channels = max_channels
+        self.batch_max_bytes = batch_max_bytes
+        self.channels: Dict[str, Channel] = {}
+        # Levé par les diffuseurs des canaux abonnés et par l'arrivée d'un message du client
+        self.wakeup = threading.Event()
+
+    def handle(self, message: Union[str, bytes]) -> Frame:
+        """Traite un message du client et renvoie la trame de réponse"""
+        ref = None
+        try:
+            request = json.loads(message)
+            if not isinstance(request, dict):
+                raise ValueError("Message JSON objet attendu")
+            ref = request.get('ref')
+            op = request.get('op')
+            if op == 'ping':
+                return self.reply({'op': 'pong', 'ref': ref})
+            if op == 'subscribe':
+                return self.reply({'op': 'ack', 'ref': ref, **self.subscribe(request)})
+            if op == 'unsubscribe':
+                removed = self.channels.pop(str(request.get('channel')), None)
+                if removed is not None:
+                    removed.session.broadcaster.detach(self.wakeup.set)
+                return self.reply({'op': 'ack', 'ref': ref, 'channel': request.get('channel'),
+                                   'subscribed': False, 'found': removed is not None})
+            if op in self.controls:
+                channel = self.channels.get(str(request.get('channel')))
+                session = channel.session if channel is not None else self.default_session
+                return self.reply({'op': 'ack', 'ref': ref, **self.controls[op](session, request)})
+            raise ValueError(f"Opération inconnue: {op}")
+        except Exception as e:
+            logger.warning(f"Message WebSocket refusé: {str(e)}")
+            return self.reply({'op': 'error', 'ref': ref, 'error': str(e)})
+
+    def subscribe(self, request: dict) -> dict:
+        """Abonne la connexion à un canal; sans last_id, le tampon de la session est rejoué"""
+        name = request.get('channel')
+        if not isinstance(name, str) or not name:
+            raise ValueError("Nom de canal manquant")
+        if name not in self.channels and len(self.channels) >= self.max_channels:
+            raise ValueError(f"Nombre maximal de canaux atteint ({self.max_channels})")
+        session_id = request.get('session')
+        session = self.resolve_session(session_id) if session_id else self.default_session
+        if session is None:
+            raise ValueError("Session invalide")
+        last_id = request.get('last_id')
+        if not isinstance(last_id, int) or isinstance(last_id, bool) or last_id > session.broadcaster.last_id:
+            # Identifiant absent ou inconnu (serveur redémarré, session recréée): le tampon est rejoué
+            last_id = 0
+        previous = self.channels.get(name)
+        if previous is not None:
+            previous.session.broadcaster.detach(self.wakeup.set)
+        session.broadcaster.attach(self.wakeup.set)
+        self.channels[name] = Channel(
+            name=name,
+            session=session,
+            run_id=request.get('run_id'),
+            cursor=last_id
+        )
+        return {'channel': name, 'subscribed': True, 'session': session.session_id}
+
+    def close(self) -> None:
+        """Désabonne tous les canaux à la fermeture de la connexion"""
+        for channel in self.channels.values():
+            channel.session.broadcaster.detach(self.wakeup.set)
+        self.channels.clear()
+
+    def collect(self) -> List[Frame]:
+        """Relève les nouveaux événements de tous les canaux et les regroupe en trames"""
+        items: List[bytes] = []
+        for channel in list(self.channels.values()):
+            broadcaster = channel.session.broadcaster
+            if channel.cursor > broadcaster.last_id:
+                channel.cursor = 0
+            events = broadcaster.events_after(channel.cursor)
+            if not events:
+                if broadcaster.last_id > channel.cursor:
+                    # Le tampon a été vidé: on se recale sur le dernier identifiant
+                    channel.cursor = broadcaster.last_id
+                continue
+            prefix = b'{"channel":%s,"id":' % dumps(channel.name)
+            for event in events:
+                if channel.run_id is None or event.run_id == channel.run_id:
+                    # Les données déjà encodées par le diffuseur sont insérées telles quelles
+                    items.append(b'%s%d,"event":"%s","data":%s}' % (
+                        prefix, event.event_id, event.event_type.encode('ascii'), event.data
+                    ))
+            channel.cursor = events[-1].event_id
+            channel.session.touch()
+        return [self.frame(batch) for batch in self._batches(items)]
+
+    def _batches(self, items: List[bytes]) -> List[bytes]:
+        batches, current, size = [], [], 0
+        for item in items:
+            if current and size + len(item) > self.batch_max_bytes:
+                batches.append(current)
+                current, size = [], 0
+            current.append(item)
+            size += len(item) + 1
+        if current:
+            batches.append(current)
+        return [b'{"op":"events","events":[%s]}' % b','.join(batch) for batch in batches]
+
+    def reply(self, payload: dict) -> Frame:
+        return self.frame(dumps(payload))
+
+    def heartbeat(self) -> Frame:
+        return self.frame(b'{"op":"heartbeat"}')
+
+    def frame(self, data: bytes) -> Frame:
+        """Trame texte, ou binaire compressée lorsque la compression est demandée et rentable"""
+        if self.compress and len(data) > COMPRESS_THRESHOLD:
+            return zlib.compress(data, COMPRESS_LEVEL)
+        return data.decode('utf-8')
+
+_CLOSED = object()
+
+def serve(ws, mux: ChannelMultiplexer, heartbeat: float = HEARTBEAT_INTERVAL) -> None:
+    """Boucle d'une connexion: attend un réveil (événement ou message du client), puis envoie
+    les réponses et les trames d'événements; un heartbeat est envoyé après heartbeat secondes de silence"""
+    inbox: 'queue.Queue[Any]' = queue.Queue()
+
+    def receive() -> None:
+        try:
+            while True:
+                message = ws.receive()
+                if message is not None:
+                    inbox.put(message)
+                    mux.wakeup.set()
+        except Exception:
+            pass
+        finally:
+            inbox.put(_CLOSED)
+            mux.wakeup.set()
+
+    threading.Thread(target=receive, name='ws-receive', daemon=True).start()
+    last_sent = time.monotonic()
+    try:
+        while True:
+            mux.wakeup.wait(max(0.0, heartbeat - (time.monotonic() - last_sent)))
+            # Effacé avant la collecte: une publication concurrente relèvera le signal
+            mux.wakeup.clear()
+            frames = []
+            while True:
+                try:
+                    message = inbox.get_nowait()
+                except queue.Empty:
+                    break
+                if message is _CLOSED:
+                    return
+                frames.append(mux.handle(message))
+            frames.extend(mux.collect())
+            for frame in frames:
+                ws.send(frame)
+            now = time.monotonic()
+            if frames:
+                last_sent = now
+            elif now - last_sent >= heartbeat:
+                ws.send(mux.heartbeat())
+                last_sent = now
+    finally:
+        mux.close()
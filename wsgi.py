@@ -1,4 +1,5 @@
-from crew_server import app
+from crew_server import app, crew_workers
 
 if __name__ == "__main__":
+    crew_workers.start()
     app.run() 
\ No newline at end of file